@@ -0,0 +1,253 @@
+import asyncio
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from starlette.datastructures import Headers, QueryParams
+from starlette.responses import JSONResponse
+
+from metrics import REGISTRY, find_router, route_template
+
+
+CANDIDATE = 'candidate'
+ADMIN = 'admin'
+
+# Event-loop lag (seconds) above which each priority class is shed. Admin work
+# goes first so imports and bulk rescoring never starve candidates mid-sitting.
+DEFAULT_SHED_LAG = {ADMIN: 0.1, CANDIDATE: 0.5}
+
+MAX_TRACKED_CLIENTS = 100000
+
+# Everyone behind one address (a test centre's NAT) shares a ceiling of this
+# many candidates' allowance; identified candidates also get a bucket each
+SHARED_IP_CLIENTS = 50
+# JSON bodies up to this size are read for their studentId
+MAX_PEEK_BYTES = 256 * 1024
+_BODY_METHODS = {'POST', 'PUT', 'PATCH'}
+
+REGISTRY.describe('admission_rejections_total', 'Requests rejected by admission control by route and reason')
+REGISTRY.describe('event_loop_lag_seconds', 'Smoothed event loop scheduling lag')
+
+
+@dataclass(frozen=True)
+class RoutePolicy:
+    # Sustained requests per second per client and the burst allowed on top
+    rate: Optional[float] = None
+    burst: Optional[float] = None
+    # Requests of this route served at once across all clients
+    max_concurrency: Optional[int] = None
+    priority: str = CANDIDATE
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now):
+        """Consume one token; return 0 on success or the seconds until one is available"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class ClientBuckets:
+    """Token buckets per (client, route) with LRU eviction to bound memory"""
+
+    def __init__(self, max_clients=MAX_TRACKED_CLIENTS):
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, capacity, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(rate, capacity, now)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.take(now)
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a periodic timer (EWMA-smoothed)"""
+
+    def __init__(self, interval=0.1, alpha=0.3):
+        self.interval = interval
+        self.alpha = alpha
+        self.lag = 0.0
+        self._task = None
+        self._loop = None
+
+    def ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.lag = self.alpha * lag + (1 - self.alpha) * self.lag
+            REGISTRY.gauge_set('event_loop_lag_seconds', self.lag)
+
+
+def client_ip(scope, trust_proxy=False):
+    headers = Headers(scope=scope)
+    if trust_proxy and headers.get('x-forwarded-for'):
+        return headers['x-forwarded-for'].split(',')[0].strip()
+    client = scope.get('client')
+    return client[0] if client else 'unknown'
+
+
+def client_key(scope, trust_proxy=False, student_id=None):
+    """Identify the caller: (IP, student id) when the request names one, otherwise the IP alone
+
+    ``student_id`` is the one in the JSON body, read by the middleware;
+    requests without a body can name it with ?studentId= or X-Student-Id.
+    Ids are not authenticated, which is why the IP stays in the key and
+    every address also has a shared ceiling.
+    """
+    student_id = student_id or QueryParams(scope.get('query_string', b'')).get('studentId') \
+        or Headers(scope=scope).get('x-student-id')
+    ip = client_ip(scope, trust_proxy)
+    return f'student:{ip}:{student_id}' if student_id else f'ip:{ip}'
+
+
+async def peek_student_id(scope, receive):
+    """studentId of a JSON request body, and a receive callable that replays the body to the app"""
+    headers = Headers(scope=scope)
+    if scope['method'] not in _BODY_METHODS or 'json' not in headers.get('content-type', ''):
+        return None, receive
+    try:
+        if int(headers.get('content-length') or 0) > MAX_PEEK_BYTES:
+            return None, receive
+    except ValueError:
+        return None, receive
+
+    messages, chunks, size = [], [], 0
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message['type'] != 'http.request':
+            break
+        chunks.append(message.get('body', b''))
+        size += len(chunks[-1])
+        if not message.get('more_body', False) or size > MAX_PEEK_BYTES:
+            break
+
+    async def replay():
+        return messages.pop(0) if messages else await receive()
+
+    if size > MAX_PEEK_BYTES:
+        return None, replay
+    try:
+        student_id = json.loads(b''.join(chunks)).get('studentId')
+    except (ValueError, AttributeError):
+        return None, replay
+    return (student_id if isinstance(student_id, str) and student_id else None), replay
+
+
+class AdmissionControlMiddleware:
+    """Per-client token buckets, per-route concurrency caps and lag-based load shedding
+
+    ``policies`` maps "METHOD /route/{template}" to a RoutePolicy; other
+    routes use ``default_policy``. Rate-limited callers get 429, shed or
+    over-capacity requests get 503, both with Retry-After.
+
+    Rates apply per candidate (IP and student id) and, ``shared_ip_clients``
+    times over, per IP: candidates sharing an address do not starve each
+    other, and rotating ids does not lift an address's limit. Requests
+    naming no student only count against their address's ceiling.
+    """
+
+    def __init__(self, app, policies=None, default_policy=RoutePolicy(), shed_lag=None,
+                 trust_proxy=False, lag_monitor=None, shared_ip_clients=SHARED_IP_CLIENTS):
+        self.app = app
+        self.policies = dict(policies or {})
+        self.default_policy = default_policy
+        self.shed_lag = dict(DEFAULT_SHED_LAG if shed_lag is None else shed_lag)
+        self.trust_proxy = trust_proxy
+        self.shared_ip_clients = shared_ip_clients
+        self.lag_monitor = lag_monitor if lag_monitor is not None else LoopLagMonitor()
+        self.buckets = ClientBuckets()
+        self.in_flight = {}
+        self._router = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] == 'OPTIONS':
+            await self.app(scope, receive, send)
+            return
+
+        self.lag_monitor.ensure_started()
+        if self._router is None:
+            self._router = find_router(self.app)
+
+        route = route_template(self._router, scope)
+        route_key = f"{scope['method']} {route}"
+        policy = self.policies.get(route_key, self.default_policy)
+
+        student_id = None
+        if policy.rate:
+            student_id, receive = await peek_student_id(scope, receive)
+        rejection = self._check(scope, route_key, policy, student_id)
+        if rejection is not None:
+            status, reason, retry_after = rejection
+            REGISTRY.inc('admission_rejections_total', (('reason', reason), ('route', route)))
+            response = JSONResponse(
+                {'error': 'Too many requests' if status == 429 else 'Server busy, please retry', 'reason': reason},
+                status_code=status,
+                headers={'Retry-After': str(max(1, math.ceil(retry_after)))},
+            )
+            await response(scope, receive, send)
+            return
+
+        if policy.max_concurrency is None:
+            await self.app(scope, receive, send)
+            return
+
+        self.in_flight[route_key] = self.in_flight.get(route_key, 0) + 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight[route_key] -= 1
+
+    def _check(self, scope, route_key, policy, student_id=None):
+        threshold = self.shed_lag.get(policy.priority)
+        if threshold is not None and self.lag_monitor.lag > threshold:
+            return 503, 'overloaded', self.lag_monitor.lag * 10
+
+        if policy.max_concurrency is not None and self.in_flight.get(route_key, 0) >= policy.max_concurrency:
+            return 503, 'concurrency', 1
+
+        if policy.rate:
+            capacity = policy.burst if policy.burst is not None else policy.rate
+            key = client_key(scope, self.trust_proxy, student_id)
+            if key.startswith('student:'):
+                wait = self.buckets.take((key, route_key), policy.rate, capacity)
+                if wait:
+                    return 429, 'rate_limited', wait
+            shared = self.shared_ip_clients
+            wait = self.buckets.take((f'ip:{client_ip(scope, self.trust_proxy)}', route_key),
+                                     policy.rate * shared, capacity * shared)
+            if wait:
+                return 429, 'rate_limited', wait
+
+        return None
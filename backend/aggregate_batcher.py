@@ -0,0 +1,106 @@
+import logging
+import threading
+
+from metrics import REGISTRY
+
+
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_MAX_BATCH = 500
+
+REGISTRY.describe('aggregate_batches_total', 'Batches of results folded into shared aggregates by outcome')
+
+logger = logging.getLogger(__name__)
+
+
+class AggregateBatcher:
+    """Background thread folding queued items into shared aggregates, one call per key and batch
+
+    Writers contending for one aggregate (an exam's cohort stats) each pay
+    a transaction round trip and retry on every lost race; here requests
+    only append to an in-memory batch and ``fold(key, items)`` runs once
+    per key every ``flush_interval`` seconds, or as soon as a key has
+    ``max_batch`` items. Items are derived data: a failed fold is logged
+    and dropped, and items still queued when the process dies are lost, so
+    the aggregates must be rebuildable from their source records.
+    """
+
+    def __init__(self, fold, flush_interval=DEFAULT_FLUSH_INTERVAL, max_batch=DEFAULT_MAX_BATCH):
+        self._fold = fold
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._closing = False
+
+    def add(self, key, item):
+        with self._lock:
+            batch = self._pending.setdefault(key, [])
+            batch.append(item)
+            full = len(batch) >= self.max_batch
+        self._ensure_started()
+        if full:
+            self._wake.set()
+
+    def pending(self):
+        with self._lock:
+            return sum(len(batch) for batch in self._pending.values())
+
+    def discard(self, key, predicate):
+        """Drop queued items of ``key`` matching ``predicate``; returns how many were dropped
+
+        Waits for a flush in progress, so a dropped item is never folded as well.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = self._pending.get(key, [])
+                kept = [item for item in batch if not predicate(item)]
+                if kept:
+                    self._pending[key] = kept
+                else:
+                    self._pending.pop(key, None)
+            return len(batch) - len(kept)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._closing = False
+                    self._thread = threading.Thread(target=self._run, name='aggregate-batcher', daemon=True)
+                    self._thread.start()
+
+    def flush(self):
+        """Fold everything queued so far; returns the number of items folded"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            folded = 0
+            for key, items in pending.items():
+                try:
+                    self._fold(key, items)
+                except Exception as e:
+                    REGISTRY.inc('aggregate_batches_total', (('result', 'failed'),))
+                    logger.warning(f"Folding {len(items)} results into {key} failed: {str(e)}")
+                    continue
+                REGISTRY.inc('aggregate_batches_total', (('result', 'folded'),))
+                folded += len(items)
+            return folded
+
+    def close(self):
+        """Stop the thread after folding what is still queued"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._closing = True
+        if thread is not None:
+            self._wake.set()
+            thread.join()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+            if self._closing:
+                return
@@ -0,0 +1,140 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+
+ARTICLES = {'a', 'an', 'the'}
+
+UNITS = {
+    'zero': 0, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7, 'eight': 8,
+    'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12, 'thirteen': 13, 'fourteen': 14, 'fifteen': 15,
+    'sixteen': 16, 'seventeen': 17, 'eighteen': 18, 'nineteen': 19,
+}
+TENS = {
+    'twenty': 20, 'thirty': 30, 'forty': 40, 'fifty': 50, 'sixty': 60, 'seventy': 70, 'eighty': 80, 'ninety': 90,
+}
+SCALES = {'thousand': 1000, 'million': 1000000}
+ORDINALS = {
+    'first': 1, 'second': 2, 'third': 3, 'fourth': 4, 'fifth': 5, 'sixth': 6, 'seventh': 7, 'eighth': 8,
+    'ninth': 9, 'tenth': 10, 'eleventh': 11, 'twelfth': 12, 'thirteenth': 13, 'fourteenth': 14,
+    'fifteenth': 15, 'sixteenth': 16, 'seventeenth': 17, 'eighteenth': 18, 'nineteenth': 19,
+    'twentieth': 20, 'thirtieth': 30, 'fortieth': 40, 'fiftieth': 50, 'hundredth': 100,
+}
+NUMBER_WORDS = set(UNITS) | set(TENS) | set(SCALES) | set(ORDINALS) | {'hundred'}
+
+# American spelling -> British (the IELTS reference); both sides map to the British form
+SPELLING_VARIANTS = {
+    'aluminum': 'aluminium', 'analyze': 'analyse', 'airplane': 'aeroplane', 'behavior': 'behaviour',
+    'catalog': 'catalogue', 'center': 'centre', 'centimeter': 'centimetre', 'color': 'colour',
+    'defense': 'defence', 'enroll': 'enrol', 'enrollment': 'enrolment', 'favorite': 'favourite',
+    'fiber': 'fibre', 'flavor': 'flavour', 'fulfill': 'fulfil', 'gray': 'grey', 'harbor': 'harbour',
+    'honor': 'honour', 'humor': 'humour', 'jewelry': 'jewellery', 'kilometer': 'kilometre',
+    'labor': 'labour', 'license': 'licence', 'liter': 'litre', 'math': 'maths', 'meter': 'metre',
+    'millimeter': 'millimetre', 'mom': 'mum', 'neighbor': 'neighbour', 'neighborhood': 'neighbourhood',
+    'pajamas': 'pyjamas', 'program': 'programme', 'rumor': 'rumour', 'skeptical': 'sceptical',
+    'theater': 'theatre', 'traveled': 'travelled', 'traveler': 'traveller', 'traveling': 'travelling',
+    'tumor': 'tumour', 'vapor': 'vapour',
+}
+
+# -ize/-ization spellings fold to -ise/-isation (both are accepted in IELTS)
+_IZE = re.compile(r'(?<=\w{3})iz(e|es|ed|ing|ation|ations)$')
+_QUOTES = str.maketrans({
+    '‘': "'", '’': "'", '‚': "'", '‛': "'", '′': "'", '`': "'",
+    '“': '"', '”': '"', '„': '"', '″': '"',
+    '‐': '-', '‑': '-', '‒': '-', '–': '-', '—': '-', '−': '-',
+})
+_DIGIT_COMMA = re.compile(r'(?<=\d),(?=\d{3})')
+# Anything that is not a word character, or a decimal point inside a number
+_SEPARATORS = re.compile(r"(?:[^\w.]|_|(?<!\d)\.|\.(?!\d))+")
+
+
+def _ordinal_suffix(value):
+    if 10 <= value % 100 <= 20:
+        return 'th'
+    return {1: 'st', 2: 'nd', 3: 'rd'}.get(value % 10, 'th')
+
+
+def _fold_numbers(tokens):
+    """Replace runs of number words with digits: "twenty one" -> "21", "third" -> "3rd"""
+    folded = []
+    index = 0
+    while index < len(tokens):
+        if tokens[index] not in NUMBER_WORDS:
+            folded.append(tokens[index])
+            index += 1
+            continue
+        total = current = 0
+        ordinal = False
+        while index < len(tokens) and not ordinal:
+            token = tokens[index]
+            if token in UNITS:
+                current += UNITS[token]
+            elif token in TENS:
+                current += TENS[token]
+            elif token == 'hundred':
+                current = max(current, 1) * 100
+            elif token in SCALES:
+                total += max(current, 1) * SCALES[token]
+                current = 0
+            elif token in ORDINALS:
+                value = ORDINALS[token]
+                current = max(current, 1) * value if value == 100 else current + value
+                ordinal = True
+            elif token == 'and' and index + 1 < len(tokens) and tokens[index + 1] in NUMBER_WORDS:
+                pass
+            else:
+                break
+            index += 1
+        value = total + current
+        folded.append(f'{value}{_ordinal_suffix(value)}' if ordinal else str(value))
+    return folded
+
+
+def _fold_spelling(token):
+    if token in SPELLING_VARIANTS:
+        return SPELLING_VARIANTS[token]
+    if token.endswith('s') and token[:-1] in SPELLING_VARIANTS:
+        return SPELLING_VARIANTS[token[:-1]] + 's'
+    return _IZE.sub(r'is\1', token)
+
+
+def _canonical(text, hyphen):
+    text = unicodedata.normalize('NFKD', text.casefold())
+    text = ''.join(char for char in text if not unicodedata.combining(char)).translate(_QUOTES)
+    text = _DIGIT_COMMA.sub('', text.replace("'", '').replace('-', hyphen))
+    tokens = [token for token in _SEPARATORS.split(text) if token and token not in ARTICLES]
+    return ' '.join(_fold_spelling(token) for token in _fold_numbers(tokens))
+
+
+@lru_cache(maxsize=65536)
+def canonical_forms(text):
+    """Comparison forms of a free-text answer
+
+    Compatibility-normalized and casefolded with accents stripped,
+    typographic quotes and dashes unified, punctuation treated as spaces,
+    thousands separators dropped, articles removed, number words folded to
+    digits and American spellings folded to British ones. Hyphenated words
+    give two forms, split and joined ("e-mail" -> "e mail", "email"), so
+    either spelling matches. Two answers are equivalent when their forms
+    intersect.
+    """
+    return tuple(dict.fromkeys(form for form in (_canonical(text, ' '), _canonical(text, '')) if form))
+
+
+def answer_forms(answer):
+    if answer is None or isinstance(answer, (dict, list, tuple, bool)):
+        return ()
+    if isinstance(answer, float) and answer.is_integer():
+        answer = int(answer)
+    return canonical_forms(str(answer))
+
+
+def acceptable_forms(correct_answer):
+    """Set of forms matching any accepted answer (a string or a list of alternatives)"""
+    answers = correct_answer if isinstance(correct_answer, list) else [correct_answer]
+    return {form for answer in answers for form in answer_forms(answer)}
+
+
+def matches_acceptable(answer, acceptable):
+    """O(1) per form: is ``answer`` one of the precompiled ``acceptable`` forms"""
+    return any(form in acceptable for form in answer_forms(answer))
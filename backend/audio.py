@@ -0,0 +1,67 @@
+import re
+
+import anyio
+from starlette.responses import Response, StreamingResponse
+
+
+CHUNK_SIZE = 64 * 1024
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """Return the inclusive ``(start, end)`` of a single-range Range header, or None to send everything"""
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    if not match:
+        # Multi-range and unknown units: ignore the header, as RFC 9110 allows
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+async def _read_file(path, start, length):
+    async with await anyio.open_file(path, 'rb') as audio_file:
+        await audio_file.seek(start)
+        while length > 0:
+            chunk = await audio_file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def audio_file_response(path, range_header=None, media_type='audio/ogg'):
+    """Stream an audio file, honouring byte Range requests so players can seek"""
+    size = path.stat().st_size
+    headers = {'Accept-Ranges': 'bytes', 'Cache-Control': 'public, max-age=3600'}
+    try:
+        byte_range = parse_range(range_header, size)
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={**headers, 'Content-Range': f'bytes */{size}'})
+
+    if byte_range is None:
+        headers['Content-Length'] = str(size)
+        return StreamingResponse(_read_file(path, 0, size), media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    length = end - start + 1
+    headers['Content-Length'] = str(length)
+    headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return StreamingResponse(_read_file(path, start, length), status_code=206, media_type=media_type, headers=headers)
@@ -0,0 +1,55 @@
+import asyncio
+import hmac
+import logging
+import os
+
+from fastapi import Header, HTTPException
+from firebase_admin import auth as firebase_auth
+
+from database import db_reference
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_email_for_path(email):
+    # Same rules as authService.normalizeEmailForPath in the frontend:
+    # Firebase paths cannot contain . # $ [ ] @
+    if not email:
+        return ''
+    normalized = email.lower()
+    for char in '.@#$[]':
+        normalized = normalized.replace(char, '_')
+    return normalized
+
+
+def is_whitelisted_admin(email):
+    normalized = normalize_email_for_path(email)
+    if not normalized:
+        return False
+    return db_reference(f'admin/whitelist/{normalized}').get() is not None
+
+
+async def require_admin(authorization: str = Header(default='')):
+    """FastAPI dependency allowing only whitelisted admins (Firebase ID token) or the ADMIN_API_KEY"""
+    scheme, _, token = authorization.partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        raise HTTPException(status_code=401, detail='Admin authorization required')
+
+    # Static key for ops tooling (curl, CI) when configured
+    api_key = os.environ.get('ADMIN_API_KEY')
+    if api_key and hmac.compare_digest(token, api_key):
+        return {'email': None, 'via': 'api_key'}
+
+    # Both calls are blocking firebase_admin I/O; keep them off the event loop
+    try:
+        claims = await asyncio.to_thread(firebase_auth.verify_id_token, token)
+    except Exception as e:
+        logger.warning(f"Rejected admin token: {str(e)}")
+        raise HTTPException(status_code=401, detail='Invalid authorization token')
+
+    email = claims.get('email')
+    if not await asyncio.to_thread(is_whitelisted_admin, email):
+        raise HTTPException(status_code=403, detail='Admin access required')
+
+    return {'email': email, 'uid': claims.get('uid'), 'via': 'firebase'}
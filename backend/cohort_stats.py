@@ -0,0 +1,151 @@
+# Band histograms have one slot per half band, 0.0 to 9.0
+HALF_BANDS = 19
+
+
+def stats_key(name):
+    # Section names become database keys, which cannot contain . # $ [ ] /
+    for char in '.#$[]/':
+        name = name.replace(char, '_')
+    return name or 'Unknown'
+
+
+def band_slot(band):
+    return min(HALF_BANDS - 1, max(0, int(round(float(band) * 2))))
+
+
+def _counts(value, length=0):
+    # RTDB returns arrays with missing indexes as objects
+    if isinstance(value, dict):
+        items = {int(key): count for key, count in value.items()}
+        value = [items.get(index, 0) for index in range(max(items, default=-1) + 1)]
+    counts = [count or 0 for count in (value or [])]
+    return counts + [0] * (length - len(counts))
+
+
+def empty_stats():
+    return {'count': 0, 'overallBand': [0] * HALF_BANDS, 'sections': {}}
+
+
+def add_result(stats, result, weight=1):
+    """Fold one scoring result (score_answers shape) into ``stats``; ``weight=-1`` takes it out again
+
+    Aggregates are histograms and sums only, so applying a result is O(1)
+    in the number of submissions and aggregates can be merged. Sections
+    awaiting manual review have no band yet and are not counted.
+    """
+    stats = stats or empty_stats()
+    stats['count'] = stats.get('count', 0) + weight
+    overall = _counts(stats.get('overallBand'), HALF_BANDS)
+    overall[band_slot(result.get('overallBandScore') or 0)] += weight
+    stats['overallBand'] = overall
+
+    sections = stats.get('sections') or {}
+    for name, section in (result.get('sectionScores') or {}).items():
+        if not section or section.get('bandScore') is None:
+            continue
+        key = stats_key(name)
+        raw = int(section.get('rawScore') or section.get('correctAnswers') or 0)
+        entry = sections.get(key) or {}
+        bands = _counts(entry.get('bands'), HALF_BANDS)
+        bands[band_slot(section['bandScore'])] += weight
+        raw_scores = _counts(entry.get('rawScores'), raw + 1)
+        raw_scores[raw] += weight
+        sections[key] = {
+            'count': entry.get('count', 0) + weight,
+            'rawSum': entry.get('rawSum', 0) + weight * raw,
+            'bands': bands,
+            'rawScores': raw_scores,
+        }
+    stats['sections'] = sections
+    return stats
+
+
+def add_results(stats, results):
+    """Fold a batch of results in, for one transaction per batch instead of per result"""
+    stats = stats or empty_stats()
+    for result in results:
+        add_result(stats, result)
+    return stats
+
+
+def _add_counts(left, right):
+    length = max(len(left), len(right))
+    return [a + b for a, b in zip(left + [0] * (length - len(left)), right + [0] * (length - len(right)))]
+
+
+def merge_stats(all_stats):
+    """Aggregate of several aggregates, e.g. a track's from its exams'"""
+    merged = empty_stats()
+    for stats in all_stats:
+        if not stats:
+            continue
+        merged['count'] += stats.get('count', 0)
+        merged['overallBand'] = _add_counts(merged['overallBand'], _counts(stats.get('overallBand'), HALF_BANDS))
+        for key, section in (stats.get('sections') or {}).items():
+            entry = merged['sections'].setdefault(key, {'count': 0, 'rawSum': 0, 'bands': [], 'rawScores': []})
+            entry['count'] += section.get('count', 0)
+            entry['rawSum'] += section.get('rawSum', 0)
+            entry['bands'] = _add_counts(entry['bands'], _counts(section.get('bands'), HALF_BANDS))
+            entry['rawScores'] = _add_counts(entry['rawScores'], _counts(section.get('rawScores')))
+    return merged
+
+
+def build_stats(submissions):
+    """Aggregate from scratch over ``(submission_id, submission)`` pairs; unscored ones are skipped"""
+    stats = empty_stats()
+    for _, submission in submissions:
+        if submission and submission.get('scored'):
+            add_result(stats, submission)
+    return stats
+
+
+def _histogram_median(counts, value_of):
+    total = sum(counts)
+    if not total:
+        return None
+    # Mean of the two middle values (the same value for an odd total)
+    positions, values, seen = [(total - 1) // 2, total // 2], [], 0
+    for index, count in enumerate(counts):
+        seen += count
+        while positions and positions[0] < seen:
+            positions.pop(0)
+            values.append(value_of(index))
+    return sum(values) / 2
+
+
+def _band_distribution(counts):
+    return {f'{slot / 2:.1f}': count for slot, count in enumerate(counts) if count}
+
+
+def _band_mean(counts):
+    total = sum(counts)
+    return round(sum(slot / 2 * count for slot, count in enumerate(counts)) / total, 2) if total else None
+
+
+def summarize_stats(stats):
+    """Read view of an aggregate: band distributions, means and medians; cost depends only on the score range"""
+    stats = stats or empty_stats()
+    overall = _counts(stats.get('overallBand'), HALF_BANDS)
+    sections = {}
+    for key, section in sorted((stats.get('sections') or {}).items()):
+        bands = _counts(section.get('bands'), HALF_BANDS)
+        raw_scores = _counts(section.get('rawScores'))
+        count = section.get('count', 0)
+        sections[key] = {
+            'count': count,
+            'meanRawScore': round(section.get('rawSum', 0) / count, 2) if count else None,
+            'medianRawScore': _histogram_median(raw_scores, float),
+            'rawScoreDistribution': {str(raw): n for raw, n in enumerate(raw_scores) if n},
+            'meanBand': _band_mean(bands),
+            'medianBand': _histogram_median(bands, lambda slot: slot / 2),
+            'bandDistribution': _band_distribution(bands),
+        }
+    return {
+        'count': stats.get('count', 0),
+        'overallBand': {
+            'mean': _band_mean(overall),
+            'median': _histogram_median(overall, lambda slot: slot / 2),
+            'distribution': _band_distribution(overall),
+        },
+        'sections': sections,
+    }
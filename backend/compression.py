@@ -0,0 +1,243 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+try:
+    import zstandard
+except ImportError:  # optional, falls back to brotli/gzip
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # optional, falls back to gzip
+    brotli = None
+
+
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+# Bodies above this are compressed off the event loop
+THREAD_THRESHOLD = 64 * 1024
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'image/svg+xml', 'application/xml')
+
+
+def _gzip(body):
+    return gzip.compress(body, compresslevel=6)
+
+
+def _brotli(body):
+    return brotli.compress(body, quality=5)
+
+
+def _zstd(body):
+    return zstandard.ZstdCompressor(level=3).compress(body)
+
+
+def available_encoders():
+    """Encoders in server preference order, best ratio per CPU first"""
+    encoders = OrderedDict()
+    if zstandard is not None:
+        encoders['zstd'] = _zstd
+    if brotli is not None:
+        encoders['br'] = _brotli
+    encoders['gzip'] = _gzip
+    return encoders
+
+
+def parse_accept_encoding(header):
+    """Map each coding in an Accept-Encoding header to its q-value"""
+    accepted = {}
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate_encoding(header, encoders):
+    """Pick the encoding with the highest client q-value, breaking ties by server preference"""
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0.0)
+    best, best_q = None, 0.0
+    for name in encoders:
+        q = accepted.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def etag_for(body):
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag):
+    # Weak comparison: the compression layer serves W/ variants of our strong tags
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    wanted = etag.removeprefix('W/')
+    return any(candidate.strip().removeprefix('W/') == wanted for candidate in if_none_match.split(','))
+
+
+def etag_json_response(request, payload, cache_control='no-cache'):
+    """JSON response carrying a content ETag, or a 304 when the client already has it
+
+    ``no-cache`` lets clients keep the body but revalidate every time, so a
+    candidate reloading an exam only pays for the round trip.
+    """
+    body = json.dumps(payload, separators=(',', ':'), ensure_ascii=False, default=str).encode('utf-8')
+    return etag_bytes_response(request, body, etag_for(body), cache_control)
+
+
+def etag_bytes_response(request, body, etag, cache_control='no-cache'):
+    """Same as etag_json_response for a body that is already serialized"""
+    headers = {'ETag': etag, 'Cache-Control': cache_control}
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type='application/json', headers=headers)
+
+
+class CompressedCache:
+    """Byte-bounded LRU of compressed bodies keyed by (ETag, encoding)"""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class CompressionMiddleware:
+    """Negotiated zstd/br/gzip compression for compressible bodies above ``min_size``
+
+    Responses that carry an ETag and are not ``no-store`` are compressed once
+    per encoding and served from cache afterwards, so hundreds of candidates
+    loading the same exam cost a single compression.
+    """
+
+    def __init__(self, app, min_size=DEFAULT_MIN_SIZE, cache_bytes=DEFAULT_CACHE_BYTES, encoders=None):
+        self.app = app
+        self.min_size = min_size
+        self.encoders = encoders if encoders is not None else available_encoders()
+        self.cache = CompressedCache(cache_bytes)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        # Without an acceptable encoding responses still pass through here to get Vary
+        encoding = negotiate_encoding(Headers(scope=scope).get('accept-encoding'), self.encoders)
+        start_message = None
+        chunks = []
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message['type'] == 'http.response.start':
+                headers = Headers(raw=message['headers'])
+                if encoding is None or not self._should_compress(message['status'], headers):
+                    passthrough = True
+                    if self._negotiable(headers):
+                        message = {**message, 'headers': self._vary(message['headers'])}
+                    await send(message)
+                    return
+                start_message = message
+                return
+
+            if message['type'] == 'http.response.body':
+                chunks.append(message.get('body', b''))
+                if message.get('more_body', False):
+                    return
+                await self._send_compressed(send, start_message, b''.join(chunks), encoding)
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _negotiable(headers):
+        # Whether the body would be compressed for some Accept-Encoding, so caches must key on it
+        return 'content-encoding' not in headers and headers.get('content-type', '').startswith(COMPRESSIBLE_TYPES)
+
+    @staticmethod
+    def _vary(raw_headers):
+        headers = MutableHeaders(raw=list(raw_headers))
+        headers.add_vary_header('Accept-Encoding')
+        return headers.raw
+
+    def _should_compress(self, status, headers):
+        if status < 200 or status in (204, 206, 304):
+            return False
+        if not self._negotiable(headers):
+            return False
+        content_length = headers.get('content-length')
+        return content_length is None or int(content_length) >= self.min_size
+
+    async def _send_compressed(self, send, start_message, body, encoding):
+        headers = MutableHeaders(raw=self._vary(start_message['headers']))
+
+        if len(body) < self.min_size:
+            start_message['headers'] = headers.raw
+            await send(start_message)
+            await send({'type': 'http.response.body', 'body': body})
+            return
+
+        etag = headers.get('etag')
+        cacheable = etag is not None and 'no-store' not in headers.get('cache-control', '')
+        compressed = self.cache.get((etag, encoding)) if cacheable else None
+        if compressed is None:
+            encoder = self.encoders[encoding]
+            if len(body) > THREAD_THRESHOLD:
+                compressed = await asyncio.to_thread(encoder, body)
+            else:
+                compressed = encoder(body)
+            if cacheable:
+                self.cache.put((etag, encoding), compressed)
+
+        headers['Content-Encoding'] = encoding
+        headers['Content-Length'] = str(len(compressed))
+        if etag is not None and not etag.startswith('W/'):
+            # The encoded representation is no longer byte-identical to the tagged one
+            headers['ETag'] = 'W/' + etag
+        start_message['headers'] = headers.raw
+        await send(start_message)
+        await send({'type': 'http.response.body', 'body': compressed})
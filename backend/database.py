@@ -0,0 +1,60 @@
+import os
+
+from firebase_admin import db as firebase_db
+
+from log_config import parse_logger_map
+from metrics import instrument_reference
+
+
+_local_database = None
+
+
+def database_backend():
+    # "firebase" (default) or "memory" for the in-process stand-in used by benchmarks
+    return os.environ.get('DATABASE_BACKEND', 'firebase').lower()
+
+
+def _fault_setting(name):
+    # "0.02" applies to every operation, "get=0.05,set=0.01" sets them per operation
+    value = os.environ.get(name, '')
+    if '=' in value:
+        return parse_logger_map(value)
+    return float(value or 0)
+
+
+def local_database():
+    """The process-wide in-memory database, seeded from LOCAL_DB_SEED on first use
+
+    LOCAL_DB_LATENCY, LOCAL_DB_JITTER and LOCAL_DB_FAILURE_RATE inject
+    network-like delays and errors; LOCAL_DB_RANDOM_SEED makes them repeatable.
+    """
+    global _local_database
+    if _local_database is None:
+        from rtdb_emulator import InMemoryDatabase
+
+        random_seed = os.environ.get('LOCAL_DB_RANDOM_SEED')
+        _local_database = InMemoryDatabase.from_seed_file(
+            os.environ.get('LOCAL_DB_SEED'),
+            latency=_fault_setting('LOCAL_DB_LATENCY'),
+            jitter=_fault_setting('LOCAL_DB_JITTER'),
+            failure_rate=_fault_setting('LOCAL_DB_FAILURE_RATE'),
+            random_seed=int(random_seed) if random_seed else None,
+        )
+    return _local_database
+
+
+def reset_local_database():
+    """Drop the in-memory database, so the next use starts again from LOCAL_DB_SEED"""
+    global _local_database
+    _local_database = None
+
+
+def raw_reference(path):
+    if database_backend() == 'memory':
+        return local_database().reference(path)
+    return firebase_db.reference(path)
+
+
+def db_reference(path):
+    """Database reference whose operations are timed in the metrics registry"""
+    return instrument_reference(raw_reference(path), path)
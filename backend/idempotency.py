@@ -0,0 +1,147 @@
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from collections import OrderedDict
+
+
+DEFAULT_MEMORY_ENTRIES = 50000
+# A claim older than this belongs to a worker that died mid-operation and is taken over
+DEFAULT_STALE_AFTER = 60
+DEFAULT_POLL_INTERVAL = 0.05
+IN_PROGRESS = 'in_progress'
+
+
+class IdempotencyConflict(Exception):
+    """The idempotency key was already used with a different request payload"""
+
+
+def key_hash(key):
+    # Database keys cannot contain . # $ [ ] / so store a digest instead of the raw key
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:40]
+
+
+def payload_fingerprint(payload):
+    body = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+def reserve(claim, stale_after=DEFAULT_STALE_AFTER):
+    """Transaction function storing ``claim`` unless another worker holds or has completed the key"""
+    def update(current):
+        if current is None:
+            return claim
+        if current.get('state') == IN_PROGRESS and claim['startedAt'] - current.get('startedAt', 0) > stale_after:
+            return claim
+        return current
+    return update
+
+
+def release(token):
+    """Transaction function dropping a claim, if it is still the one holding ``token``"""
+    def update(current):
+        return None if current and current.get('token') == token else current
+    return update
+
+
+class IdempotencyIndex:
+    """Run an operation at most once per key and replay its result for repeats
+
+    Lookups go to an in-memory LRU first, then to the persistent store
+    (``load(key_hash)`` / ``save(key_hash, record)`` coroutines), so a retry
+    is answered without redoing any work even after a restart or on another
+    worker. Concurrent duplicates within a process await the same in-flight
+    call instead of starting their own.
+
+    Across workers the key is claimed before the operation runs, with a
+    ``transact(key_hash, update)`` coroutine applying :func:`reserve`
+    atomically; a duplicate arriving at another worker meanwhile polls the
+    store until the claim completes, is released, or goes stale.
+    """
+
+    def __init__(self, load, save, transact, max_entries=DEFAULT_MEMORY_ENTRIES,
+                 stale_after=DEFAULT_STALE_AFTER, poll_interval=DEFAULT_POLL_INTERVAL):
+        self._load = load
+        self._save = save
+        self._transact = transact
+        self.max_entries = max_entries
+        self.stale_after = stale_after
+        self.poll_interval = poll_interval
+        self._completed = OrderedDict()
+        self._in_flight = {}
+
+    def _remember(self, digest, record):
+        self._completed[digest] = record
+        self._completed.move_to_end(digest)
+        while len(self._completed) > self.max_entries:
+            self._completed.popitem(last=False)
+
+    @staticmethod
+    def _check(record, fingerprint):
+        if fingerprint is not None and record.get('fingerprint') not in (None, fingerprint):
+            raise IdempotencyConflict('Idempotency key reused with a different request')
+        return record['result']
+
+    async def _claim(self, digest, key, fingerprint):
+        """Claim the key: ``(None, token)`` when this call is to run the operation, else ``(record, None)``"""
+        token = uuid.uuid4().hex
+        while True:
+            claim = {'key': key, 'fingerprint': fingerprint, 'state': IN_PROGRESS, 'token': token,
+                     'startedAt': time.time()}
+            record = await self._transact(digest, reserve(claim, self.stale_after))
+            if record.get('token') == token:
+                return None, token
+            while record is not None and record.get('state') == IN_PROGRESS and not self._stale(record):
+                if fingerprint is not None and record.get('fingerprint') not in (None, fingerprint):
+                    raise IdempotencyConflict('Idempotency key reused with a different request')
+                await asyncio.sleep(self.poll_interval)
+                record = await self._load(digest)
+            if record is not None and record.get('state') != IN_PROGRESS:
+                return record, None
+            # Released after a failure, or abandoned: claim it again
+
+    def _stale(self, record):
+        return time.time() - record.get('startedAt', 0) > self.stale_after
+
+    async def run(self, key, operation, fingerprint=None):
+        """Return ``(result, replayed)``; ``operation`` is an async callable run only for a new key"""
+        digest = key_hash(key)
+
+        record = self._completed.get(digest)
+        if record is not None:
+            self._completed.move_to_end(digest)
+            return self._check(record, fingerprint), True
+
+        in_flight = self._in_flight.get(digest)
+        if in_flight is not None:
+            record = await asyncio.shield(in_flight)
+            return self._check(record, fingerprint), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[digest] = future
+        try:
+            record = await self._load(digest)
+            if record is None or record.get('state') == IN_PROGRESS:
+                record, token = await self._claim(digest, key, fingerprint)
+            replayed = record is not None
+            if not replayed:
+                try:
+                    result = await operation()
+                except BaseException:
+                    # Free the key for a retry; should this fail too, the claim goes stale
+                    await asyncio.shield(self._transact(digest, release(token)))
+                    raise
+                record = {'key': key, 'fingerprint': fingerprint, 'result': result}
+                await self._save(digest, record)
+            self._remember(digest, record)
+            future.set_result(record)
+        except BaseException as error:
+            # Waiters see the same failure; the key stays unused so a later retry can succeed
+            future.set_exception(error)
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[digest]
+
+        return self._check(record, fingerprint), replayed
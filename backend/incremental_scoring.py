@@ -0,0 +1,56 @@
+from collections import OrderedDict
+
+from scoring import answer_correctness, score_answers
+
+
+DEFAULT_MAX_SITTINGS = 20000
+
+
+class RunningScores:
+    """Correctness vectors of in-progress sittings, kept current from autosaves
+
+    Each autosave re-evaluates only the answers that changed since the
+    previous one, so by the time a candidate submits the marking is
+    already done and finalizing is just aggregation. State lives in a
+    per-process LRU: a sitting whose autosaves went to another worker is
+    simply evaluated in full at submission, which is still cheaper than
+    reading anything back from the database. Vectors computed against
+    another answer-key version are discarded.
+    """
+
+    def __init__(self, max_sittings=DEFAULT_MAX_SITTINGS):
+        self.max_sittings = max_sittings
+        self._sittings = OrderedDict()
+
+    def _previous(self, sitting_id, answer_key):
+        entry = self._sittings.get(sitting_id)
+        if entry is not None and entry[0] == answer_key.get('version'):
+            return entry[1], entry[2]
+        return None
+
+    def update(self, sitting_id, answer_key, answers):
+        """Correctness for the latest ``answers``, evaluating only what changed since the last update"""
+        correctness = answer_correctness(answer_key, answers, self._previous(sitting_id, answer_key))
+        self._sittings[sitting_id] = (answer_key.get('version'), dict(answers or {}), correctness)
+        self._sittings.move_to_end(sitting_id)
+        while len(self._sittings) > self.max_sittings:
+            self._sittings.popitem(last=False)
+        return correctness
+
+    def finalize(self, sitting_id, answer_key, answers):
+        """Full scoring result for the submitted ``answers``, reusing the running vector"""
+        correctness = self.update(sitting_id, answer_key, answers)
+        self._sittings.pop(sitting_id, None)
+        return score_answers(answer_key, answers, correctness)
+
+    def discard(self, sitting_id):
+        self._sittings.pop(sitting_id, None)
+
+
+def progress_scoring(answer_key, answers, correctness):
+    """Provisional summary saved with a progress record, for live monitoring"""
+    return {
+        'keyVersion': answer_key.get('version'),
+        'answered': sum(1 for answer in (answers or {}).values() if answer not in (None, '', [], {})),
+        'correctSoFar': sum(1 for correct in correctness.values() if correct),
+    }
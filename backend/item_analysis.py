@@ -0,0 +1,154 @@
+import math
+
+import numpy as np
+
+from response_matrix import BLANK
+from scoring import MATCHING_TYPES
+
+
+# Question types with a closed set of responses, where distractor choices are meaningful
+CLOSED_TYPES = {'mcq_single', 'mcq_multiple', 'true_false_ng'} | MATCHING_TYPES
+
+# Classical test theory conventions: top and bottom 27% of candidates by total score
+GROUP_FRACTION = 0.27
+DEFAULT_MIN_RESPONSES = 20
+EASY_FACILITY = 0.9
+HARD_FACILITY = 0.2
+LOW_DISCRIMINATION = 0.2
+
+
+def _rounded(value):
+    value = float(value)
+    return None if math.isnan(value) else round(value, 4)
+
+
+def point_biserial(correct):
+    """Corrected item-total point-biserial correlation of every column
+
+    Each item is correlated with the total of the *other* items, so it does
+    not inflate its own discrimination. NaN where a column or its rest
+    score has no variance.
+    """
+    items = correct.astype(np.float64)
+    rest = items.sum(axis=1, keepdims=True) - items
+    items -= items.mean(axis=0)
+    rest -= rest.mean(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (items * rest).sum(axis=0) / np.sqrt((items ** 2).sum(axis=0) * (rest ** 2).sum(axis=0))
+
+
+def score_groups(totals, fraction=GROUP_FRACTION):
+    """Row indexes of the lower and upper groups by total score"""
+    size = max(1, int(round(len(totals) * fraction)))
+    order = np.argsort(totals, kind='stable')
+    return order[:size], order[-size:]
+
+
+def distractor_table(matrix, column, upper, lower):
+    """Selection counts of each distinct response to a closed question, overall and per score group"""
+    codes = matrix.answers[:, column]
+    length = len(matrix.vocabulary[column]) + 1
+    counts = np.bincount(codes, minlength=length)
+    upper_counts = np.bincount(codes[upper], minlength=length)
+    lower_counts = np.bincount(codes[lower], minlength=length)
+    # A response is (part of) the key if it was ever marked correct
+    keyed = np.bincount(codes, weights=matrix.correct[:, column], minlength=length) > 0
+    rows = len(codes)
+    options = [
+        {
+            'answer': matrix.decode(column, code),
+            'isKey': bool(keyed[code]),
+            'count': int(counts[code]),
+            'proportion': _rounded(counts[code] / rows),
+            'upperProportion': _rounded(upper_counts[code] / len(upper)),
+            'lowerProportion': _rounded(lower_counts[code] / len(lower)),
+        }
+        for code in np.flatnonzero(counts[1:]) + 1
+    ]
+    options.sort(key=lambda option: -option['count'])
+    return options, int(counts[BLANK]), upper_counts, keyed
+
+
+def item_flags(facility, discrimination, miskey):
+    flags = []
+    if facility > EASY_FACILITY:
+        flags.append('too_easy')
+    elif facility < HARD_FACILITY:
+        flags.append('too_hard')
+    if discrimination is not None and discrimination < LOW_DISCRIMINATION:
+        flags.append('low_discrimination')
+    if miskey:
+        flags.append('possible_miskey')
+    return flags
+
+
+def analyze_items(matrix, min_responses=DEFAULT_MIN_RESPONSES):
+    """Per-question and per-question-type statistics of a ResponseMatrix
+
+    Facility is the proportion answering correctly; discrimination is the
+    corrected point-biserial correlation, with the upper-lower group index
+    alongside. A question is a likely miskey when its discrimination is
+    negative or a non-key response is more popular than the key among the
+    strongest candidates. Flags are only raised once ``min_responses``
+    candidates have answered. Manually marked questions are left out.
+    """
+    auto = [index for index, column in enumerate(matrix.columns) if not column['manual']]
+    rows = len(matrix)
+    items = []
+    if rows and auto:
+        correct = matrix.correct[:, auto]
+        facility = correct.mean(axis=0)
+        discrimination = point_biserial(correct)
+        totals = correct.sum(axis=1)
+        lower, upper = score_groups(totals)
+        group_index = correct[upper].mean(axis=0) - correct[lower].mean(axis=0)
+        answered = matrix.answered()[:, auto].mean(axis=0)
+
+        for position, index in enumerate(auto):
+            column = matrix.columns[index]
+            item = {
+                'questionKey': column['key'],
+                'questionType': column['type'],
+                'section': column['section'],
+                'facility': _rounded(facility[position]),
+                'discrimination': _rounded(discrimination[position]),
+                'upperLowerIndex': _rounded(group_index[position]),
+                'answeredProportion': _rounded(answered[position]),
+            }
+            miskey = item['discrimination'] is not None and item['discrimination'] < 0
+            if column['type'] in CLOSED_TYPES:
+                options, blank, upper_counts, keyed = distractor_table(matrix, index, upper, lower)
+                item['distractors'] = options
+                item['blank'] = blank
+                # The strongest candidates favour a response that is not marked correct
+                key_upper = upper_counts[keyed].sum()
+                distractor_upper = upper_counts[1:][~keyed[1:]]
+                if len(distractor_upper) and distractor_upper.max() > key_upper:
+                    miskey = True
+                    suggested = np.flatnonzero(~keyed[1:])[distractor_upper.argmax()] + 1
+                    item['suggestedKey'] = matrix.decode(index, suggested)
+            item['flags'] = item_flags(facility[position], item['discrimination'], miskey) \
+                if rows >= min_responses else []
+            items.append(item)
+
+    by_type = {}
+    for item in items:
+        summary = by_type.setdefault(item['questionType'], {'questions': 0, 'facility': [], 'discrimination': [],
+                                                            'flagged': 0})
+        summary['questions'] += 1
+        summary['facility'].append(item['facility'])
+        if item['discrimination'] is not None:
+            summary['discrimination'].append(item['discrimination'])
+        summary['flagged'] += bool(item['flags'])
+    for summary in by_type.values():
+        summary['meanFacility'] = _rounded(np.mean(summary.pop('facility')))
+        discriminations = summary.pop('discrimination')
+        summary['meanDiscrimination'] = _rounded(np.mean(discriminations)) if discriminations else None
+
+    return {
+        'examId': matrix.exam_id,
+        'keyVersion': matrix.version,
+        'candidates': rows,
+        'items': items,
+        'byType': by_type,
+    }
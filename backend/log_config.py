@@ -0,0 +1,205 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+
+DEFAULT_MAX_MESSAGE_BYTES = 4096
+DEFAULT_QUEUE_SIZE = 10000
+
+# Attributes every LogRecord has; anything else was passed through ``extra=``
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+_listener = None
+_lock = threading.Lock()
+
+
+def truncate(text, max_bytes):
+    """Cap ``text`` to ``max_bytes`` of UTF-8, noting how much was cut"""
+    encoded = text.encode('utf-8', errors='replace')
+    if max_bytes <= 0 or len(encoded) <= max_bytes:
+        return text
+    kept = encoded[:max_bytes].decode('utf-8', errors='ignore')
+    return f'{kept}... [truncated {len(encoded) - max_bytes} bytes]'
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with timestamp, level, logger, message and any ``extra`` fields"""
+
+    def format(self, record):
+        payload = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload['exc_info'] = record.exc_text
+        if getattr(record, '_dropped', 0):
+            payload['dropped_before'] = record._dropped
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """Per-logger sampling and token-bucket rate limiting
+
+    ``sampling`` maps a logger name prefix to the fraction of records kept
+    (e.g. ``{'httpx': 0.1}``) and ``rate_limits`` maps a prefix to the
+    records per second allowed, with a burst of the same size (at least
+    one record). WARNING and
+    above always pass so errors are never sampled away. The count of
+    records suppressed since the last one that passed is attached to it.
+    """
+
+    def __init__(self, sampling=None, rate_limits=None, always_level=logging.WARNING):
+        super().__init__()
+        self.sampling = dict(sampling or {})
+        self.rate_limits = dict(rate_limits or {})
+        self.always_level = always_level
+        self._buckets = {}
+        self._dropped = {}
+        self._lock = threading.Lock()
+        self._rule_cache = {}
+
+    def _rule(self, kind, rules, name):
+        # Longest matching prefix wins, "" is a catch-all
+        key = (kind, name)
+        if key not in self._rule_cache:
+            best = None
+            for prefix in rules:
+                if (name == prefix or name.startswith(prefix + '.') or prefix == '') and \
+                        (best is None or len(prefix) > len(best)):
+                    best = prefix
+            self._rule_cache[key] = best
+        return self._rule_cache[key]
+
+    def _allow(self, name):
+        prefix = self._rule('sampling', self.sampling, name)
+        if prefix is not None and random.random() >= self.sampling[prefix]:
+            return False
+
+        prefix = self._rule('rate', self.rate_limits, name)
+        if prefix is None:
+            return True
+        rate = self.rate_limits[prefix]
+        # A burst of at least one record, or rates below 1/s could never pass
+        capacity = max(rate, 1)
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(prefix, (capacity, now))
+            tokens = min(capacity, tokens + (now - last) * rate)
+            if tokens < 1:
+                self._buckets[prefix] = (tokens, now)
+                return False
+            self._buckets[prefix] = (tokens - 1, now)
+        return True
+
+    def filter(self, record):
+        allowed = record.levelno >= self.always_level or self._allow(record.name)
+        with self._lock:
+            if not allowed:
+                self._dropped[record.name] = self._dropped.get(record.name, 0) + 1
+                return False
+            dropped = self._dropped.pop(record.name, 0)
+        if dropped:
+            record._dropped = dropped
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that caps message size and drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue, max_message_bytes=DEFAULT_MAX_MESSAGE_BYTES):
+        super().__init__(log_queue)
+        self.max_message_bytes = max_message_bytes
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Only merge args here; the listener thread does the expensive formatting.
+        # Merging now means later mutation of a logged payload cannot change the record.
+        record = logging.makeLogRecord(vars(record))
+        record.msg = truncate(record.getMessage(), self.max_message_bytes)
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(level=logging.INFO, json_output=True, sampling=None, rate_limits=None,
+                      max_message_bytes=DEFAULT_MAX_MESSAGE_BYTES, queue_size=DEFAULT_QUEUE_SIZE,
+                      handlers=None, capture_loggers=('uvicorn', 'uvicorn.error', 'uvicorn.access')):
+    """Route the root logger through a bounded queue to a background listener thread
+
+    Request threads only pay for merging the message and a ``put_nowait``;
+    formatting and stream I/O happen on the listener. Loggers that install
+    their own synchronous handlers (uvicorn) are re-pointed at the queue.
+    Safe to call again, the previous listener is stopped and replaced.
+    """
+    global _listener
+
+    if handlers is None:
+        handlers = [logging.StreamHandler()]
+    formatter = JsonFormatter() if json_output else logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = NonBlockingQueueHandler(log_queue, max_message_bytes)
+    queue_handler.addFilter(RateLimitFilter(sampling, rate_limits))
+
+    with _lock:
+        shutdown_logging()
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(queue_handler)
+        root.setLevel(level)
+        for name in capture_loggers:
+            captured = logging.getLogger(name)
+            for existing in list(captured.handlers):
+                captured.removeHandler(existing)
+            captured.propagate = True
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+
+    return queue_handler
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def parse_logger_map(value, cast=float):
+    """Parse "name=value,other=value" env settings into a dict"""
+    result = {}
+    for item in (value or '').split(','):
+        name, sep, raw = item.strip().partition('=')
+        if sep:
+            result[name.strip()] = cast(raw)
+    return result
+
+
+atexit.register(shutdown_logging)
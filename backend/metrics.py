@@ -0,0 +1,274 @@
+import threading
+import time
+from bisect import bisect_left
+
+from starlette.routing import Match
+
+
+# Latency buckets in seconds, tuned for API calls that mostly sit between a
+# few milliseconds (cached reads) and a few seconds (submit + scoring)
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75,
+    1.0, 2.5, 5.0, 7.5, 10.0,
+)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Firebase operations that hit the network and are worth timing
+DB_OPERATIONS = {'get', 'set', 'update', 'push', 'delete', 'transaction', 'get_if_changed', 'set_if_unchanged'}
+
+# Query builders return new Query objects that still need wrapping
+DB_QUERY_BUILDERS = {
+    'child', 'order_by_child', 'order_by_key', 'order_by_value',
+    'equal_to', 'start_at', 'end_at', 'limit_to_first', 'limit_to_last',
+}
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for key, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+    """Cumulative-bucket histogram with bucket-interpolated quantiles"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        # Same linear interpolation as Prometheus' histogram_quantile()
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        lower = 0.0
+        for index, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if index == len(self.buckets):
+                    # Overflow bucket has no upper bound, report the last finite one
+                    return self.buckets[-1]
+                upper = self.buckets[index]
+                return lower + (upper - lower) * ((rank - cumulative) / bucket_count)
+            cumulative += bucket_count
+            if index < len(self.buckets):
+                lower = self.buckets[index]
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """Thread-safe store for counters, gauges and histograms keyed by label tuples"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self._lock = threading.Lock()
+        self._buckets = buckets
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._help = {}
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def inc(self, name, labels=(), amount=1):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0) + amount
+
+    def gauge_add(self, name, labels=(), amount=1):
+        with self._lock:
+            series = self._gauges.setdefault(name, {})
+            series[labels] = series.get(labels, 0) + amount
+
+    def gauge_set(self, name, value, labels=()):
+        with self._lock:
+            self._gauges.setdefault(name, {})[labels] = value
+
+    def observe(self, name, value, labels=()):
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = Histogram(self._buckets)
+            histogram.observe(value)
+
+    def histogram(self, name, labels=()):
+        with self._lock:
+            return self._histograms.get(name, {}).get(labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def render(self):
+        """Render every series in the Prometheus text exposition format (0.0.4)"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                self._render_header(lines, name, 'counter')
+                for labels, value in sorted(series.items()):
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+            for name, series in sorted(self._gauges.items()):
+                self._render_header(lines, name, 'gauge')
+                for labels, value in sorted(series.items()):
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+            for name, series in sorted(self._histograms.items()):
+                self._render_header(lines, name, 'histogram')
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    bounds = list(histogram.buckets) + [float('inf')]
+                    for bound, bucket_count in zip(bounds, histogram.counts):
+                        cumulative += bucket_count
+                        bucket_labels = labels + (('le', _format_value(bound)),)
+                        lines.append(f'{name}_bucket{_format_labels(bucket_labels)} {cumulative}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {histogram.count}')
+
+                # Pre-computed percentiles so the tail is readable without PromQL
+                quantile_name = f'{name}_quantile'
+                lines.append(f'# TYPE {quantile_name} gauge')
+                for labels, histogram in sorted(series.items()):
+                    for q in QUANTILES:
+                        quantile_labels = labels + (('quantile', str(q)),)
+                        value = histogram.quantile(q)
+                        lines.append(f'{quantile_name}{_format_labels(quantile_labels)} {_format_value(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+    def _render_header(self, lines, name, metric_type):
+        if name in self._help:
+            lines.append(f'# HELP {name} {self._help[name]}')
+        lines.append(f'# TYPE {name} {metric_type}')
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe('http_requests_total', 'HTTP requests by route, method and status code')
+REGISTRY.describe('http_requests_in_flight', 'HTTP requests currently being served')
+REGISTRY.describe('http_request_duration_seconds', 'HTTP request latency by route')
+REGISTRY.describe('db_operations_total', 'Firebase database operations by node, operation and outcome')
+REGISTRY.describe('db_operation_duration_seconds', 'Firebase database operation latency')
+
+
+def find_router(app):
+    """Walk down a middleware stack to the innermost app that owns the routes"""
+    while not hasattr(app, 'routes') and hasattr(app, 'app'):
+        app = app.app
+    return app
+
+
+def route_template(app, scope):
+    """Return the matched route path (e.g. /api/exams/{exam_id}) to keep label cardinality bounded"""
+    for route in getattr(app, 'routes', ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, 'path', scope['path'])
+    return 'unmatched'
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, in-flight gauges and latency per route"""
+
+    def __init__(self, app, registry=REGISTRY):
+        self.app = app
+        self.registry = registry
+        self._router = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        if self._router is None:
+            self._router = find_router(self.app)
+
+        route = route_template(self._router, scope)
+        method = scope['method']
+        status_holder = {'status': 500}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status_holder['status'] = message['status']
+            await send(message)
+
+        in_flight_labels = (('route', route),)
+        self.registry.gauge_add('http_requests_in_flight', in_flight_labels, 1)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.registry.gauge_add('http_requests_in_flight', in_flight_labels, -1)
+            self.registry.inc(
+                'http_requests_total',
+                (('method', method), ('route', route), ('status', str(status_holder['status']))),
+            )
+            self.registry.observe(
+                'http_request_duration_seconds', elapsed, (('method', method), ('route', route))
+            )
+
+
+class InstrumentedReference:
+    """Proxy around a firebase_admin Reference/Query that times every database call"""
+
+    def __init__(self, target, node, registry=REGISTRY):
+        self._target = target
+        self._node = node
+        self._registry = registry
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        if name in DB_QUERY_BUILDERS:
+            def build(*args, **kwargs):
+                return InstrumentedReference(attr(*args, **kwargs), self._node, self._registry)
+            return build
+
+        if name in DB_OPERATIONS:
+            def timed(*args, **kwargs):
+                outcome = 'ok'
+                start = time.perf_counter()
+                try:
+                    return attr(*args, **kwargs)
+                except Exception:
+                    outcome = 'error'
+                    raise
+                finally:
+                    elapsed = time.perf_counter() - start
+                    labels = (('node', self._node), ('op', name))
+                    self._registry.inc('db_operations_total', labels + (('outcome', outcome),))
+                    self._registry.observe('db_operation_duration_seconds', elapsed, labels)
+            return timed
+
+        return attr
+
+
+def instrument_reference(ref, path, registry=REGISTRY):
+    """Wrap a database reference, labelling timings by the top-level node of ``path``"""
+    node = path.strip('/').split('/', 1)[0] or 'root'
+    return InstrumentedReference(ref, node, registry)
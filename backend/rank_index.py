@@ -0,0 +1,144 @@
+class FenwickTree:
+    """Binary indexed tree of counts over the integer scores ``0 .. size - 1``
+
+    ``tree`` is the 1-based array itself (``tree[0]`` is unused), so it can
+    be stored as-is and updated in a database transaction: recording a
+    score touches O(log size) entries, and counting, ranking and finding
+    the k-th score read O(log size) entries, however many submissions
+    were counted.
+    """
+
+    def __init__(self, size=0, tree=None):
+        self.tree = [count or 0 for count in tree] if tree else [0] * (size + 1)
+
+    @classmethod
+    def from_counts(cls, counts):
+        # O(size) construction: each node passes its partial sum to its parent
+        tree = cls(len(counts))
+        for index, count in enumerate(counts, start=1):
+            tree.tree[index] += count
+            parent = index + (index & -index)
+            if parent <= len(counts):
+                tree.tree[parent] += tree.tree[index]
+        return tree
+
+    @property
+    def size(self):
+        return len(self.tree) - 1
+
+    def add(self, score, delta=1):
+        index = score + 1
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+
+    def count_below(self, score):
+        """Number of counted scores strictly below ``score``"""
+        total, index = 0, min(max(score, 0), self.size)
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+    def total(self):
+        return self.count_below(self.size)
+
+    def count_at(self, score):
+        return self.count_below(score + 1) - self.count_below(score)
+
+    def kth_smallest(self, k):
+        """Score of the k-th smallest counted score (1-based), by binary lifting"""
+        position, step = 0, 1 << self.size.bit_length()
+        while step:
+            if position + step <= self.size and self.tree[position + step] < k:
+                position += step
+                k -= self.tree[position]
+            step >>= 1
+        return position
+
+    def counts(self):
+        return [self.count_at(score) for score in range(self.size)]
+
+    def resized(self, size):
+        """A tree over ``0 .. size - 1``; scores that no longer fit are counted in the top slot"""
+        counts = self.counts()
+        if len(counts) > size:
+            counts = counts[:size - 1] + [sum(counts[size - 1:])]
+        return FenwickTree.from_counts(counts + [0] * (size - len(counts)))
+
+
+def member_key(score):
+    # Zero-padded with a prefix: sorts by score under orderByKey and is never read back as an array
+    return f's{score:04d}'
+
+
+def clamp_score(score, size):
+    return min(max(int(score or 0), 0), size - 1)
+
+
+def record_score(tree, score, size, delta=1):
+    """Transaction update for a stored tree (``None`` before the first score)"""
+    return record_scores(tree, [score], size, delta)
+
+
+def record_scores(tree, scores, size, delta=1):
+    """Transaction update adding a batch of scores to a stored tree"""
+    fenwick = FenwickTree(tree=tree) if tree else FenwickTree(size)
+    if fenwick.size != size:
+        fenwick = fenwick.resized(size)
+    for score in scores:
+        fenwick.add(clamp_score(score, size), delta)
+    return fenwick.tree
+
+
+def percentile_rank(fenwick, score):
+    """Where ``score`` stands among the counted scores; None when nothing is counted
+
+    The percentile counts ties as half below, so the median scores 50;
+    ``rank`` is the competition rank (1 + number of higher scores).
+    """
+    total = fenwick.total()
+    if not total:
+        return None
+    score = clamp_score(score, fenwick.size)
+    below, equal = fenwick.count_below(score), fenwick.count_at(score)
+    return {
+        'score': score,
+        'count': total,
+        'rank': total - below - equal + 1,
+        'percentile': round((below + equal / 2) / total * 100, 1),
+    }
+
+
+def top_threshold(fenwick, limit):
+    """Lowest score that still places within the top ``limit``, or None if nothing is counted"""
+    total = fenwick.total()
+    if not total or limit < 1:
+        return None
+    return fenwick.kth_smallest(max(1, total - limit + 1))
+
+
+def top_entries(fenwick, members, limit):
+    """Leaderboard rows from the members of the top score buckets (``{member_key: {submissionId: studentId}}``)"""
+    total = fenwick.total()
+    entries = []
+    for key in sorted(members or {}, reverse=True):
+        score = int(key[1:])
+        rank = total - fenwick.count_below(score + 1) + 1
+        for submission_id in sorted(members[key]):
+            entries.append({'rank': rank, 'score': score, 'submissionId': submission_id,
+                            'studentId': members[key][submission_id]})
+    return entries[:limit]
+
+
+def build_rank_index(submissions, size):
+    """Tree and score buckets from scratch over ``(submission_id, submission)`` pairs; unscored ones are skipped"""
+    counts = [0] * size
+    members = {}
+    for submission_id, submission in submissions:
+        if not submission or not submission.get('scored'):
+            continue
+        score = clamp_score(submission.get('totalCorrect'), size)
+        counts[score] += 1
+        members.setdefault(member_key(score), {})[submission_id] = submission.get('studentId') or ''
+    return {'fenwick': FenwickTree.from_counts(counts).tree, 'members': members}
@@ -0,0 +1,166 @@
+from result_encoding import compact_score, encode_results, expand_results, is_compact
+from scoring import (
+    exam_questions, is_manually_marked, lookup_answer, overall_from_sections, question_key, score_answers,
+    score_question, summarize_sections,
+)
+
+
+# Submissions per multi-path database update
+DEFAULT_BATCH_SIZE = 250
+
+
+def _as_list(value):
+    # RTDB returns arrays with missing indexes as objects
+    if isinstance(value, dict):
+        return [value.get(key) for key in sorted(value, key=lambda k: int(k) if str(k).isdigit() else k)]
+    return list(value or [])
+
+
+def stored_form(value):
+    """``value`` as the database would return it: None-valued fields and empty objects dropped"""
+    if isinstance(value, dict):
+        pruned = {key: stored_form(child) for key, child in value.items()}
+        return {key: child for key, child in pruned.items() if child is not None} or None
+    if isinstance(value, list):
+        return [stored_form(child) for child in value]
+    return value
+
+
+def diff_answer_keys(old_key, new_key):
+    """Keys of questions whose scoring changed between two compiled answer keys, or None if the layout changed
+
+    A changed layout (questions added, removed or reordered) means stored
+    questionResults no longer line up and submissions need a full rescore.
+    """
+    old_questions, new_questions = exam_questions(old_key), exam_questions(new_key)
+    if [question_key(q) for q in old_questions] != [question_key(q) for q in new_questions]:
+        return None
+    return {
+        question_key(new) for old, new in zip(old_questions, new_questions)
+        if stored_form(old) != stored_form(new)
+    }
+
+
+def key_version_groups(submissions):
+    """``(submission_id, submission)`` pairs grouped by the answer-key version they were scored against
+
+    Compact results record their version; full questionResults written by
+    the Node functions and unscored submissions do not, and group under None.
+    """
+    groups = {}
+    for submission_id, submission in submissions:
+        version = (submission.get('results') or {}).get('keyVersion') if is_compact(submission) else None
+        groups.setdefault(version, []).append((submission_id, submission))
+    return groups
+
+
+def rescore_submission(answer_key, submission, changed=None, rescored_at=None):
+    """Minimal field updates (paths relative to the submission) bringing it in line with ``answer_key``
+
+    Only questions in ``changed`` (all when None) are re-marked, and only
+    results, sections and totals that actually differ are written. Compact
+    results (see result_encoding) are rewritten whole, as they are a few
+    bytes; full questionResults written by the Node functions are updated
+    entry by entry. Unscored submissions and ones whose results do not
+    line up with the key's questions are scored in full, in compact form.
+    Manually marked questions are never re-marked: points a reviewer
+    awarded (``results.points``) are kept.
+    """
+    questions = exam_questions(answer_key)
+    answers = submission.get('answers') or {}
+    scored = submission.get('scored')
+
+    if is_compact(submission):
+        if not scored or submission['results'].get('count') != len(questions):
+            return _full_rescore(answer_key, answers, rescored_at, reviewed_points(answer_key, submission))
+        # Expanded against the new key, unchanged questions keep their stored marks
+        results = expand_results(answer_key, submission['results'], answers)
+        for index, question in enumerate(questions):
+            if is_manually_marked(question):
+                continue
+            if changed is None or question_key(question) in changed:
+                results[index] = score_question(question, lookup_answer(answers, question))
+        compact = encode_results(answer_key, results)
+        if stored_form(compact) == stored_form(submission['results']):
+            return {}
+        return _summary_updates(submission, results, questions, {'results': compact}, rescored_at)
+
+    results = _as_list(submission.get('questionResults'))
+    aligned = scored and len(results) == len(questions) and all(
+        isinstance(result, dict) and result.get('questionId') == question.get('id')
+        for result, question in zip(results, questions)
+    )
+    if not aligned:
+        return _full_rescore(answer_key, answers, rescored_at, reviewed_points(answer_key, submission))
+
+    updates = {}
+    for index, question in enumerate(questions):
+        if is_manually_marked(question) or changed is not None and question_key(question) not in changed:
+            continue
+        result = score_question(question, lookup_answer(answers, question))
+        if stored_form(result) != stored_form(results[index]):
+            results[index] = result
+            updates[f'questionResults/{index}'] = result
+    if not updates:
+        return {}
+    return _summary_updates(submission, results, questions, updates, rescored_at)
+
+
+def reviewed_points(answer_key, submission):
+    """Points reviewers awarded to the key's manually marked questions, by question key"""
+    results = submission.get('results')
+    points = (results.get('points') if isinstance(results, dict) else None) or {}
+    return {
+        question_key(question): points[question_key(question)]
+        for question in exam_questions(answer_key)
+        if is_manually_marked(question) and question_key(question) in points
+    }
+
+
+def _full_rescore(answer_key, answers, rescored_at, reviewed=None):
+    # Replaces any full questionResults with the compact form
+    questions = exam_questions(answer_key)
+    scored = score_answers(answer_key, answers)
+    if reviewed:
+        for question, result in zip(questions, scored['questionResults']):
+            if question_key(question) in reviewed:
+                result['points'] = reviewed[question_key(question)]
+        scored['sectionScores'] = summarize_sections(scored['questionResults'], questions)
+    return {
+        'scored': True,
+        'scoredAt': rescored_at,
+        'questionResults': None,
+        **compact_score(answer_key, scored),
+    }
+
+
+def _summary_updates(submission, results, questions, updates, rescored_at):
+    """Add the section and total fields that ``results`` changed to ``updates``"""
+    section_scores = summarize_sections(results, questions)
+    stored_sections = submission.get('sectionScores') or {}
+    for section, scores in section_scores.items():
+        if stored_form(scores) != stored_form(stored_sections.get(section)):
+            updates[f'sectionScores/{section}'] = scores
+    for field, value in overall_from_sections(section_scores, len(questions)).items():
+        if submission.get(field) != value:
+            updates[field] = value
+    updates['rescoredAt'] = rescored_at
+    return updates
+
+
+def rescore_batches(answer_key, submissions, changed=None, rescored_at=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield root-level multi-path updates covering every submission that needs one"""
+    batch = {}
+    in_batch = 0
+    for submission_id, submission in submissions:
+        updates = rescore_submission(answer_key, submission, changed, rescored_at)
+        if not updates:
+            continue
+        for path, value in updates.items():
+            batch[f'submissions/{submission_id}/{path}'] = value
+        in_batch += 1
+        if in_batch >= batch_size:
+            yield batch, in_batch
+            batch, in_batch = {}, 0
+    if batch:
+        yield batch, in_batch
@@ -0,0 +1,367 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines run a single worker
+    fcntl = None
+
+from scoring import (
+    answer_correctness, exam_questions, is_answer_correct, is_manually_marked, lookup_answer, question_key,
+)
+
+
+DEFAULT_CAPACITY = 256
+
+# answers[i, j] == BLANK for an unanswered question, otherwise 1 + the index
+# of the raw answer in the column's vocabulary
+BLANK = 0
+ANSWER_DTYPE = np.int32
+CORRECT_DTYPE = np.int8
+
+_PLAIN_ID = re.compile(r'^[A-Za-z0-9_-]{1,100}$')
+
+
+def encode_answer(answer):
+    # Raw answers (option ids, free text, option lists, matching objects) as canonical JSON
+    return json.dumps(answer, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def matrix_columns(answer_key):
+    """Per-question column descriptions of a compiled answer key, in exam order"""
+    return [
+        {
+            'key': question_key(question),
+            'type': question.get('type'),
+            'section': question.get('section') or 'Unknown',
+            'maxPoints': question.get('points') or 1,
+            'manual': is_manually_marked(question),
+        }
+        for question in exam_questions(answer_key)
+    ]
+
+
+class ResponseMatrix:
+    """Snapshot of one exam's scored responses: row i is a submission, column j a question
+
+    ``answers`` holds answer codes (see BLANK) and ``correct`` 1 for a
+    correct answer, both ``rows x questions``; ``vocabulary[j]`` lists the
+    distinct raw answers of column j as canonical JSON. Cross-student
+    questions become column operations, e.g. facility values are
+    ``correct.mean(axis=0)``.
+    """
+
+    def __init__(self, exam_id, version, columns, submission_ids, student_ids, answers, correct, vocabulary):
+        self.exam_id = exam_id
+        self.version = version
+        self.columns = columns
+        self.submission_ids = submission_ids
+        self.student_ids = student_ids
+        self.answers = answers
+        self.correct = correct
+        self.vocabulary = vocabulary
+
+    def __len__(self):
+        return len(self.submission_ids)
+
+    def column(self, key):
+        return next(index for index, column in enumerate(self.columns) if column['key'] == key)
+
+    def decode(self, column, code):
+        return None if code == BLANK else json.loads(self.vocabulary[column][code - 1])
+
+    def answered(self):
+        return self.answers != BLANK
+
+    def raw_scores(self):
+        return self.correct.sum(axis=1, dtype=np.int32)
+
+
+class _ExamMatrix:
+    """A process's view of one exam's files, refreshed from disk under the exam lock"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.stamp = None
+        self.meta = None
+        self.answers = None
+        self.correct = None
+        self.rows = []
+        self.row_index = {}
+        self.vocabulary = []
+        self.vocabulary_index = []
+        self.offset = 0
+
+    def reset(self, meta, stamp):
+        self.meta = meta
+        self.stamp = stamp
+        self.answers = np.lib.format.open_memmap(self.directory / 'answers.npy', mode='r+')
+        self.correct = np.lib.format.open_memmap(self.directory / 'correct.npy', mode='r+')
+        self.rows = []
+        self.row_index = {}
+        self.vocabulary = [[] for _ in meta['columns']]
+        self.vocabulary_index = [{} for _ in meta['columns']]
+        self.offset = 0
+
+    def add_answer(self, column, encoded):
+        self.vocabulary_index[column][encoded] = len(self.vocabulary[column]) + 1
+        self.vocabulary[column].append(encoded)
+
+    def read_log(self):
+        # Rows committed by any process since this one last looked; a torn final line is not committed
+        with open(self.directory / 'rows.ndjson', 'rb') as log:
+            log.seek(self.offset)
+            data = log.read()
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            row = json.loads(line)
+            for column, encoded in row.get('vocabulary', []):
+                self.add_answer(column, encoded)
+            self.row_index[row['id']] = len(self.rows)
+            self.rows.append((row['id'], row.get('studentId')))
+        self.offset += end
+
+
+class ResponseMatrixStore:
+    """Per-exam students x questions matrices of answers and correctness, as ``.npy`` files
+
+    Each exam has a directory holding ``answers.npy`` and ``correct.npy``
+    (preallocated, doubled when full, memory-mapped), ``meta.json`` with the
+    columns and answer-key version, and ``rows.ndjson``, an append-only log
+    with one line per row: its submission and student ids and any answers
+    the row added to the column vocabularies. A row exists once its log
+    line is written. Workers on the host share the files under a per-exam
+    ``flock`` and pick up each other's rows from the log. The matrices are
+    derived data: ``rebuild`` recreates them from the stored submissions.
+    """
+
+    def __init__(self, directory, capacity=DEFAULT_CAPACITY):
+        self.directory = Path(directory)
+        self.capacity = capacity
+        self._exams = {}
+        self._lock = threading.Lock()
+
+    def _exam_directory(self, exam_id):
+        if _PLAIN_ID.match(exam_id):
+            return self.directory / exam_id
+        return self.directory / hashlib.sha1(exam_id.encode('utf-8')).hexdigest()
+
+    def _locked(self, exam_id, create=False):
+        """Open the exam's lock file and take the cross-process lock, or None if nothing is stored yet"""
+        directory = self._exam_directory(exam_id)
+        if create:
+            directory.mkdir(parents=True, exist_ok=True)
+        elif not directory.is_dir():
+            return None
+        lock_file = open(directory / 'lock', 'a+b')
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def _refresh(self, exam_id):
+        """The exam's state brought up to date with the files, or None if it has no matrix"""
+        directory = self._exam_directory(exam_id)
+        try:
+            stat = os.stat(directory / 'meta.json')
+        except FileNotFoundError:
+            self._exams.pop(exam_id, None)
+            return None
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        state = self._exams.get(exam_id)
+        if state is None or state.stamp != stamp:
+            # Growth, rekeying and rebuilds replace meta.json, so any change means remapping
+            state = _ExamMatrix(directory)
+            state.reset(json.loads((directory / 'meta.json').read_text()), stamp)
+            self._exams[exam_id] = state
+        state.read_log()
+        return state
+
+    def _write_meta(self, state, meta):
+        path = state.directory / 'meta.json'
+        temporary = state.directory / 'meta.json.tmp'
+        temporary.write_text(json.dumps(meta))
+        os.replace(temporary, path)
+        stat = os.stat(path)
+        state.meta = meta
+        state.stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _allocate(self, directory, capacity, width, previous=None, rows=0):
+        arrays = []
+        for name, dtype in (('answers', ANSWER_DTYPE), ('correct', CORRECT_DTYPE)):
+            temporary = directory / f'{name}.npy.tmp'
+            array = np.lib.format.open_memmap(temporary, mode='w+', dtype=dtype, shape=(capacity, width))
+            if previous is not None and rows:
+                array[:rows] = getattr(previous, name)[:rows]
+            array.flush()
+            del array
+            os.replace(temporary, directory / f'{name}.npy')
+            arrays.append(np.lib.format.open_memmap(directory / f'{name}.npy', mode='r+'))
+        return arrays
+
+    def _create(self, exam_id, answer_key):
+        directory = self._exam_directory(exam_id)
+        columns = matrix_columns(answer_key)
+        state = _ExamMatrix(directory)
+        state.answers, state.correct = self._allocate(directory, self.capacity, len(columns))
+        with open(directory / 'rows.ndjson', 'wb'):
+            pass
+        state.vocabulary = [[] for _ in columns]
+        state.vocabulary_index = [{} for _ in columns]
+        # A fresh id so other processes remap even if the new meta.json looks like the old one
+        self._write_meta(state, {
+            'examId': exam_id,
+            'id': uuid.uuid4().hex,
+            'version': answer_key.get('version'),
+            'columns': columns,
+            'capacity': self.capacity,
+        })
+        self._exams[exam_id] = state
+        return state
+
+    def _grow(self, state):
+        capacity = state.meta['capacity'] * 2
+        state.answers, state.correct = self._allocate(
+            state.directory, capacity, len(state.meta['columns']), previous=state, rows=len(state.rows)
+        )
+        self._write_meta(state, {**state.meta, 'capacity': capacity})
+
+    def _rekey(self, state, answer_key):
+        # Each distinct answer is re-marked once, then the column is a table lookup
+        rows = len(state.rows)
+        for index, question in enumerate(exam_questions(answer_key)):
+            if state.meta['columns'][index]['manual']:
+                continue
+            table = np.zeros(len(state.vocabulary[index]) + 1, dtype=CORRECT_DTYPE)
+            for code, encoded in enumerate(state.vocabulary[index], start=1):
+                table[code] = is_answer_correct(question, json.loads(encoded))
+            state.correct[:rows, index] = table[state.answers[:rows, index]]
+        state.correct.flush()
+        self._write_meta(state, {**state.meta, 'version': answer_key.get('version')})
+
+    def _prepare(self, exam_id, answer_key):
+        # Current state for appending against ``answer_key``: a new layout starts over, a new version is re-marked
+        state = self._refresh(exam_id)
+        if state is None or [c['key'] for c in state.meta['columns']] != [c['key'] for c in matrix_columns(answer_key)]:
+            return self._create(exam_id, answer_key)
+        if state.meta['version'] != answer_key.get('version'):
+            self._rekey(state, answer_key)
+        return state
+
+    def _add_row(self, state, answer_key, submission_id, student_id, answers, question_results=None):
+        """Fill the next matrix row and return its log line (not yet written)"""
+        questions = exam_questions(answer_key)
+        if question_results is not None and len(question_results) == len(questions):
+            flags = [bool(result and result.get('isCorrect')) for result in question_results]
+        else:
+            correctness = answer_correctness(answer_key, answers)
+            flags = [correctness[question_key(question)] for question in questions]
+
+        if len(state.rows) == state.meta['capacity']:
+            self._grow(state)
+        row = len(state.rows)
+        added = []
+        codes = np.zeros(len(questions), dtype=ANSWER_DTYPE)
+        for index, question in enumerate(questions):
+            answer = lookup_answer(answers or {}, question)
+            if answer is None:
+                continue
+            encoded = encode_answer(answer)
+            code = state.vocabulary_index[index].get(encoded)
+            if code is None:
+                state.add_answer(index, encoded)
+                code = len(state.vocabulary[index])
+                added.append([index, encoded])
+            codes[index] = code
+        state.answers[row] = codes
+        state.correct[row] = flags
+        state.row_index[submission_id] = row
+        state.rows.append((submission_id, student_id))
+
+        line = {'id': submission_id, 'studentId': student_id}
+        if added:
+            line['vocabulary'] = added
+        return json.dumps(line, ensure_ascii=False).encode('utf-8') + b'\n'
+
+    def _commit(self, state, lines):
+        state.answers.flush()
+        state.correct.flush()
+        with open(state.directory / 'rows.ndjson', 'ab') as log:
+            log.write(b''.join(lines))
+        state.offset += sum(len(line) for line in lines)
+
+    def append(self, exam_id, answer_key, submission_id, student_id, answers, question_results=None):
+        """Add a scored submission's row; False if it is already in the matrix
+
+        ``question_results`` (the scoring result's list) supplies
+        correctness without evaluating the answers again.
+        """
+        with self._lock:
+            lock_file = self._locked(exam_id, create=True)
+            try:
+                state = self._prepare(exam_id, answer_key)
+                if submission_id in state.row_index:
+                    return False
+                line = self._add_row(state, answer_key, submission_id, student_id, answers, question_results)
+                self._commit(state, [line])
+                return True
+            finally:
+                lock_file.close()
+
+    def rekey(self, exam_id, answer_key):
+        """Re-mark stored rows against a corrected answer key; a changed layout drops the matrix"""
+        with self._lock:
+            lock_file = self._locked(exam_id)
+            if lock_file is None:
+                return
+            try:
+                self._prepare(exam_id, answer_key)
+            finally:
+                lock_file.close()
+
+    def rebuild(self, exam_id, answer_key, submissions):
+        """Recreate the matrix from ``(submission_id, submission)`` pairs; only scored ones are added"""
+        with self._lock:
+            lock_file = self._locked(exam_id, create=True)
+            try:
+                state = self._create(exam_id, answer_key)
+                lines = [
+                    self._add_row(state, answer_key, submission_id, submission.get('studentId'),
+                                  submission.get('answers'))
+                    for submission_id, submission in submissions
+                    if submission and submission.get('scored') and submission_id not in state.row_index
+                ]
+                self._commit(state, lines)
+                return len(lines)
+            finally:
+                lock_file.close()
+
+    def load(self, exam_id):
+        """A ResponseMatrix snapshot (copies, unaffected by later appends), or None"""
+        with self._lock:
+            lock_file = self._locked(exam_id)
+            if lock_file is None:
+                return None
+            try:
+                state = self._refresh(exam_id)
+                if state is None:
+                    return None
+                rows = len(state.rows)
+                return ResponseMatrix(
+                    exam_id,
+                    state.meta['version'],
+                    state.meta['columns'],
+                    [row[0] for row in state.rows],
+                    [row[1] for row in state.rows],
+                    np.array(state.answers[:rows]),
+                    np.array(state.correct[:rows]),
+                    [list(vocabulary) for vocabulary in state.vocabulary],
+                )
+            finally:
+                lock_file.close()
@@ -0,0 +1,68 @@
+import base64
+
+from scoring import exam_questions, lookup_answer, question_key, score_question
+
+
+def pack_bits(flags):
+    """Base64 bitset, bit i (least significant first) set when ``flags[i]`` is true"""
+    flags = list(flags)
+    packed = bytearray((len(flags) + 7) // 8)
+    for index, flag in enumerate(flags):
+        if flag:
+            packed[index >> 3] |= 1 << (index & 7)
+    return base64.b64encode(bytes(packed)).decode('ascii')
+
+
+def unpack_bits(encoded, length):
+    packed = base64.b64decode(encoded or '')
+    return [index >> 3 < len(packed) and bool(packed[index >> 3] >> (index & 7) & 1) for index in range(length)]
+
+
+def encode_results(answer_key, question_results):
+    """Compact stored form of score_answers' questionResults
+
+    Everything in a full result but correctness and points is either in
+    the answer key (type, correctAnswer, maxPoints, feedback wording) or in
+    the submission (userAnswer), so only a correctness bitset, the key
+    version to expand against and any points that differ from the default
+    (maxPoints when correct, otherwise 0) are kept.
+    """
+    questions = exam_questions(answer_key)
+    compact = {
+        'keyVersion': answer_key.get('version'),
+        'count': len(question_results),
+        'correct': pack_bits(result['isCorrect'] for result in question_results),
+    }
+    points = {
+        question_key(question): result['points']
+        for question, result in zip(questions, question_results)
+        if result['points'] != (result['maxPoints'] if result['isCorrect'] else 0)
+    }
+    if points:
+        compact['points'] = points
+    return compact
+
+
+def expand_results(answer_key, compact, answers):
+    """questionResults exactly as score_answers produced them, from the compact form and the key it names"""
+    questions = exam_questions(answer_key)
+    flags = unpack_bits(compact.get('correct'), len(questions))
+    points = compact.get('points') or {}
+    results = []
+    for question, is_correct in zip(questions, flags):
+        result = score_question(question, lookup_answer(answers or {}, question), is_correct)
+        if question_key(question) in points:
+            result['points'] = points[question_key(question)]
+        results.append(result)
+    return results
+
+
+def compact_score(answer_key, scored):
+    """A score_answers result as stored on a submission: questionResults replaced by ``results``"""
+    stored = {field: value for field, value in scored.items() if field != 'questionResults'}
+    stored['results'] = encode_results(answer_key, scored['questionResults'])
+    return stored
+
+
+def is_compact(submission):
+    return isinstance(submission.get('results'), dict) and 'correct' in submission['results']
@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta, timezone
+
+from scoring import exam_questions, is_manually_marked, lookup_answer, question_key
+
+
+DEFAULT_LEASE_SECONDS = 1800
+# Due time of scripts whose exam sets no review_deadline
+DEFAULT_REVIEW_TARGET_HOURS = 72
+# Candidates fetched per claimed item, to absorb races with other markers
+CLAIM_OVERFETCH = 2
+
+QUEUE = 'review_queue'
+
+
+class LeaseConflict(Exception):
+    """The item is leased to another reviewer, already marked, or gone"""
+
+
+def item_id(submission_id, key):
+    return f'{submission_id}_{key}'
+
+
+def _due_time(value):
+    """``value`` (a datetime or ISO string; naive means UTC) as a fixed-width UTC string, None if unparseable"""
+    if not value:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat(timespec='seconds')
+
+
+def review_items(answer_key, submission, target_hours=DEFAULT_REVIEW_TARGET_HOURS):
+    """Queue items for a submission's answered, manually marked questions, keyed by item id
+
+    Items carry the response and its text statistics so a marker's batch
+    needs no further reads. ``priority`` orders the queue: the exam's review deadline (or
+    the submission time plus ``target_hours``), then the submission time,
+    so scripts due first and, among those, the oldest come out first.
+    Due times are fixed-width UTC strings so that the priorities sort as times.
+    """
+    submitted_at = submission.get('submittedAt') or datetime.now(timezone.utc).isoformat()
+    due = _due_time(answer_key.get('reviewDeadline')) or _due_time(
+        datetime.fromisoformat(submitted_at) + timedelta(hours=target_hours)
+    )
+    items = {}
+    for question in exam_questions(answer_key):
+        if not is_manually_marked(question):
+            continue
+        response = lookup_answer(submission.get('answers') or {}, question)
+        if not response:
+            continue
+        key = question_key(question)
+        item = items[item_id(submission['id'], key)] = {
+            'submissionId': submission['id'],
+            'examId': submission.get('examId'),
+            'studentId': submission.get('studentId'),
+            'questionKey': key,
+            'questionType': question.get('type'),
+            'response': response,
+            'submittedAt': submitted_at,
+            'due': due,
+            'priority': f'{due}|{submitted_at}',
+            'status': 'pending',
+        }
+        if (submission.get('textStats') or {}).get(key):
+            item['textStats'] = submission['textStats'][key]
+    return items
+
+
+def enqueue_writes(items):
+    """Multi-path writes adding items to the queue and its pending index"""
+    writes = {}
+    for identifier, item in items.items():
+        writes[f'{QUEUE}/items/{identifier}'] = item
+        writes[f'{QUEUE}/pending/{identifier}'] = item['priority']
+    return writes
+
+
+def lease_holder(item, now):
+    """Reviewer holding an unexpired lease on ``item``, or None"""
+    if item and item.get('status') == 'claimed' and item.get('leaseExpiresAt', 0) > now:
+        return item.get('claimedBy')
+    return None
+
+
+def claim(reviewer, now, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """Transaction update leasing an item to ``reviewer``; raises LeaseConflict if someone else holds it
+
+    Run as a database transaction on the item, so of two markers racing
+    for the same script exactly one gets it. A reviewer claiming an item
+    they already hold renews the lease.
+    """
+    def update(item):
+        if not item or item.get('status') == 'done':
+            raise LeaseConflict('Item is no longer queued')
+        holder = lease_holder(item, now)
+        if holder is not None and holder != reviewer:
+            raise LeaseConflict(f'Item is leased to {holder}')
+        return {**item, 'status': 'claimed', 'claimedBy': reviewer, 'leaseExpiresAt': now + lease_seconds}
+    return update
+
+
+def renew(reviewer, now, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """Transaction update extending ``reviewer``'s lease; unlike ``claim`` it never takes a new one"""
+    def update(item):
+        if lease_holder(item, now) != reviewer:
+            raise LeaseConflict('Item is not leased to this reviewer')
+        return {**item, 'leaseExpiresAt': now + lease_seconds}
+    return update
+
+
+def _unleased(item):
+    pending = {key: value for key, value in item.items() if key not in ('claimedBy', 'leaseExpiresAt')}
+    pending['status'] = 'pending'
+    return pending
+
+
+def release(reviewer, now):
+    """Transaction update handing an item back to the queue"""
+    def update(item):
+        if lease_holder(item, now) != reviewer:
+            raise LeaseConflict('Item is not leased to this reviewer')
+        return _unleased(item)
+    return update
+
+
+def expire(now):
+    """Transaction update returning an item with a lapsed lease to the queue"""
+    def update(item):
+        if not item or item.get('status') != 'claimed' or lease_holder(item, now) is not None:
+            raise LeaseConflict('Lease is still held or item is gone')
+        return _unleased(item)
+    return update
+
+
+def complete(reviewer, now):
+    """Transaction update marking an item done; only the lease holder may, while the lease lasts"""
+    def update(item):
+        if lease_holder(item, now) != reviewer:
+            raise LeaseConflict('Item is not leased to this reviewer')
+        return {**item, 'status': 'done'}
+    return update
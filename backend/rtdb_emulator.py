@@ -0,0 +1,446 @@
+import copy
+import json
+import logging
+import random
+import string
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from firebase_admin import exceptions
+from firebase_admin.db import TransactionAbortedError
+
+
+logger = logging.getLogger(__name__)
+
+_PUSH_CHARS = '-0123456789' + string.ascii_uppercase + '_' + string.ascii_lowercase
+
+OPERATIONS = ('get', 'set', 'update', 'push', 'delete', 'query', 'transaction')
+
+# As in firebase_admin.db
+MAX_TRANSACTION_RETRIES = 25
+
+
+def _split(path):
+    return [segment for segment in (path or '').split('/') if segment]
+
+
+def _prune(value):
+    # RTDB never stores empty objects or nulls
+    if isinstance(value, dict):
+        pruned = {str(key): _prune(child) for key, child in value.items() if child is not None}
+        return {key: child for key, child in pruned.items() if child is not None} or None
+    if isinstance(value, list):
+        return _prune({str(index): child for index, child in enumerate(value)})
+    return value
+
+
+def _export(value):
+    # Objects whose keys are 0..n-1 come back as arrays, like the real database
+    if isinstance(value, dict):
+        exported = {key: _export(child) for key, child in value.items()}
+        if exported and all(key.isdigit() for key in exported):
+            indexes = sorted(int(key) for key in exported)
+            if indexes[-1] < 2 * len(indexes):
+                return [exported.get(str(index)) for index in range(indexes[-1] + 1)]
+        return exported
+    return copy.deepcopy(value)
+
+
+def _child_value(value, path):
+    for segment in _split(path):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(segment)
+    return value
+
+
+def _index_rank(index):
+    # RTDB ordering: null, false, true, numbers, strings, objects
+    if index is None:
+        return (0,)
+    if index is False:
+        return (1,)
+    if index is True:
+        return (2,)
+    if isinstance(index, (int, float)):
+        return (3, index)
+    if isinstance(index, str):
+        return (4, index)
+    return (5,)
+
+
+def _key_rank(key):
+    # Integer-like keys sort numerically ahead of the rest
+    if key.lstrip('-').isdigit():
+        return (0, int(key), '')
+    return (1, 0, key)
+
+
+def _per_operation(setting, operation):
+    if isinstance(setting, dict):
+        return setting.get(operation, setting.get('default', 0))
+    return setting or 0
+
+
+class Event:
+    """Same properties as ``firebase_admin.db.Event``"""
+
+    def __init__(self, event_type, path, data):
+        self.event_type = event_type
+        self.path = path
+        self.data = data
+
+
+class ListenerRegistration:
+    def __init__(self, database, segments, callback):
+        self._database = database
+        self.segments = segments
+        self.callback = callback
+
+    def close(self):
+        self._database._remove_listener(self)
+
+
+class InMemoryDatabase:
+    """Process-local stand-in for the Firebase Realtime Database
+
+    ``latency`` and ``jitter`` (seconds) delay every operation, as a
+    network round trip would: the delay is ``latency`` plus a uniform draw
+    from ``[0, jitter)``. ``failure_rate`` is the probability that an
+    operation raises ``firebase_admin.exceptions.UnavailableError`` after
+    its delay. Each setting is a number or a dict keyed by operation name
+    (get, set, update, push, delete, query, transaction) with an optional "default".
+    Draws come from a generator seeded with ``random_seed``, so a run is
+    reproducible. ``operations`` counts the calls made, for comparing how
+    many round trips a code path needs; a transaction counts once per
+    attempt, and ``transaction_conflicts`` counts the attempts that lost
+    to a concurrent write and were retried.
+    """
+
+    def __init__(self, data=None, latency=0.0, jitter=0.0, failure_rate=0.0, random_seed=None):
+        self._root = _prune(copy.deepcopy(data)) or {}
+        self._lock = threading.RLock()
+        self._last_push_time = 0
+        self._last_push_random = []
+        self._listeners = []
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._random = random.Random(random_seed)
+        self._random_lock = threading.Lock()
+        self._forced_failures = Counter()
+        self.operations = Counter()
+        self.transaction_conflicts = 0
+
+    @classmethod
+    def from_seed_file(cls, path, **options):
+        if not path:
+            return cls(**options)
+        with open(path) as seed_file:
+            return cls(json.load(seed_file), **options)
+
+    def fail_next(self, operation, count=1):
+        """Make the next ``count`` calls of ``operation`` fail regardless of ``failure_rate``"""
+        with self._random_lock:
+            self._forced_failures[operation] += count
+
+    def _round_trip(self, operation):
+        """Count the call, wait out the injected latency and maybe fail it"""
+        with self._random_lock:
+            self.operations[operation] += 1
+            delay = _per_operation(self.latency, operation)
+            jitter = _per_operation(self.jitter, operation)
+            if jitter:
+                delay += self._random.uniform(0, jitter)
+            if self._forced_failures[operation]:
+                self._forced_failures[operation] -= 1
+                fail = True
+            else:
+                failure_rate = _per_operation(self.failure_rate, operation)
+                fail = bool(failure_rate) and self._random.random() < failure_rate
+        if delay > 0:
+            # Outside any lock, so concurrent calls overlap like real requests
+            time.sleep(delay)
+        if fail:
+            raise exceptions.UnavailableError(f'Injected failure in {operation}')
+
+    def _add_listener(self, registration):
+        with self._lock:
+            self._listeners.append(registration)
+            data = _export(self._get(registration.segments))
+        registration.callback(Event('put', '/', data))
+
+    def _remove_listener(self, registration):
+        with self._lock:
+            if registration in self._listeners:
+                self._listeners.remove(registration)
+
+    def _events_for(self, segments):
+        """Events for listeners affected by a write at ``segments``; call with the lock held"""
+        events = []
+        for registration in self._listeners:
+            listened = registration.segments
+            if segments[:len(listened)] == listened:
+                relative = '/' + '/'.join(segments[len(listened):])
+                events.append((registration, Event('put', relative, _export(self._get(segments)))))
+            elif listened[:len(segments)] == segments:
+                # Write above the listener replaces its whole subtree
+                events.append((registration, Event('put', '/', _export(self._get(listened)))))
+        return events
+
+    @staticmethod
+    def _dispatch(events):
+        # Outside the lock, so callbacks may read or write the database
+        for registration, event in events:
+            try:
+                registration.callback(event)
+            except Exception:
+                logger.exception('Database listener callback failed')
+
+    def reference(self, path='/'):
+        return Reference(self, _split(path))
+
+    def _get(self, segments):
+        node = self._root
+        for segment in segments:
+            if not isinstance(node, dict) or segment not in node:
+                return None
+            node = node[segment]
+        return node
+
+    def _set(self, segments, value):
+        value = _prune(copy.deepcopy(value))
+        if not segments:
+            self._root = value or {}
+            return
+        parents = [self._root]
+        node = self._root
+        for segment in segments[:-1]:
+            child = node.get(segment)
+            if not isinstance(child, dict):
+                child = node[segment] = {}
+            node = child
+            parents.append(node)
+        if value is None:
+            node.pop(segments[-1], None)
+            # Drop parents left empty by the delete
+            for depth in range(len(segments) - 1, 0, -1):
+                if parents[depth]:
+                    break
+                parents[depth - 1].pop(segments[depth - 1], None)
+        else:
+            node[segments[-1]] = value
+
+    def push_key(self):
+        """Chronologically ordered 20-character key in the Firebase push-id format"""
+        with self._lock:
+            now = int(time.time() * 1000)
+            if now == self._last_push_time:
+                for index in range(11, -1, -1):
+                    if self._last_push_random[index] < 63:
+                        self._last_push_random[index] += 1
+                        break
+                    self._last_push_random[index] = 0
+            else:
+                self._last_push_random = [random.randrange(64) for _ in range(12)]
+            self._last_push_time = now
+            time_chars = []
+            for _ in range(8):
+                time_chars.append(_PUSH_CHARS[now % 64])
+                now //= 64
+            return ''.join(reversed(time_chars)) + ''.join(_PUSH_CHARS[i] for i in self._last_push_random)
+
+
+class Reference:
+    """Subset of ``firebase_admin.db.Reference`` backed by an InMemoryDatabase"""
+
+    def __init__(self, database, segments):
+        self._database = database
+        self._segments = segments
+
+    @property
+    def key(self):
+        return self._segments[-1] if self._segments else None
+
+    @property
+    def path(self):
+        return '/' + '/'.join(self._segments)
+
+    @property
+    def parent(self):
+        if not self._segments:
+            return None
+        return Reference(self._database, self._segments[:-1])
+
+    def child(self, path):
+        return Reference(self._database, self._segments + _split(path))
+
+    def get(self):
+        self._database._round_trip('get')
+        with self._database._lock:
+            return _export(self._database._get(self._segments))
+
+    def set(self, value):
+        self._database._round_trip('set')
+        with self._database._lock:
+            self._database._set(self._segments, value)
+            events = self._database._events_for(self._segments)
+        self._database._dispatch(events)
+
+    def update(self, value):
+        if not isinstance(value, dict) or not value:
+            raise ValueError('Value argument must be a non-empty dictionary.')
+        self._database._round_trip('update')
+        with self._database._lock:
+            events = []
+            for path, child in value.items():
+                self._database._set(self._segments + _split(path), child)
+            # One patch event per update, like the real database
+            for registration in self._database._listeners:
+                if self._segments[:len(registration.segments)] == registration.segments:
+                    relative = '/' + '/'.join(self._segments[len(registration.segments):])
+                    events.append((registration, Event('patch', relative, copy.deepcopy(value))))
+                elif registration.segments[:len(self._segments)] == self._segments:
+                    events.append((registration, Event('put', '/', _export(self._database._get(registration.segments)))))
+        self._database._dispatch(events)
+
+    def transaction(self, transaction_update):
+        """Replace the value with ``transaction_update(current)`` atomically and return it
+
+        Optimistic like the real SDK: the value is read, the update computed
+        and sent back a round trip later, and written only if nothing else
+        wrote the value meanwhile; otherwise the update runs again on the
+        new value, up to MAX_TRANSACTION_RETRIES attempts.
+        """
+        database = self._database
+        for _ in range(MAX_TRANSACTION_RETRIES):
+            with database._lock:
+                read = copy.deepcopy(database._get(self._segments))
+            value = transaction_update(_export(read))
+            database._round_trip('transaction')
+            with database._lock:
+                if database._get(self._segments) != read:
+                    database.transaction_conflicts += 1
+                    continue
+                database._set(self._segments, value)
+                events = database._events_for(self._segments)
+            database._dispatch(events)
+            return value
+        raise TransactionAbortedError('Transaction aborted after failed retries.')
+
+    def push(self, value=''):
+        ref = self.child(self._database.push_key())
+        if value is not None:
+            ref.set(value)
+        return ref
+
+    def delete(self):
+        self._database._round_trip('delete')
+        with self._database._lock:
+            self._database._set(self._segments, None)
+            events = self._database._events_for(self._segments)
+        self._database._dispatch(events)
+
+    def listen(self, callback):
+        """Call ``callback(event)`` with the current value, then after every change at or below this path
+
+        Unlike the real SDK, callbacks run synchronously on the writing thread.
+        """
+        registration = ListenerRegistration(self._database, self._segments, callback)
+        self._database._add_listener(registration)
+        return registration
+
+    def order_by_child(self, path):
+        if not path or path.startswith('$'):
+            raise ValueError(f'Illegal child path: {path}')
+        return Query(self, path)
+
+    def order_by_key(self):
+        return Query(self, '$key')
+
+    def order_by_value(self):
+        return Query(self, '$value')
+
+
+class Query:
+    """Ordered, filtered and limited read of a Reference's children, like ``firebase_admin.db.Query``"""
+
+    def __init__(self, reference, order_by):
+        self._reference = reference
+        self._order_by = order_by
+        self._start = None
+        self._end = None
+        self._limit_first = None
+        self._limit_last = None
+
+    def _index(self, key, value):
+        if self._order_by == '$key':
+            return key
+        if self._order_by == '$value':
+            return value
+        return _child_value(value, self._order_by)
+
+    def _rank(self, index):
+        if self._order_by == '$key':
+            return _key_rank(str(index))
+        return _index_rank(index)
+
+    def limit_to_first(self, limit):
+        if not isinstance(limit, int) or limit < 0:
+            raise ValueError('Limit must be a non-negative integer.')
+        if self._limit_last is not None:
+            raise ValueError('Cannot set both first and last limits.')
+        self._limit_first = limit
+        return self
+
+    def limit_to_last(self, limit):
+        if not isinstance(limit, int) or limit < 0:
+            raise ValueError('Limit must be a non-negative integer.')
+        if self._limit_first is not None:
+            raise ValueError('Cannot set both first and last limits.')
+        self._limit_last = limit
+        return self
+
+    def start_at(self, start):
+        if start is None:
+            raise ValueError('Start value must not be None.')
+        self._start = start
+        return self
+
+    def end_at(self, end):
+        if end is None:
+            raise ValueError('End value must not be None.')
+        self._end = end
+        return self
+
+    def equal_to(self, value):
+        if value is None:
+            raise ValueError('Equal to value must not be None.')
+        self._start = self._end = value
+        return self
+
+    def get(self):
+        database = self._reference._database
+        database._round_trip('query')
+        with database._lock:
+            node = database._get(self._reference._segments)
+            if not isinstance(node, dict):
+                return _export(node)
+            entries = [(key, value, self._index(key, value)) for key, value in node.items()]
+
+        start = self._rank(self._start) if self._start is not None else None
+        end = self._rank(self._end) if self._end is not None else None
+        selected = []
+        for key, value, index in entries:
+            rank = self._rank(index)
+            if (start is not None and rank < start) or (end is not None and rank > end):
+                continue
+            selected.append((rank, _key_rank(key), key, value))
+        selected.sort(key=lambda entry: entry[:2])
+
+        if self._limit_first is not None:
+            selected = selected[:self._limit_first]
+        elif self._limit_last is not None:
+            selected = selected[len(selected) - self._limit_last:] if self._limit_last else []
+        return OrderedDict((key, _export(value)) for _, _, key, value in selected)
@@ -0,0 +1,340 @@
+import hashlib
+import json
+import logging
+import math
+
+from answer_normalization import acceptable_forms, matches_acceptable
+
+
+logger = logging.getLogger(__name__)
+
+# IELTS band score conversion tables (raw correct answers out of 40)
+IELTS_BAND_CONVERSION = {
+    'listening': {
+        39: 9.0, 37: 8.5, 35: 8.0, 32: 7.5, 30: 7.0, 26: 6.5, 23: 6.0, 18: 5.5, 16: 5.0,
+        13: 4.5, 10: 4.0, 8: 3.5, 6: 3.0, 4: 2.5, 3: 2.0, 2: 1.5, 1: 1.0, 0: 0.0,
+    },
+    'reading': {
+        39: 9.0, 37: 8.5, 35: 8.0, 33: 7.5, 30: 7.0, 27: 6.5, 23: 6.0, 19: 5.5, 15: 5.0,
+        13: 4.5, 10: 4.0, 8: 3.5, 6: 3.0, 4: 2.5, 3: 2.0, 2: 1.5, 1: 1.0, 0: 0.0,
+    },
+}
+
+FILL_IN_TYPES = {
+    'fill_gaps', 'fill_gaps_short', 'sentence_completion', 'summary_completion',
+    'form_completion', 'note_completion', 'table_completion', 'flowchart_completion',
+}
+MATCHING_TYPES = {'matching', 'matching_headings', 'matching_features', 'matching_endings'}
+# Free-text answers compared through answer_normalization's variant forms
+VARIANT_TYPES = FILL_IN_TYPES | {'map_labelling'}
+
+
+def round_half_up(value):
+    # JavaScript's Math.round, which the Node scorer uses (Python's round() is banker's rounding)
+    return math.floor(value + 0.5)
+
+
+def raw_score_to_band(raw_score, total_questions, section_type):
+    if total_questions == 0:
+        return 0.0
+    table = IELTS_BAND_CONVERSION.get(section_type.lower())
+    if not table:
+        return 0.0
+    for score in sorted(table, reverse=True):
+        if raw_score >= score:
+            return table[score]
+    return 0.0
+
+
+def normalize_answer(answer):
+    """Case-insensitive, trimmed string form of an answer"""
+    if answer is None:
+        return ''
+    if isinstance(answer, bool):
+        return 'true' if answer else 'false'
+    if isinstance(answer, float) and answer.is_integer():
+        answer = int(answer)
+    if isinstance(answer, (list, tuple)):
+        return ','.join(normalize_answer(item) for item in answer)
+    return str(answer).lower().strip()
+
+
+def normalize_object(obj):
+    return {normalize_answer(key): normalize_answer(value) for key, value in obj.items()}
+
+
+def is_correct_option(option):
+    # Imported exams often list options as plain strings, which are never marked correct
+    return isinstance(option, dict) and option.get('correct') is True
+
+
+def score_mcq_single(question, user_answer):
+    options = question.get('options')
+    if not options or not user_answer:
+        return False
+    correct_option = next((opt for opt in options if is_correct_option(opt)), None)
+    if correct_option is None:
+        # Fall back to the correctAnswer field
+        return normalize_answer(user_answer) == normalize_answer(question.get('correctAnswer'))
+    normalized = normalize_answer(user_answer)
+    return normalized == normalize_answer(correct_option.get('id')) or \
+        normalized == normalize_answer(correct_option.get('text'))
+
+
+def score_mcq_multiple(question, user_answer):
+    options = question.get('options')
+    if not options or not user_answer:
+        return False
+    correct_ids = [normalize_answer(opt.get('id')) for opt in options if is_correct_option(opt)]
+    if not correct_ids:
+        return False
+    user_answers = user_answer if isinstance(user_answer, list) else [user_answer]
+    normalized = [normalize_answer(answer) for answer in user_answers]
+    return len(correct_ids) == len(normalized) and all(answer_id in normalized for answer_id in correct_ids)
+
+
+def score_true_false_ng(question, user_answer):
+    if not user_answer:
+        return False
+    return normalize_answer(user_answer) == normalize_answer(question.get('correctAnswer'))
+
+
+def score_fill_in_blank(question, user_answer):
+    correct_answer = question.get('correctAnswer')
+    if not user_answer or not correct_answer:
+        return False
+    # Precompiled by compile_answer_key; "three"/"3", "the museum"/"museum", colour/color...
+    acceptable = question.get('acceptableAnswers')
+    if matches_acceptable(user_answer, acceptable_forms(correct_answer) if acceptable is None else acceptable):
+        return True
+    normalized = normalize_answer(user_answer)
+    correct_answers = correct_answer if isinstance(correct_answer, list) else [correct_answer]
+    return any(normalize_answer(answer) == normalized for answer in correct_answers)
+
+
+def score_matching(question, user_answer):
+    correct_answer = question.get('correctAnswer')
+    if not user_answer or not correct_answer:
+        return False
+    if isinstance(user_answer, dict) and isinstance(correct_answer, dict):
+        return normalize_object(user_answer) == normalize_object(correct_answer)
+    return normalize_answer(user_answer) == normalize_answer(correct_answer)
+
+
+def score_map_labelling(question, user_answer):
+    return score_fill_in_blank(question, user_answer)
+
+
+def is_answer_correct(question, user_answer):
+    question_type = question.get('type')
+    if question_type == 'mcq_single':
+        return score_mcq_single(question, user_answer)
+    if question_type == 'mcq_multiple':
+        return score_mcq_multiple(question, user_answer)
+    if question_type == 'true_false_ng':
+        return score_true_false_ng(question, user_answer)
+    if question_type in FILL_IN_TYPES:
+        return score_fill_in_blank(question, user_answer)
+    if question_type in MATCHING_TYPES:
+        return score_matching(question, user_answer)
+    if question_type == 'map_labelling':
+        return score_map_labelling(question, user_answer)
+    logger.warning(f"Unknown question type for scoring: {question_type}")
+    return False
+
+
+def is_manually_marked(question):
+    return 'writing' in (question.get('type') or '')
+
+
+def score_question(question, user_answer, is_correct=None):
+    """Score one answer; same result shape as scoreQuestion in functions/server.js
+
+    ``is_correct`` skips evaluating the answer when it is already known
+    (see answer_correctness).
+    """
+    result = {
+        'questionId': question.get('id'),
+        'questionNumber': question.get('number'),
+        'questionType': question.get('type'),
+        'userAnswer': user_answer,
+        'correctAnswer': question.get('correctAnswer') or None,
+        'isCorrect': False,
+        'points': 0,
+        'maxPoints': question.get('points') or 1,
+        'feedback': '',
+    }
+
+    # Writing tasks are marked manually
+    if is_manually_marked(question):
+        result['feedback'] = 'Writing tasks require manual review by instructor.'
+        result['needsManualReview'] = True
+        return result
+
+    result['isCorrect'] = is_answer_correct(question, user_answer) if is_correct is None else is_correct
+    if result['isCorrect']:
+        result['points'] = result['maxPoints']
+        result['feedback'] = 'Correct!'
+    else:
+        result['feedback'] = f"Incorrect. The correct answer is: {question.get('correctAnswer') or 'See answer key'}"
+    return result
+
+
+def lookup_answer(answers, question):
+    # Answers are keyed by question id, or q_<number> for older clients
+    return answers.get(question.get('id')) or answers.get(f"q_{question.get('number')}") or None
+
+
+def question_key(question):
+    return question.get('id') or f"q_{question.get('number')}"
+
+
+def answer_correctness(exam, answers, previous=None):
+    """``{question key: isCorrect}`` for a set of answers
+
+    ``previous`` is ``(answers, correctness)`` from an earlier call against
+    the same answer key; questions whose answer has not changed since are
+    not evaluated again, so rescoring an autosave costs only its edits.
+    """
+    previous_answers, previous_correctness = previous or ({}, {})
+    answers = answers or {}
+    correctness = {}
+    for question in exam_questions(exam):
+        key = question_key(question)
+        answer = lookup_answer(answers, question)
+        if key in previous_correctness and lookup_answer(previous_answers, question) == answer:
+            correctness[key] = previous_correctness[key]
+        elif is_manually_marked(question):
+            correctness[key] = False
+        else:
+            correctness[key] = is_answer_correct(question, answer)
+    return correctness
+
+
+def summarize_sections(question_results, questions):
+    """Aggregate per-section totals and band scores from per-question results"""
+    section_scores = {}
+    for question, result in zip(questions, question_results):
+        section = question.get('section') or 'Unknown'
+        scores = section_scores.setdefault(section, {
+            'totalQuestions': 0,
+            'correctAnswers': 0,
+            'totalPoints': 0,
+            'maxPoints': 0,
+            'rawScore': 0,
+            'bandScore': 0.0,
+            'needsManualReview': False,
+        })
+        scores['totalQuestions'] += 1
+        scores['maxPoints'] += result['maxPoints']
+        scores['totalPoints'] += result['points']
+        if result['isCorrect']:
+            scores['correctAnswers'] += 1
+        if result.get('needsManualReview'):
+            scores['needsManualReview'] = True
+
+    for section_name, scores in section_scores.items():
+        if scores['needsManualReview']:
+            scores['bandScore'] = None
+            scores['status'] = 'manual_review'
+        else:
+            scores['rawScore'] = scores['correctAnswers']
+            scores['bandScore'] = raw_score_to_band(scores['correctAnswers'], scores['totalQuestions'], section_name)
+            scores['status'] = 'auto_scored'
+    return section_scores
+
+
+def overall_from_sections(section_scores, total_questions):
+    """Overall band (mean of auto-scored sections, rounded to 0.5), total correct and percentage"""
+    auto_scored = [s['bandScore'] for s in section_scores.values() if s['bandScore'] is not None]
+    overall = sum(auto_scored) / len(auto_scored) if auto_scored else 0
+    total_correct = sum(s['correctAnswers'] for s in section_scores.values())
+    return {
+        'overallBandScore': round_half_up(overall * 2) / 2,
+        'totalCorrect': total_correct,
+        'totalQuestions': total_questions,
+        'percentage': round_half_up(total_correct / total_questions * 100) if total_questions else 0,
+    }
+
+
+def exam_questions(exam):
+    # RTDB returns arrays with missing indexes as objects
+    questions = exam.get('questions') or []
+    if isinstance(questions, dict):
+        questions = [questions[key] for key in sorted(questions, key=lambda k: int(k) if str(k).isdigit() else k)]
+    return [question for question in questions if question]
+
+
+# Everything scoring reads from a question; the rest (text, passages, audio) is display-only
+ANSWER_KEY_FIELDS = ('id', 'number', 'type', 'section', 'correctAnswer', 'points')
+# Exam fields copied to the key (exam field: key field)
+ANSWER_KEY_METADATA = {'track_id': 'trackId', 'review_deadline': 'reviewDeadline'}
+
+
+def compile_answer_key(exam):
+    """Strip an exam down to what scoring needs; score_answers accepts the result in place of the exam"""
+    questions = []
+    for question in exam_questions(exam):
+        compiled = {field: question[field] for field in ANSWER_KEY_FIELDS if field in question}
+        if isinstance(question.get('options'), list):
+            compiled['options'] = [
+                {'id': opt.get('id'), 'text': opt.get('text'), 'correct': opt.get('correct')}
+                if isinstance(opt, dict) else opt
+                for opt in question['options'] if opt
+            ]
+        if question.get('type') in VARIANT_TYPES and question.get('correctAnswer'):
+            compiled['acceptableAnswers'] = sorted(acceptable_forms(question['correctAnswer']))
+        questions.append(compiled)
+    # Identifies the key, so correctness computed against an older version is not reused
+    version = hashlib.sha1(json.dumps(questions, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+    answer_key = {'questions': questions, 'version': version}
+    # Not used for scoring; saves reads when results are aggregated per track or queued for review
+    for field, name in ANSWER_KEY_METADATA.items():
+        if exam.get(field):
+            answer_key[name] = exam[field]
+    # Outside the versioned questions: limits are reported on, never scored
+    word_limits = {question_key(q): q['wordLimit'] for q in exam_questions(exam) if q.get('wordLimit')}
+    if word_limits:
+        answer_key['wordLimits'] = word_limits
+    return answer_key
+
+
+def prepare_answer_key(answer_key):
+    """Turn a compiled key's acceptable-answer lists (JSON) into sets, in place, for O(1) lookups"""
+    for question in answer_key.get('questions') or []:
+        if isinstance(question.get('acceptableAnswers'), list):
+            question['acceptableAnswers'] = frozenset(question['acceptableAnswers'])
+    return answer_key
+
+
+def storable_answer_key(answer_key):
+    """JSON form of a compiled key, whether or not prepare_answer_key has run on it"""
+    return {
+        **answer_key,
+        'questions': [
+            {**question, 'acceptableAnswers': sorted(question['acceptableAnswers'])}
+            if isinstance(question.get('acceptableAnswers'), frozenset) else question
+            for question in answer_key.get('questions') or []
+        ],
+    }
+
+
+def score_answers(exam, answers, correctness=None):
+    """Score a full set of answers against an exam; mirrors scoreSubmission in the Node functions
+
+    ``correctness`` (from answer_correctness for these same answers) lets
+    finalizing a submission skip evaluating answers again.
+    """
+    questions = exam_questions(exam)
+    answers = answers or {}
+    correctness = correctness or {}
+    question_results = [
+        score_question(question, lookup_answer(answers, question), correctness.get(question_key(question)))
+        for question in questions
+    ]
+    section_scores = summarize_sections(question_results, questions)
+    return {
+        'sectionScores': section_scores,
+        'questionResults': question_results,
+        **overall_from_sections(section_scores, len(questions)),
+    }
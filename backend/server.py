@@ -1,21 +1,57 @@
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 import firebase_admin
-from firebase_admin import db as firebase_db
 import os
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List
+from typing import Any, Dict, List, Optional
+import time
 import uuid
 from datetime import datetime, timezone
 import json
 
+from admission import ADMIN, SHARED_IP_CLIENTS, AdmissionControlMiddleware, RoutePolicy
+from aggregate_batcher import DEFAULT_FLUSH_INTERVAL, AggregateBatcher
+from audio import audio_file_response
+from auth import require_admin
+from cohort_stats import add_results, build_stats, merge_stats, summarize_stats
+from compression import DEFAULT_MIN_SIZE, CompressionMiddleware, etag_bytes_response, etag_json_response
+from database import db_reference
+from idempotency import IdempotencyConflict, IdempotencyIndex, payload_fingerprint
+from incremental_scoring import RunningScores, progress_scoring
+from item_analysis import DEFAULT_MIN_RESPONSES, analyze_items
+from log_config import DEFAULT_MAX_MESSAGE_BYTES, configure_logging, parse_logger_map, shutdown_logging
+from metrics import REGISTRY, MetricsMiddleware
+from profiling import MAX_PROFILE_SECONDS, RequestProfilerMiddleware, profile_for, profile_in_progress
+from rank_index import (
+    FenwickTree, build_rank_index, clamp_score, member_key, percentile_rank, record_scores, top_entries, top_threshold,
+)
+from rescoring import diff_answer_keys, key_version_groups, rescore_batches
+from response_matrix import ResponseMatrixStore
+from result_encoding import compact_score, expand_results, is_compact
+from review_queue import (
+    CLAIM_OVERFETCH, DEFAULT_LEASE_SECONDS, DEFAULT_REVIEW_TARGET_HOURS, QUEUE, LeaseConflict, claim, complete,
+    enqueue_writes, expire, release, renew, review_items,
+)
+from scoring import compile_answer_key, exam_questions, prepare_answer_key, storable_answer_key
+from shared_cache import DEFAULT_TTL, SharedExamCache
+from similarity import DEFAULT_THRESHOLD, essay_signatures, near_duplicates
+from singleflight import SingleFlight
+from submission_index import DEFAULT_PAGE_SIZE, index_writes, listed
+from text_stats import batch_text_stats, submission_text_stats
+from tracing import DEFAULT_MAX_SEGMENTS, DEFAULT_SEGMENT_RECORDS, TraceCaptureMiddleware, TraceWriter
+
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Listening audio lives next to the imported question folders, as for the Node functions
+AUDIO_DIR = Path(os.environ.get('AUDIO_DIR', ROOT_DIR.parent / 'Listening'))
+
 # Firebase initialization
 try:
     # Try to initialize with service account key
@@ -41,6 +77,308 @@ except ValueError:
     # Firebase app already initialized
     pass
 
+
+async def db_get(path):
+    # firebase_admin is synchronous; keep its network I/O off the event loop
+    return await asyncio.to_thread(db_reference(path).get)
+
+
+# Concurrent identical reads (hundreds of candidates opening the same exam)
+# share one in-flight database fetch
+DB_READS = SingleFlight('db_reads')
+
+async def db_get_shared(path):
+    # The result is shared between callers, don't mutate it
+    return await DB_READS.do(path, lambda: db_get(path), label=path.split('/', 1)[0])
+
+
+# Serialized exams and compiled answer keys shared by all workers on the host
+EXAM_CACHE = SharedExamCache(
+    os.environ.get('EXAM_CACHE_DIR') or None,
+    ttl=int(os.environ.get('EXAM_CACHE_TTL', DEFAULT_TTL)),
+)
+EXAM_LOADS = SingleFlight('exam_cache')
+
+async def load_exam_body(exam_id):
+    # (etag, body) of the full exam; a miss fills both the exam and its answer key
+    cached = EXAM_CACHE.get_bytes(f'exam:{exam_id}')
+    if cached is not None:
+        return cached[0], bytes(cached[1])
+
+    async def fill():
+        # Generations are taken before the read, so an edit invalidating the
+        # entries meanwhile keeps this (possibly older) copy from being published.
+        # Not a shared read: one started before the invalidation could be joined
+        since = (EXAM_CACHE.latest_generation(f'exam:{exam_id}'), EXAM_CACHE.latest_generation(f'answer_key:{exam_id}'))
+        exam = await db_get(f'exams_full/{exam_id}')
+        if exam is None:
+            return None
+        body, etag = await asyncio.to_thread(EXAM_CACHE.put, f'exam:{exam_id}', {**exam, 'id': exam_id}, since=since[0])
+        await asyncio.to_thread(EXAM_CACHE.put, f'answer_key:{exam_id}', compile_answer_key(exam), since=since[1])
+        return etag, body
+
+    return await EXAM_LOADS.do(f'exam:{exam_id}', fill, label='exams_full')
+
+async def load_answer_key(exam_id):
+    answer_key = EXAM_CACHE.get(f'answer_key:{exam_id}', transform=prepare_answer_key)
+    if answer_key is not None:
+        return answer_key
+
+    async def fill():
+        # See load_exam_body
+        since = EXAM_CACHE.latest_generation(f'answer_key:{exam_id}')
+        exam = await db_get(f'exams_full/{exam_id}')
+        if exam is None:
+            return None
+        answer_key = compile_answer_key(exam)
+        await asyncio.to_thread(EXAM_CACHE.put, f'answer_key:{exam_id}', answer_key, since=since)
+        return prepare_answer_key(answer_key)
+
+    return await EXAM_LOADS.do(f'answer_key:{exam_id}', fill, label='exams_full')
+
+
+async def db_set(path, value):
+    await asyncio.to_thread(db_reference(path).set, value)
+
+
+async def db_update(path, value):
+    await asyncio.to_thread(db_reference(path).update, value)
+
+
+async def db_delete(path):
+    await asyncio.to_thread(db_reference(path).delete)
+
+
+async def db_transaction(path, update):
+    return await asyncio.to_thread(db_reference(path).transaction, update)
+
+
+# Repeated submissions (client retries, double clicks) are answered from this
+# index instead of creating a new submission and scoring it again
+async def _load_submission_key(digest):
+    return await db_get(f'submission_keys/{digest}')
+
+async def _save_submission_key(digest, record):
+    await db_set(f'submission_keys/{digest}', {**record, 'createdAt': datetime.now(timezone.utc).isoformat()})
+
+async def _transact_submission_key(digest, update):
+    return await db_transaction(f'submission_keys/{digest}', update)
+
+SUBMISSION_INDEX = IdempotencyIndex(_load_submission_key, _save_submission_key, _transact_submission_key)
+
+# Compiled keys by version, which compact submission results are expanded against
+ARCHIVED_KEY_VERSIONS = set()
+
+async def load_key_version(exam_id, version):
+    answer_key = await load_answer_key(exam_id)
+    if answer_key is not None and answer_key.get('version') == version:
+        return answer_key
+    cache_key = f'answer_key:{exam_id}:{version}'
+    answer_key = EXAM_CACHE.get(cache_key, transform=prepare_answer_key)
+    if answer_key is None:
+        answer_key = await db_get_shared(f'answer_key_versions/{exam_id}/{version}')
+        if answer_key is None:
+            return None
+        # Versions never change, so the copy can stay cached until the TTL
+        await asyncio.to_thread(EXAM_CACHE.put, cache_key, answer_key)
+        # The fetched value is shared between callers, so prepare a copy
+        answer_key = prepare_answer_key({**answer_key, 'questions': [dict(q) for q in exam_questions(answer_key)]})
+    return answer_key
+
+
+# Answers are marked as autosaves arrive, so submitting only aggregates
+RUNNING_SCORES = RunningScores()
+
+# Students x questions answer/correctness matrices per exam for item and cohort analysis
+RESPONSE_MATRICES = ResponseMatrixStore(os.environ.get('RESPONSE_MATRIX_DIR') or ROOT_DIR / 'response_matrices')
+
+# Cohort aggregates (band histograms, raw score sums) per exam and per track,
+# and each exam's rank index over total raw scores: each scored submission is
+# folded in, reads never scan submissions. Every submission would otherwise
+# race for the same few nodes, so submitting only queues the result and a
+# background batcher folds each exam's queue in with one transaction per node
+def _fold_cohort_results(exam_id, batch):
+    # On the batcher thread: (answer_key, result) pairs of one exam
+    size = len(exam_questions(batch[-1][0])) + 1
+    by_path = {}
+    for answer_key, result in batch:
+        by_path.setdefault(f'cohort_stats/exams/{exam_id}', []).append(result)
+        if answer_key.get('trackId'):
+            by_path.setdefault(f"cohort_stats/tracks/{answer_key['trackId']}", []).append(result)
+    for path, results in by_path.items():
+        db_reference(path).transaction(lambda stats, results=results: add_results(stats, results))
+    scores = [clamp_score(result.get('totalCorrect'), size) for _, result in batch]
+    db_reference(f'rank_index/{exam_id}/fenwick').transaction(lambda tree: record_scores(tree, scores, size))
+    db_reference(f'rank_index/{exam_id}/members').update({
+        f"{member_key(score)}/{result['id']}": result.get('studentId') or ''
+        for score, (_, result) in zip(scores, batch)
+    })
+
+COHORT_RESULTS = AggregateBatcher(
+    _fold_cohort_results, flush_interval=float(os.environ.get('COHORT_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)),
+)
+
+async def record_cohort_result(exam_id, answer_key, result):
+    # The marker is created at most once per submission, so a submission is
+    # counted once even when a retry runs create_submission again
+    token = uuid.uuid4().hex
+    marker = await db_transaction(f"cohort_stats/applied/{exam_id}/{result['id']}", lambda applied: applied or token)
+    if marker == token:
+        COHORT_RESULTS.add(exam_id, (answer_key, result))
+
+async def rebuild_cohort_stats(exam_id, answer_key):
+    # Batch recomputation from the exam's submissions; a track is the merge of its exams' aggregates.
+    # Queued results are folded first, and every counted submission is marked as applied
+    await asyncio.to_thread(COHORT_RESULTS.flush)
+    query = db_reference('submissions').order_by_child('examId').equal_to(exam_id)
+    submissions = await asyncio.to_thread(query.get) or {}
+    # Results queued since the flush are already in the query; folding them too would count them twice
+    await asyncio.to_thread(COHORT_RESULTS.discard, exam_id, lambda item: item[1]['id'] in submissions)
+    stats = await asyncio.to_thread(build_stats, submissions.items())
+    rank_index = await asyncio.to_thread(
+        build_rank_index, submissions.items(), len(exam_questions(answer_key)) + 1
+    )
+    applied = {submission_id: 'rebuild' for submission_id, submission in submissions.items()
+               if submission and submission.get('scored')}
+    await asyncio.gather(
+        db_set(f'cohort_stats/exams/{exam_id}', stats),
+        db_set(f'rank_index/{exam_id}', rank_index),
+        db_set(f'cohort_stats/applied/{exam_id}', applied),
+    )
+    track_id = answer_key.get('trackId')
+    if track_id:
+        track_exams = (await db_get(f'exam_tracks/{track_id}/exams')) or []
+        if isinstance(track_exams, dict):
+            track_exams = list(track_exams.values())
+        exam_stats = await asyncio.gather(*(db_get(f'cohort_stats/exams/{other}') for other in track_exams
+                                            if other and other != exam_id))
+        await db_set(f'cohort_stats/tracks/{track_id}', merge_stats([stats, *exam_stats]))
+    return stats, len(submissions)
+
+# Manual-review queue of Writing responses: items are leased to one marker at
+# a time through transactions; pending/ and leases/ are the indexes that
+# claiming and expiry sweeps query, so neither scans the queue
+REVIEW_LEASE_SECONDS = int(os.environ.get('REVIEW_LEASE_SECONDS', DEFAULT_LEASE_SECONDS))
+REVIEW_TARGET_HOURS = float(os.environ.get('REVIEW_TARGET_HOURS', DEFAULT_REVIEW_TARGET_HOURS))
+
+async def _try_transaction(path, update):
+    try:
+        return await db_transaction(path, update)
+    except LeaseConflict:
+        return None
+
+async def expire_review_leases(now, limit=100):
+    query = db_reference(f'{QUEUE}/leases').order_by_child('expiresAt').end_at(now).limit_to_first(limit)
+    lapsed = await asyncio.to_thread(query.get) or {}
+    items = await asyncio.gather(*(_try_transaction(f'{QUEUE}/items/{identifier}', expire(now))
+                                   for identifier in lapsed))
+    writes = {}
+    for identifier, item in zip(lapsed, items):
+        if item is not None:
+            writes[f'leases/{identifier}'] = None
+            writes[f'pending/{identifier}'] = item['priority']
+        elif await db_get(f'{QUEUE}/items/{identifier}') is None:
+            # Completed between the query and the transaction
+            writes[f'leases/{identifier}'] = None
+        # Otherwise renewed since the query ran, with a fresh lease entry
+    if writes:
+        await db_update(QUEUE, writes)
+    return sum(item is not None for item in items)
+
+async def claim_review_items(reviewer, limit):
+    now = time.time()
+    await expire_review_leases(now)
+    query = db_reference(f'{QUEUE}/pending').order_by_value().limit_to_first(limit * CLAIM_OVERFETCH)
+    candidates = list((await asyncio.to_thread(query.get) or {}).keys())
+    claimed = {}
+    # Claim in rounds of what is still missing, so a lost race falls through to the next candidate
+    while candidates and len(claimed) < limit:
+        batch, candidates = candidates[:limit - len(claimed)], candidates[limit - len(claimed):]
+        items = await asyncio.gather(*(_try_transaction(f'{QUEUE}/items/{identifier}',
+                                                        claim(reviewer, now, REVIEW_LEASE_SECONDS))
+                                       for identifier in batch))
+        writes = {}
+        for identifier, item in zip(batch, items):
+            if item is None:
+                continue
+            claimed[identifier] = item
+            writes[f'pending/{identifier}'] = None
+            writes[f'leases/{identifier}'] = {'reviewer': reviewer, 'expiresAt': item['leaseExpiresAt']}
+        if writes:
+            await db_update(QUEUE, writes)
+    return claimed
+
+# Near-duplicate Writing detection: MinHash signatures are stored per exam as
+# submissions arrive; the scan job indexes them with LSH and stores a report
+SIMILARITY_THRESHOLD = float(os.environ.get('SIMILARITY_THRESHOLD', DEFAULT_THRESHOLD))
+SIMILARITY_SCANS = set()
+
+async def backfill_essay_signatures(exam_id, answer_key):
+    query = db_reference('submissions').order_by_child('examId').equal_to(exam_id)
+    submissions = await asyncio.to_thread(query.get) or {}
+    def compute():
+        writes = {}
+        for submission_id, submission in submissions.items():
+            signatures = essay_signatures(answer_key, (submission or {}).get('answers'))
+            if signatures:
+                writes[submission_id] = {'studentId': submission.get('studentId') or '', 'questions': signatures}
+        return writes
+    writes = await asyncio.to_thread(compute)
+    if writes:
+        await db_update(f'writing_signatures/{exam_id}', writes)
+    return len(submissions)
+
+async def scan_similarity(exam_id, backfill, requested_by):
+    started = time.perf_counter()
+    try:
+        if backfill:
+            answer_key = await load_answer_key(exam_id)
+            if answer_key is not None:
+                await backfill_essay_signatures(exam_id, answer_key)
+        signatures = await db_get(f'writing_signatures/{exam_id}')
+        report = await asyncio.to_thread(near_duplicates, signatures, SIMILARITY_THRESHOLD)
+        await db_set(f'similarity_reports/{exam_id}', {
+            **report,
+            'status': 'done',
+            'threshold': SIMILARITY_THRESHOLD,
+            'generatedAt': datetime.now(timezone.utc).isoformat(),
+            'durationMs': round((time.perf_counter() - started) * 1000, 1),
+        })
+        logger.info(f"Similarity scan of exam {exam_id} for {requested_by}: {len(report['pairs'])} pairs "
+                    f"from {report['candidatePairs']} candidates over {report['responses']} responses")
+    except Exception as e:
+        logger.error(f"Similarity scan of exam {exam_id} failed: {str(e)}")
+        await db_set(f'similarity_reports/{exam_id}', {'status': 'failed', 'error': str(e),
+                                                       'generatedAt': datetime.now(timezone.utc).isoformat()})
+    finally:
+        SIMILARITY_SCANS.discard(exam_id)
+
+async def rebuild_submission_indexes(page_size=DEFAULT_PAGE_SIZE):
+    # Pages through submissions by key, so the whole node is never loaded at once
+    last, scanned = None, 0
+    while True:
+        query = db_reference('submissions').order_by_key()
+        if last is not None:
+            query = query.start_at(last)
+        page = await asyncio.to_thread(query.limit_to_first(page_size + (last is not None)).get) or {}
+        keys = [key for key in page if key != last]
+        if not keys:
+            return scanned
+        writes = {}
+        for submission_id in keys:
+            writes.update(index_writes(submission_id, page[submission_id]))
+        if writes:
+            await db_update('/', writes)
+        scanned += len(keys)
+        last = keys[-1]
+
+# Submissions per multi-path write when backfilling text statistics
+TEXT_STATS_BATCH = 500
+
+# Submission ids are derived from the idempotency key, so even racing workers
+# write the same record
+SUBMISSION_NAMESPACE = uuid.UUID('6f0b8f7e-5d1c-4c1e-9a51-6b1f3c2d9e47')
+
 # Create the main app without a prefix
 app = FastAPI()
 
@@ -59,6 +397,35 @@ class StatusCheck(BaseModel):
 class StatusCheckCreate(BaseModel):
     client_name: str
 
+class ProgressSave(BaseModel):
+    # Field names match the exam_progress records written by the Node functions
+    examId: str
+    studentId: str
+    answers: Dict[str, Any] = Field(default_factory=dict)
+    reviewFlags: List[Any] = Field(default_factory=list)
+    currentQuestionIndex: int = 0
+    timeSpent: float = 0
+    audioProgress: float = 0
+
+class ExamSubmission(BaseModel):
+    examId: str
+    studentId: str
+    answers: Dict[str, Any]
+    timeSpent: float = 0
+    # Distinguishes deliberate re-sits from retries of the same submission
+    attempt: int = 1
+
+class ReviewClaim(BaseModel):
+    limit: int = Field(default=5, ge=1, le=50)
+    # Defaults to the admin's email; required with the API key
+    reviewer: Optional[str] = None
+
+class ReviewDecision(BaseModel):
+    reviewer: Optional[str] = None
+    points: Optional[float] = None
+    bandScore: Optional[float] = None
+    feedback: str = ''
+
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
 async def root():
@@ -75,7 +442,7 @@ async def create_status_check(input: StatusCheckCreate):
 
     # Save to Firebase Realtime Database
     try:
-        ref = firebase_db.reference('status_checks').child(status_obj.id)
+        ref = db_reference('status_checks').child(status_obj.id)
         ref.set(doc)
     except Exception as e:
         logger.error(f"Error saving status check to Firebase: {str(e)}")
@@ -87,8 +454,8 @@ async def create_status_check(input: StatusCheckCreate):
 async def get_status_checks():
     # Retrieve from Firebase Realtime Database
     try:
-        ref = firebase_db.reference('status_checks')
-        data = ref.get().val()
+        ref = db_reference('status_checks')
+        data = ref.get()
 
         if not data:
             return []
@@ -105,9 +472,553 @@ async def get_status_checks():
         logger.error(f"Error retrieving status checks from Firebase: {str(e)}")
         return []
 
+@api_router.get("/exams")
+async def get_exams(request: Request):
+    # Exam metadata list (without questions)
+    data = await db_get_shared('exams') or {}
+    exams = [{'id': key, **value} for key, value in data.items()]
+    return etag_json_response(request, exams)
+
+@api_router.get("/exams/{exam_id}")
+async def get_exam_by_id(exam_id: str, request: Request):
+    # Full exam with questions, passages and options from exams_full
+    loaded = await load_exam_body(exam_id)
+    if loaded is None:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    etag, body = loaded
+    return etag_bytes_response(request, body, etag)
+
+@api_router.post("/exams/{exam_id}/invalidate")
+async def invalidate_exam_cache(exam_id: str, admin: dict = Depends(require_admin)):
+    # Drop the cached exam and answer key in every worker after an edit
+    EXAM_CACHE.invalidate(f'exam:{exam_id}')
+    EXAM_CACHE.invalidate(f'answer_key:{exam_id}')
+    return {"success": True, "message": "Exam cache invalidated"}
+
+@api_router.post("/exams/{exam_id}/rescore")
+async def rescore_exam(exam_id: str, admin: dict = Depends(require_admin)):
+    # After an answer-key correction: re-mark only the changed questions of
+    # this exam's submissions and write only the fields that changed
+    started = time.perf_counter()
+    EXAM_CACHE.invalidate(f'exam:{exam_id}')
+    EXAM_CACHE.invalidate(f'answer_key:{exam_id}')
+    exam = await db_get(f'exams_full/{exam_id}')
+    if exam is None:
+        raise HTTPException(status_code=404, detail="Exam not found")
+
+    answer_key = compile_answer_key(exam)
+    query = db_reference('submissions').order_by_child('examId').equal_to(exam_id)
+    submissions = await asyncio.to_thread(query.get) or {}
+    rescored_at = datetime.now(timezone.utc).isoformat()
+
+    # Each submission is diffed against the key version it was scored with;
+    # results without one fall back to the key snapshot of the last rescore,
+    # and without either every question is re-marked
+    snapshot = await db_get(f'answer_keys/{exam_id}')
+    changed_by_version = {}
+    updated = 0
+    for version, group in key_version_groups(submissions.items()).items():
+        if version == answer_key['version']:
+            continue
+        previous_key = await load_key_version(exam_id, version) if version else snapshot
+        changed = diff_answer_keys(storable_answer_key(previous_key), answer_key) if previous_key else None
+        changed_by_version[version] = changed
+        if changed == set():
+            continue
+        batches = await asyncio.to_thread(
+            lambda: list(rescore_batches(answer_key, group, changed, rescored_at))
+        )
+        for batch, count in batches:
+            await db_update('/', batch)
+            updated += count
+    # The snapshot and derived data are left alone when neither the key nor any result changed
+    if updated or (snapshot or {}).get('version') != answer_key['version']:
+        await db_update('/', {
+            f'answer_keys/{exam_id}': answer_key,
+            f"answer_key_versions/{exam_id}/{answer_key['version']}": answer_key,
+        })
+        try:
+            await asyncio.to_thread(RESPONSE_MATRICES.rekey, exam_id, answer_key)
+            await rebuild_cohort_stats(exam_id, answer_key)
+        except Exception as e:
+            logger.warning(f"Updating derived data after rescoring exam {exam_id} failed: {str(e)}")
+
+    logger.info(f"Rescored exam {exam_id} for {admin.get('email') or admin['via']}: "
+                f"{updated}/{len(submissions)} submissions updated")
+    changed = set()
+    for questions in changed_by_version.values():
+        changed = None if changed is None or questions is None else changed | questions
+    return {
+        "success": True,
+        "changedQuestions": sorted(changed) if changed is not None else None,
+        "keyVersions": {
+            version or 'unversioned': sorted(questions) if questions is not None else None
+            for version, questions in changed_by_version.items()
+        },
+        "submissionsScanned": len(submissions),
+        "submissionsUpdated": updated,
+        "durationMs": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+@api_router.post("/exams/{exam_id}/response-matrix/rebuild")
+async def rebuild_response_matrix(exam_id: str, admin: dict = Depends(require_admin)):
+    # Backfill (or repair) an exam's response matrix from its stored submissions
+    started = time.perf_counter()
+    exam = await db_get(f'exams_full/{exam_id}')
+    if exam is None:
+        raise HTTPException(status_code=404, detail="Exam not found")
+
+    answer_key = prepare_answer_key(compile_answer_key(exam))
+    query = db_reference('submissions').order_by_child('examId').equal_to(exam_id)
+    submissions = await asyncio.to_thread(query.get) or {}
+    rows = await asyncio.to_thread(RESPONSE_MATRICES.rebuild, exam_id, answer_key, submissions.items())
+
+    logger.info(f"Rebuilt response matrix of exam {exam_id} for {admin.get('email') or admin['via']}: {rows} rows")
+    return {
+        "success": True,
+        "submissionsScanned": len(submissions),
+        "rows": rows,
+        "durationMs": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+@api_router.get("/exams/{exam_id}/item-analysis")
+async def get_item_analysis(
+    exam_id: str,
+    minResponses: int = Query(default=DEFAULT_MIN_RESPONSES, ge=1),
+    admin: dict = Depends(require_admin),
+):
+    # Facility, discrimination, distractors and miskey flags from the exam's response matrix
+    started = time.perf_counter()
+    matrix = await asyncio.to_thread(RESPONSE_MATRICES.load, exam_id)
+    if matrix is None:
+        raise HTTPException(status_code=404, detail="No scored submissions for this exam")
+    analysis = await asyncio.to_thread(analyze_items, matrix, minResponses)
+    return {"success": True, **analysis, "durationMs": round((time.perf_counter() - started) * 1000, 1)}
+
+@api_router.get("/exams/{exam_id}/cohort-stats")
+async def get_exam_cohort_stats(exam_id: str):
+    stats = await db_get_shared(f'cohort_stats/exams/{exam_id}')
+    return {"success": True, "examId": exam_id, **summarize_stats(stats)}
+
+@api_router.get("/tracks/{track_id}/cohort-stats")
+async def get_track_cohort_stats(track_id: str):
+    stats = await db_get_shared(f'cohort_stats/tracks/{track_id}')
+    return {"success": True, "trackId": track_id, **summarize_stats(stats)}
+
+@api_router.get("/exams/{exam_id}/percentile")
+async def get_percentile(exam_id: str, score: int = Query(ge=0)):
+    # Percentile rank of a total raw score (totalCorrect) among the exam's scored submissions
+    tree = await db_get_shared(f'rank_index/{exam_id}/fenwick')
+    standing = percentile_rank(FenwickTree(tree=tree), score) if tree else None
+    if standing is None:
+        return {"success": True, "examId": exam_id, "score": score, "count": 0, "rank": None, "percentile": None}
+    return {"success": True, "examId": exam_id, **standing}
+
+@api_router.get("/exams/{exam_id}/leaderboard")
+async def get_leaderboard(
+    exam_id: str,
+    limit: int = Query(default=10, ge=1, le=500),
+    admin: dict = Depends(require_admin),
+):
+    # Only the score buckets that reach the top ``limit`` are read
+    tree = await db_get(f'rank_index/{exam_id}/fenwick')
+    fenwick = FenwickTree(tree=tree) if tree else FenwickTree()
+    threshold = top_threshold(fenwick, limit)
+    if threshold is None:
+        return {"success": True, "examId": exam_id, "count": 0, "entries": []}
+    query = db_reference(f'rank_index/{exam_id}/members').order_by_key().start_at(member_key(threshold))
+    members = await asyncio.to_thread(query.get)
+    return {"success": True, "examId": exam_id, "count": fenwick.total(),
+            "entries": top_entries(fenwick, members, limit)}
+
+@api_router.post("/exams/{exam_id}/cohort-stats/rebuild")
+async def rebuild_exam_cohort_stats(exam_id: str, admin: dict = Depends(require_admin)):
+    started = time.perf_counter()
+    answer_key = await load_answer_key(exam_id)
+    if answer_key is None:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    stats, scanned = await rebuild_cohort_stats(exam_id, answer_key)
+
+    logger.info(f"Rebuilt cohort stats of exam {exam_id} for {admin.get('email') or admin['via']}")
+    return {
+        "success": True,
+        "submissionsScanned": scanned,
+        "count": stats['count'],
+        "durationMs": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+@api_router.post("/exams/{exam_id}/text-stats/backfill")
+async def backfill_text_stats(
+    exam_id: str,
+    workers: Optional[int] = Query(default=None, ge=1, le=32),
+    admin: dict = Depends(require_admin),
+):
+    # Recompute textStats of every submission of the exam in a process pool, writing in batches
+    started = time.perf_counter()
+    exam = await db_get(f'exams_full/{exam_id}')
+    if exam is None:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    answer_key = compile_answer_key(exam)
+    query = db_reference('submissions').order_by_child('examId').equal_to(exam_id)
+    submissions = await asyncio.to_thread(query.get) or {}
+
+    def compute():
+        batches, writes = [], {}
+        for submission_id, stats in batch_text_stats(answer_key, submissions.items(), workers=workers):
+            if stats:
+                writes[f'submissions/{submission_id}/textStats'] = stats
+            if len(writes) >= TEXT_STATS_BATCH:
+                batches.append(writes)
+                writes = {}
+        return batches + [writes] if writes else batches
+
+    batches = await asyncio.to_thread(compute)
+    for writes in batches:
+        await db_update('/', writes)
+
+    updated = sum(len(writes) for writes in batches)
+    logger.info(f"Backfilled text stats of exam {exam_id} for {admin.get('email') or admin['via']}: "
+                f"{updated}/{len(submissions)} submissions")
+    return {
+        "success": True,
+        "submissionsScanned": len(submissions),
+        "submissionsUpdated": updated,
+        "durationMs": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+@api_router.post("/exams/{exam_id}/similarity/scan", status_code=202)
+async def start_similarity_scan(
+    exam_id: str,
+    background_tasks: BackgroundTasks,
+    backfill: bool = False,
+    admin: dict = Depends(require_admin),
+):
+    # Runs after the response; ?backfill=true first signs submissions stored without signatures
+    if exam_id in SIMILARITY_SCANS:
+        raise HTTPException(status_code=409, detail="A similarity scan of this exam is already running")
+    SIMILARITY_SCANS.add(exam_id)
+    await db_set(f'similarity_reports/{exam_id}', {'status': 'running',
+                                                   'startedAt': datetime.now(timezone.utc).isoformat()})
+    background_tasks.add_task(scan_similarity, exam_id, backfill, admin.get('email') or admin['via'])
+    return {"success": True, "examId": exam_id, "status": "running"}
+
+@api_router.get("/exams/{exam_id}/similarity")
+async def get_similarity_report(exam_id: str, admin: dict = Depends(require_admin)):
+    report = await db_get(f'similarity_reports/{exam_id}')
+    if report is None:
+        raise HTTPException(status_code=404, detail="No similarity scan for this exam")
+    return {"success": True, "examId": exam_id, **report}
+
+def _reviewer(admin, requested):
+    reviewer = admin.get('email') or requested
+    if not reviewer:
+        raise HTTPException(status_code=400, detail="reviewer is required")
+    return reviewer
+
+@api_router.post("/review/claim")
+async def claim_reviews(input: ReviewClaim, admin: dict = Depends(require_admin)):
+    # The next items by due time, leased to the reviewer; lapsed leases are returned to the queue first
+    reviewer = _reviewer(admin, input.reviewer)
+    claimed = await claim_review_items(reviewer, input.limit)
+    return {"success": True, "reviewer": reviewer, "leaseSeconds": REVIEW_LEASE_SECONDS,
+            "items": [{'id': identifier, **item} for identifier, item in claimed.items()]}
+
+@api_router.post("/review/items/{item_id}/renew")
+async def renew_review(item_id: str, input: ReviewDecision, admin: dict = Depends(require_admin)):
+    reviewer = _reviewer(admin, input.reviewer)
+    item = await _try_transaction(f'{QUEUE}/items/{item_id}', renew(reviewer, time.time(), REVIEW_LEASE_SECONDS))
+    if item is None:
+        raise HTTPException(status_code=409, detail="Item is not leased to this reviewer")
+    await db_update(QUEUE, {f'pending/{item_id}': None,
+                            f'leases/{item_id}': {'reviewer': reviewer, 'expiresAt': item['leaseExpiresAt']}})
+    return {"success": True, "id": item_id, "leaseExpiresAt": item['leaseExpiresAt']}
+
+@api_router.post("/review/items/{item_id}/release")
+async def release_review(item_id: str, input: ReviewDecision, admin: dict = Depends(require_admin)):
+    reviewer = _reviewer(admin, input.reviewer)
+    item = await _try_transaction(f'{QUEUE}/items/{item_id}', release(reviewer, time.time()))
+    if item is None:
+        raise HTTPException(status_code=409, detail="Item is not leased to this reviewer")
+    await db_update(QUEUE, {f'leases/{item_id}': None, f'pending/{item_id}': item['priority']})
+    return {"success": True, "id": item_id}
+
+@api_router.post("/review/items/{item_id}/complete")
+async def complete_review(item_id: str, input: ReviewDecision, admin: dict = Depends(require_admin)):
+    # Only the lease holder can record a mark; the item then leaves the queue
+    reviewer = _reviewer(admin, input.reviewer)
+    item = await _try_transaction(f'{QUEUE}/items/{item_id}', complete(reviewer, time.time()))
+    if item is None:
+        raise HTTPException(status_code=409, detail="Item is not leased to this reviewer")
+
+    submission_path = f"submissions/{item['submissionId']}"
+    review = {
+        'reviewer': reviewer,
+        'reviewedAt': datetime.now(timezone.utc).isoformat(),
+        'points': input.points,
+        'bandScore': input.bandScore,
+        'feedback': input.feedback,
+    }
+    writes = {
+        f'{QUEUE}/items/{item_id}': None,
+        f'{QUEUE}/leases/{item_id}': None,
+        f"{submission_path}/reviews/{item['questionKey']}": review,
+    }
+    # Awarded points override the default in the compact results
+    if input.points is not None:
+        writes[f"{submission_path}/results/points/{item['questionKey']}"] = input.points
+    await db_update('/', writes)
+
+    logger.info(f"Review {item_id} completed by {reviewer}")
+    return {"success": True, "id": item_id, "submissionId": item['submissionId'], "review": review}
+
+@api_router.get("/audio/{question_type}/{filename}")
+async def get_audio(question_type: str, filename: str, request: Request):
+    # Same path rules as the Node /audio route: no traversal, .ogg only
+    for part in (question_type, filename):
+        if not part or '..' in part or '\\' in part or '/' in part:
+            raise HTTPException(status_code=400, detail="Invalid audio path")
+    if not filename.lower().endswith('.ogg'):
+        raise HTTPException(status_code=400, detail="Only .ogg audio files are supported")
+
+    path = AUDIO_DIR / question_type / filename
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="Audio file not found")
+    return audio_file_response(path, request.headers.get('range'))
+
+@api_router.post("/progress")
+async def save_progress(input: ProgressSave):
+    # Auto-save of an in-progress sitting
+    progress = input.model_dump()
+    progress['lastSaved'] = datetime.now(timezone.utc).isoformat()
+    progress['status'] = 'in_progress'
+
+    # Mark the answers that changed since the last autosave; never fails the save
+    sitting_id = f"{input.examId}_{input.studentId}"
+    try:
+        answer_key = await load_answer_key(input.examId)
+        if answer_key is not None:
+            correctness = RUNNING_SCORES.update(sitting_id, answer_key, input.answers)
+            progress['scoring'] = progress_scoring(answer_key, input.answers, correctness)
+    except Exception as e:
+        logger.warning(f"Incremental scoring failed for {sitting_id}: {str(e)}")
+
+    await db_set(f"exam_progress/{sitting_id}", progress)
+    return {"success": True, "message": "Progress saved successfully", "lastSaved": progress['lastSaved']}
+
+@api_router.get("/progress")
+async def get_progress(examId: str, studentId: str):
+    progress = await db_get_shared(f"exam_progress/{examId}_{studentId}")
+    return {"success": True, "progress": progress}
+
+@api_router.delete("/progress")
+async def clear_progress(examId: str, studentId: str):
+    RUNNING_SCORES.discard(f"{examId}_{studentId}")
+    await db_delete(f"exam_progress/{examId}_{studentId}")
+    return {"success": True, "message": "Progress cleared successfully"}
+
+async def create_submission(input: ExamSubmission, key: str):
+    submission_id = str(uuid.uuid5(SUBMISSION_NAMESPACE, key))
+    submission = {
+        **input.model_dump(),
+        'id': submission_id,
+        'submittedAt': datetime.now(timezone.utc).isoformat(),
+        'status': 'submitted',
+        'scored': False,
+    }
+
+    # Finalize the marking done during autosaves; a failure here must not
+    # fail the submission itself, which is then saved unscored
+    message = 'Exam submitted and scored successfully'
+    question_results = None
+    try:
+        answer_key = await load_answer_key(input.examId)
+        if answer_key is None:
+            raise ValueError('Exam not found')
+        scored = RUNNING_SCORES.finalize(f"{input.examId}_{input.studentId}", answer_key, input.answers)
+        question_results = scored['questionResults']
+        # Per-question results are stored as a bitset against the key version, see GET /submissions/{id}
+        submission.update({
+            'scored': True,
+            'scoredAt': datetime.now(timezone.utc).isoformat(),
+            **compact_score(answer_key, scored),
+        })
+    except Exception as e:
+        logger.error(f"Auto-scoring failed for submission {submission_id}: {str(e)}")
+        message = 'Exam submitted; scoring will be completed later'
+
+    # Word, sentence and paragraph counts of Writing responses, for review lists and dashboards
+    if submission['scored']:
+        text_stats = submission_text_stats(answer_key, input.answers)
+        if text_stats:
+            submission['textStats'] = text_stats
+
+    # One write for the submission and its result, plus the key version it
+    # was scored against the first time this worker uses that version
+    writes = {f'submissions/{submission_id}': submission}
+    archived = (input.examId, answer_key['version']) if submission['scored'] else None
+    if archived and archived not in ARCHIVED_KEY_VERSIONS:
+        writes[f'answer_key_versions/{input.examId}/{answer_key["version"]}'] = storable_answer_key(answer_key)
+    # Lookups by student and by exam read these fan-out indexes, kept in the same write
+    writes.update(index_writes(submission_id, submission))
+    # Manually marked answers join the review queue, and their signatures the
+    # similarity scan's input, in the same write
+    if submission['scored']:
+        writes.update(enqueue_writes(review_items(answer_key, submission, REVIEW_TARGET_HOURS)))
+        signatures = essay_signatures(answer_key, input.answers)
+        if signatures:
+            writes[f'writing_signatures/{input.examId}/{submission_id}'] = {
+                'studentId': input.studentId, 'questions': signatures,
+            }
+    await db_update('/', writes)
+    if archived:
+        ARCHIVED_KEY_VERSIONS.add(archived)
+
+    # Derived data, rebuildable from submissions: a failure only leaves it behind
+    if submission['scored']:
+        try:
+            await asyncio.to_thread(
+                RESPONSE_MATRICES.append, input.examId, answer_key, submission_id, input.studentId,
+                input.answers, question_results,
+            )
+        except Exception as e:
+            logger.warning(f"Response matrix append failed for submission {submission_id}: {str(e)}")
+        try:
+            await record_cohort_result(input.examId, answer_key, submission)
+        except Exception as e:
+            logger.warning(f"Cohort stats update failed for submission {submission_id}: {str(e)}")
+    return {'success': True, 'submissionId': submission_id, 'message': message}
+
+@api_router.get("/students/{student_id}/submissions")
+async def get_student_submissions(student_id: str, examId: Optional[str] = None, full: bool = False):
+    # One read of the student's index node; ?full=true also fetches each submission
+    entries = listed(await db_get(f'student_submissions/{student_id}'), exam_id=examId)
+    if full:
+        records = await asyncio.gather(*(db_get(f"submissions/{entry['submissionId']}") for entry in entries))
+        return {"success": True, "submissions": [record for record in records if record is not None]}
+    return {"success": True, "submissions": entries}
+
+@api_router.get("/exams/{exam_id}/submissions")
+async def get_exam_submissions(
+    exam_id: str,
+    limit: int = Query(default=100, ge=1, le=5000),
+    admin: dict = Depends(require_admin),
+):
+    # Most recent submissions of the exam from its index node
+    query = db_reference(f'exam_submissions/{exam_id}').order_by_child('submittedAt').limit_to_last(limit)
+    entries = await asyncio.to_thread(query.get)
+    return {"success": True, "examId": exam_id, "submissions": listed(entries)}
+
+@api_router.post("/submissions/indexes/rebuild")
+async def rebuild_submission_index_nodes(admin: dict = Depends(require_admin)):
+    # Backfill of student_submissions and exam_submissions for submissions written before them
+    started = time.perf_counter()
+    scanned = await rebuild_submission_indexes()
+    logger.info(f"Rebuilt submission indexes for {admin.get('email') or admin['via']}: {scanned} submissions")
+    return {
+        "success": True,
+        "submissionsScanned": scanned,
+        "durationMs": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+@api_router.get("/submissions/{submission_id}")
+async def get_submission(submission_id: str, expand: bool = True):
+    # Compact results are expanded to full questionResults unless ?expand=false
+    submission = await db_get(f'submissions/{submission_id}')
+    if submission is None:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    if expand and is_compact(submission):
+        answer_key = await load_key_version(submission.get('examId'), submission['results'].get('keyVersion'))
+        if answer_key is not None:
+            submission['questionResults'] = expand_results(answer_key, submission['results'], submission.get('answers'))
+        else:
+            logger.warning(f"Answer key version missing for submission {submission_id}")
+    return {"success": True, "submission": submission}
+
+@api_router.post("/submissions")
+async def submit_exam(
+    input: ExamSubmission,
+    response: Response,
+    idempotency_key: Optional[str] = Header(default=None),
+):
+    # Retries with the same Idempotency-Key (default: exam + student + attempt)
+    # get the original result back without a second write or scoring run
+    key = idempotency_key or f"{input.examId}:{input.studentId}:{input.attempt}"
+    try:
+        result, replayed = await SUBMISSION_INDEX.run(
+            key,
+            lambda: create_submission(input, key),
+            fingerprint=payload_fingerprint(input.model_dump()),
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if replayed:
+        response.headers['Idempotent-Replayed'] = 'true'
+    return result
+
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@api_router.get("/debug/profile", response_class=PlainTextResponse)
+async def debug_profile(
+    seconds: float = Query(10, gt=0, le=MAX_PROFILE_SECONDS),
+    interval_ms: float = Query(5, ge=1, le=100),
+    include_idle: bool = False,
+    download: bool = False,
+    admin: dict = Depends(require_admin),
+):
+    # Sample every thread and the event loop, return collapsed stacks for flamegraph tools
+    if profile_in_progress():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    logger.info(f"Profiling for {seconds}s requested by {admin.get('email') or admin['via']}")
+    profiler = await profile_for(seconds, interval=interval_ms / 1000, include_idle=include_idle)
+
+    headers = {"X-Profile-Samples": str(profiler.samples)}
+    if download:
+        filename = f"profile-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}.collapsed"
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return PlainTextResponse(profiler.collapsed(), headers=headers)
+
 # Include the router in the main app
 app.include_router(api_router)
 
+# Admission control: per-client token buckets, per-route concurrency caps and
+# event-loop-lag shedding (admin work is shed well before candidate traffic).
+# Added before CORS so 429/503 responses still carry CORS headers.
+ADMISSION_POLICIES = {
+    'GET /api/exams/{exam_id}': RoutePolicy(rate=2, burst=10),
+    'POST /api/progress': RoutePolicy(rate=0.5, burst=5, max_concurrency=500),
+    'GET /api/progress': RoutePolicy(rate=1, burst=10),
+    'POST /api/submissions': RoutePolicy(rate=0.2, burst=5, max_concurrency=500),
+    'GET /api/debug/profile': RoutePolicy(max_concurrency=1, priority=ADMIN),
+    'POST /api/exams/{exam_id}/rescore': RoutePolicy(max_concurrency=1, priority=ADMIN),
+    'POST /api/exams/{exam_id}/response-matrix/rebuild': RoutePolicy(max_concurrency=1, priority=ADMIN),
+    'GET /api/exams/{exam_id}/item-analysis': RoutePolicy(max_concurrency=4, priority=ADMIN),
+    'POST /api/exams/{exam_id}/cohort-stats/rebuild': RoutePolicy(max_concurrency=1, priority=ADMIN),
+    'GET /api/exams/{exam_id}/leaderboard': RoutePolicy(max_concurrency=4, priority=ADMIN),
+    'POST /api/exams/{exam_id}/similarity/scan': RoutePolicy(max_concurrency=1, priority=ADMIN),
+    'POST /api/exams/{exam_id}/text-stats/backfill': RoutePolicy(max_concurrency=1, priority=ADMIN),
+    'GET /api/students/{student_id}/submissions': RoutePolicy(rate=1, burst=10),
+    'GET /api/exams/{exam_id}/submissions': RoutePolicy(max_concurrency=4, priority=ADMIN),
+    'POST /api/submissions/indexes/rebuild': RoutePolicy(max_concurrency=1, priority=ADMIN),
+    'POST /api/review/claim': RoutePolicy(max_concurrency=8, priority=ADMIN),
+    'POST /api/review/items/{item_id}/renew': RoutePolicy(priority=ADMIN),
+    'POST /api/review/items/{item_id}/release': RoutePolicy(priority=ADMIN),
+    'POST /api/review/items/{item_id}/complete': RoutePolicy(priority=ADMIN),
+}
+DEFAULT_ADMISSION_POLICY = RoutePolicy(rate=20, burst=40)
+if os.environ.get('ADMISSION_CONTROL', 'on').lower() != 'off':
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        policies=ADMISSION_POLICIES,
+        default_policy=DEFAULT_ADMISSION_POLICY,
+        trust_proxy=os.environ.get('TRUST_PROXY_HEADERS', 'false').lower() == 'true',
+        shared_ip_clients=int(os.environ.get('ADMISSION_SHARED_IP_CLIENTS', SHARED_IP_CLIENTS)),
+    )
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -116,12 +1027,57 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Negotiated zstd/br/gzip compression; compressed bodies of ETag'd responses are cached
+app.add_middleware(
+    CompressionMiddleware,
+    min_size=int(os.environ.get('COMPRESSION_MIN_SIZE', DEFAULT_MIN_SIZE)),
+)
+
+# Optional 1-in-N request profiling with cProfile (PROFILE_SAMPLE_RATE=0 disables it)
+app.add_middleware(
+    RequestProfilerMiddleware,
+    sample_rate=int(os.environ.get('PROFILE_SAMPLE_RATE', '0')),
+    output_dir=os.environ.get('PROFILE_DIR', str(ROOT_DIR / 'profiles')),
+)
+
+# Sanitized request traces for replay against staging (TRACE_CAPTURE_DIR unset disables it)
+TRACE_WRITER = None
+if os.environ.get('TRACE_CAPTURE_DIR'):
+    TRACE_WRITER = TraceWriter(
+        os.environ['TRACE_CAPTURE_DIR'],
+        segment_records=int(os.environ.get('TRACE_SEGMENT_RECORDS', DEFAULT_SEGMENT_RECORDS)),
+        max_segments=int(os.environ.get('TRACE_MAX_SEGMENTS', DEFAULT_MAX_SEGMENTS)),
+    )
+    app.add_middleware(
+        TraceCaptureMiddleware,
+        writer=TRACE_WRITER,
+        sample_rate=float(os.environ.get('TRACE_SAMPLE_RATE', '1')),
+        secret=os.environ.get('TRACE_SECRET') or None,
+    )
+
+# Outermost middleware so recorded latency covers the whole request
+app.add_middleware(MetricsMiddleware, registry=REGISTRY)
+
+# Configure logging: records are queued and written by a background listener
+# so log I/O never blocks a request
+configure_logging(
+    level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+    json_output=os.environ.get('LOG_FORMAT', 'json') == 'json',
+    sampling=parse_logger_map(os.environ.get('LOG_SAMPLING')),
+    rate_limits=parse_logger_map(os.environ.get('LOG_RATE_LIMITS')),
+    max_message_bytes=int(os.environ.get('LOG_MAX_MESSAGE_BYTES', DEFAULT_MAX_MESSAGE_BYTES)),
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("shutdown")
+def flush_cohort_results():
+    COHORT_RESULTS.close()
+
+@app.on_event("shutdown")
+def flush_logs():
+    if TRACE_WRITER is not None:
+        TRACE_WRITER.close()
+    shutdown_logging()
+
 # Firebase cleanup is handled automatically by the SDK
 # No explicit shutdown needed for Firebase Realtime Database
\ No newline at end of file
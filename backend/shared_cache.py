@@ -0,0 +1,208 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines run a single worker
+    fcntl = None
+
+from metrics import REGISTRY
+
+
+# Counter file per key: published generation, last reserved generation
+COUNTERS = struct.Struct('<QQ')
+# Data file header: generation, written-at (unix seconds), etag length
+HEADER = struct.Struct('<QdH')
+
+DEFAULT_TTL = 300
+DEFAULT_LOCAL_ENTRIES = 256
+
+REGISTRY.describe('shared_cache_requests_total', 'Shared exam cache lookups by result')
+
+
+def default_cache_dir():
+    # /dev/shm is RAM-backed, so the mapped pages are the only copy of the data
+    base = Path('/dev/shm') if Path('/dev/shm').is_dir() else Path(tempfile.gettempdir())
+    return base / 'ielts-exam-cache'
+
+
+class SharedExamCache:
+    """Cross-process cache of serialized exams and answer keys in mmap'd files
+
+    Every worker on the host maps the same files, so the page cache holds one
+    copy of each entry however many uvicorn/gunicorn workers run. Each key
+    has a generation counter in its own mapped file; ``put`` reserves the
+    next generation, writes ``<key>.<generation>.bin`` and publishes it,
+    ``invalidate`` publishes a generation with no data file. Readers compare
+    the counter with the file they mapped, so an update or invalidation in
+    one worker is seen by all of them on their next lookup without any
+    messaging. Entries older than ``ttl`` seconds are treated as misses,
+    since exams can also be edited through the Node functions.
+
+    A fill takes ``latest_generation(key)`` before reading the source and
+    passes it to ``put`` as ``since``: the value is then only published if
+    no invalidation (or other fill) reserved a generation in between, so
+    data read before an edit is never published after it.
+    """
+
+    def __init__(self, directory=None, ttl=DEFAULT_TTL, local_entries=DEFAULT_LOCAL_ENTRIES):
+        self.directory = Path(directory or default_cache_dir())
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.local_entries = local_entries
+        self._generations = {}
+        self._mapped = {}
+        self._parsed = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _name(key):
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _counter_map(self, name):
+        counter_map = self._generations.get(name)
+        if counter_map is None:
+            fd = os.open(self.directory / f'{name}.gen', os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                if os.fstat(fd).st_size < COUNTERS.size:
+                    os.pwrite(fd, b'\0' * COUNTERS.size, 0)
+                counter_map = mmap.mmap(fd, COUNTERS.size)
+            finally:
+                os.close(fd)
+            self._generations[name] = counter_map
+        return counter_map
+
+    def generation(self, key):
+        return COUNTERS.unpack_from(self._counter_map(self._name(key)))[0]
+
+    def latest_generation(self, key):
+        """Highest generation published or reserved so far; a fill started now follows it"""
+        return max(COUNTERS.unpack_from(self._counter_map(self._name(key))))
+
+    def _update_counters(self, name, update):
+        """Apply ``update(published, reserved) -> (published, reserved)`` under a cross-process lock"""
+        counter_map = self._counter_map(name)
+        with open(self.directory / f'{name}.gen', 'rb+') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            published, reserved = update(*COUNTERS.unpack_from(counter_map))
+            COUNTERS.pack_into(counter_map, 0, published, reserved)
+            return published, reserved
+
+    def _reserve(self, name):
+        # Concurrent writers each get their own generation, so they never share a file name
+        return self._update_counters(name, lambda published, reserved: (published, max(published, reserved) + 1))[1]
+
+    def get_bytes(self, key):
+        """Return ``(etag, body)`` for a live entry, or None; ``body`` is a view of the shared mapping"""
+        name = self._name(key)
+        with self._lock:
+            generation = COUNTERS.unpack_from(self._counter_map(name))[0]
+            mapped = self._mapped.get(name)
+            if mapped is None or mapped[0] != generation:
+                mapped = self._map_data(name, generation)
+                if mapped is None:
+                    self._mapped.pop(name, None)
+                    REGISTRY.inc('shared_cache_requests_total', (('result', 'miss'),))
+                    return None
+                self._mapped[name] = mapped
+
+        _, written_at, etag, body = mapped
+        if self.ttl and time.time() - written_at > self.ttl:
+            REGISTRY.inc('shared_cache_requests_total', (('result', 'expired'),))
+            return None
+        REGISTRY.inc('shared_cache_requests_total', (('result', 'hit'),))
+        return etag, body
+
+    def _map_data(self, name, generation):
+        if generation == 0:
+            return None
+        try:
+            with open(self.directory / f'{name}.{generation}.bin', 'rb') as data_file:
+                data = mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # Superseded and removed between reading the counter and opening the file
+            return None
+        stored_generation, written_at, etag_length = HEADER.unpack_from(data)
+        if stored_generation != generation:
+            return None
+        etag = bytes(data[HEADER.size:HEADER.size + etag_length]).decode('ascii')
+        body = memoryview(data)[HEADER.size + etag_length:]
+        return generation, written_at, etag, body
+
+    def get(self, key, transform=None):
+        """Parsed JSON value of an entry; parsed copies are kept per process in a small LRU
+
+        ``transform(value)`` runs once per parsed copy, e.g. to build lookup
+        structures that JSON cannot hold.
+        """
+        name = self._name(key)
+        entry = self.get_bytes(key)
+        if entry is None:
+            return None
+        etag = entry[0]
+        with self._lock:
+            cached = self._parsed.get(name)
+            if cached is not None and cached[0] == etag:
+                self._parsed.move_to_end(name)
+                return cached[1]
+        value = json.loads(bytes(entry[1]))
+        if transform is not None:
+            value = transform(value)
+        with self._lock:
+            self._parsed[name] = (etag, value)
+            while len(self._parsed) > self.local_entries:
+                self._parsed.popitem(last=False)
+        return value
+
+    def put_bytes(self, key, body, etag, since=None):
+        """Write and publish an entry; returns False when ``since`` shows the value was superseded"""
+        name = self._name(key)
+        etag_bytes = etag.encode('ascii')
+        generation = self._reserve(name)
+        if since is not None and generation != since + 1:
+            # An invalidation or another fill reserved a generation since the value was read;
+            # leaving ours unpublished keeps whichever of them lands
+            return False
+        path = self.directory / f'{name}.{generation}.tmp'
+        with open(path, 'wb') as data_file:
+            data_file.write(HEADER.pack(generation, time.time(), len(etag_bytes)))
+            data_file.write(etag_bytes)
+            data_file.write(body)
+        os.replace(path, self.directory / f'{name}.{generation}.bin')
+        self._publish(name, generation)
+        return True
+
+    def put(self, key, value, etag=None, since=None):
+        body = json.dumps(value, separators=(',', ':'), ensure_ascii=False, default=str).encode('utf-8')
+        etag = etag or '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.put_bytes(key, body, etag, since)
+        return body, etag
+
+    def invalidate(self, key):
+        name = self._name(key)
+        self._publish(name, self._reserve(name))
+
+    def _publish(self, name, generation):
+        # A newer write or invalidation that already landed wins
+        published, _ = self._update_counters(
+            name, lambda published, reserved: (max(published, generation), reserved)
+        )
+        if published != generation:
+            (self.directory / f'{name}.{generation}.bin').unlink(missing_ok=True)
+            return
+        # Processes that still map an old generation keep a valid view after unlink
+        for stale in self.directory.glob(f'{name}.*.bin'):
+            try:
+                if int(stale.name.split('.')[1]) < generation:
+                    stale.unlink()
+            except (ValueError, FileNotFoundError):
+                pass
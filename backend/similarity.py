@@ -0,0 +1,153 @@
+import base64
+import hashlib
+import re
+from collections import defaultdict
+
+import numpy as np
+
+from scoring import exam_questions, is_manually_marked, lookup_answer, question_key
+
+
+# Word 5-grams: long enough that essays on the same prompt rarely share them by chance
+SHINGLE_WORDS = 5
+# 32 bands of 4 rows: pairs around Jaccard 0.42 become candidates half the
+# time, pairs above 0.7 almost always
+BANDS = 32
+ROWS = 4
+NUM_PERM = BANDS * ROWS
+DEFAULT_THRESHOLD = 0.7
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _seeded(label, bits):
+    return int.from_bytes(hashlib.blake2b(label.encode('utf-8'), digest_size=8).digest(), 'little') % (1 << bits)
+
+
+# Universal hash family h(x) = (a * x + b) mod p; derived from fixed labels
+# rather than a random generator so signatures stored by any worker agree.
+# a, b < 2**31 and x < 2**32 keep a * x + b inside uint64.
+_A = np.array([_seeded(f'minhash-a:{index}', 31) | 1 for index in range(NUM_PERM)], dtype=np.uint64)
+_B = np.array([_seeded(f'minhash-b:{index}', 31) for index in range(NUM_PERM)], dtype=np.uint64)
+
+
+def words(text):
+    return re.findall(r"[a-z0-9']+", str(text or '').lower())
+
+
+def shingles(text, size=SHINGLE_WORDS):
+    tokens = words(text)
+    return {' '.join(tokens[index:index + size]) for index in range(len(tokens) - size + 1)}
+
+
+def minhash(shingle_set):
+    """MinHash signature (NUM_PERM uint32 values) of a shingle set; None when it is empty
+
+    The fraction of positions where two signatures agree estimates the
+    Jaccard similarity of their sets.
+    """
+    if not shingle_set:
+        return None
+    hashed = np.array(
+        [int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=4).digest(), 'little')
+         for shingle in shingle_set],
+        dtype=np.uint64,
+    )
+    permuted = (np.outer(hashed, _A) + _B) % _PRIME & _MAX_HASH
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def encode_signature(signature):
+    return base64.b64encode(signature.astype('<u4').tobytes()).decode('ascii')
+
+
+def decode_signature(encoded):
+    return np.frombuffer(base64.b64decode(encoded), dtype='<u4')
+
+
+def essay_signatures(answer_key, answers):
+    """Encoded signatures of a submission's Writing responses by question key; too-short responses are skipped"""
+    signatures = {}
+    for question in exam_questions(answer_key):
+        if not is_manually_marked(question):
+            continue
+        signature = minhash(shingles(lookup_answer(answers or {}, question)))
+        if signature is not None:
+            signatures[question_key(question)] = encode_signature(signature)
+    return signatures
+
+
+def estimated_similarity(left, right):
+    return float(np.mean(left == right))
+
+
+class LSHIndex:
+    """Banded locality-sensitive hash index over MinHash signatures
+
+    Each signature is cut into ``bands`` runs of ``rows`` values; two items
+    become a candidate pair when any band matches exactly. Building the
+    index and listing candidates is linear in the number of items plus
+    the number of colliding pairs, instead of comparing every pair.
+    """
+
+    def __init__(self, bands=BANDS, rows=ROWS):
+        self.bands = bands
+        self.rows = rows
+        self.buckets = defaultdict(list)
+
+    def add(self, item, signature):
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows]
+            self.buckets[band, chunk.tobytes()].append(item)
+
+    def candidate_pairs(self):
+        pairs = set()
+        for members in self.buckets.values():
+            for index, left in enumerate(members):
+                for right in members[index + 1:]:
+                    pairs.add((left, right) if left < right else (right, left))
+        return pairs
+
+
+def near_duplicates(signatures, threshold=DEFAULT_THRESHOLD):
+    """Likely near-duplicate Writing responses of one exam
+
+    ``signatures`` is the stored ``{submissionId: {studentId, questions:
+    {questionKey: signature}}}``. Responses to the same question are
+    indexed together; candidate pairs from the LSH index are kept when
+    their estimated similarity reaches ``threshold``. Pairs from the same
+    student (re-sits) are ignored.
+    """
+    by_question = defaultdict(dict)
+    for submission_id, entry in (signatures or {}).items():
+        for key, encoded in ((entry or {}).get('questions') or {}).items():
+            by_question[key][submission_id] = decode_signature(encoded)
+
+    pairs, candidates = [], 0
+    for key, decoded in sorted(by_question.items()):
+        index = LSHIndex()
+        for submission_id, signature in decoded.items():
+            if len(signature) == NUM_PERM:
+                index.add(submission_id, signature)
+        for left, right in index.candidate_pairs():
+            candidates += 1
+            left_student = signatures[left].get('studentId')
+            right_student = signatures[right].get('studentId')
+            if left_student and left_student == right_student:
+                continue
+            similarity = estimated_similarity(decoded[left], decoded[right])
+            if similarity >= threshold:
+                pairs.append({
+                    'questionKey': key,
+                    'similarity': round(similarity, 3),
+                    'submissions': [{'submissionId': left, 'studentId': left_student},
+                                    {'submissionId': right, 'studentId': right_student}],
+                })
+    pairs.sort(key=lambda pair: (-pair['similarity'], pair['questionKey'],
+                                 [entry['submissionId'] for entry in pair['submissions']]))
+    return {
+        'responses': sum(len(decoded) for decoded in by_question.values()),
+        'candidatePairs': candidates,
+        'pairs': pairs,
+    }
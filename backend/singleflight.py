@@ -0,0 +1,38 @@
+import asyncio
+
+from metrics import REGISTRY
+
+
+REGISTRY.describe('singleflight_calls_total', 'Coalesced reads by node and whether they led the fetch or shared it')
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one in-flight call
+
+    The first caller starts the fetch as its own task; everyone arriving
+    while it runs awaits that task and gets the same result (or exception).
+    The fetch is shielded, so a caller disconnecting does not cancel it for
+    the others. Results are shared objects and must be treated as read-only.
+    """
+
+    def __init__(self, name='default'):
+        self.name = name
+        self._calls = {}
+
+    def in_flight(self):
+        return len(self._calls)
+
+    async def do(self, key, fn, label=None):
+        task = self._calls.get(key)
+        role = 'shared'
+        if task is None:
+            role = 'leader'
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _, key=key, task=task: self._forget(key, task))
+        REGISTRY.inc('singleflight_calls_total', (('group', self.name), ('node', label or self.name), ('role', role)))
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
@@ -0,0 +1,37 @@
+# Fields copied into the fan-out index entries; all are fixed when the
+# submission is created, so rescoring and review never touch the indexes
+INDEX_FIELDS = ('examId', 'studentId', 'submittedAt', 'attempt')
+DEFAULT_PAGE_SIZE = 1000
+
+
+def index_entry(submission):
+    return {field: submission[field] for field in INDEX_FIELDS if submission.get(field) is not None}
+
+
+def index_writes(submission_id, submission):
+    """Multi-path writes placing a submission under student_submissions/{studentId} and exam_submissions/{examId}
+
+    Written in the same update as the submission itself, so a lookup by
+    student or exam is a read of one child whose size depends only on
+    that student's or exam's submissions.
+    """
+    if not submission:
+        return {}
+    entry = index_entry(submission)
+    writes = {}
+    if submission.get('studentId'):
+        writes[f"student_submissions/{submission['studentId']}/{submission_id}"] = entry
+    if submission.get('examId'):
+        writes[f"exam_submissions/{submission['examId']}/{submission_id}"] = entry
+    return writes
+
+
+def listed(entries, exam_id=None):
+    """Index entries as a list, newest first, optionally of one exam only"""
+    rows = [
+        {'submissionId': submission_id, **entry}
+        for submission_id, entry in (entries or {}).items()
+        if entry and (exam_id is None or entry.get('examId') == exam_id)
+    ]
+    rows.sort(key=lambda row: row.get('submittedAt') or '', reverse=True)
+    return rows
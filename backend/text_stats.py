@@ -0,0 +1,108 @@
+import multiprocessing
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from scoring import exam_questions, is_manually_marked, lookup_answer, question_key
+
+
+# Moving-average type-token ratio window: plain TTR falls as essays get
+# longer, MATTR over fixed windows compares a 150- and a 350-word script fairly
+MATTR_WINDOW = 50
+DEFAULT_CHUNKSIZE = 64
+
+_WORD = re.compile(r"[^\W_]+(?:['’-][^\W_]+)*")
+_SENTENCE = re.compile(r"[^.!?]+(?:[.!?]+|$)")
+_PARAGRAPH_BREAK = re.compile(r"\s*\n\s*")
+
+
+def moving_type_token_ratio(words, window=MATTR_WINDOW):
+    """Mean distinct-word ratio over every ``window``-word span (plain TTR for shorter texts)"""
+    if not words:
+        return 0.0
+    if len(words) <= window:
+        return len(set(words)) / len(words)
+    counts = Counter(words[:window])
+    total = len(counts)
+    for index in range(window, len(words)):
+        leaving, entering = words[index - window], words[index]
+        counts[leaving] -= 1
+        if not counts[leaving]:
+            del counts[leaving]
+        counts[entering] += 1
+        total += len(counts)
+    return total / (len(words) - window + 1) / window
+
+
+def text_statistics(text, word_limit=None):
+    """Length, sentence, paragraph and vocabulary features of one Writing response
+
+    Words are counted the way markers count them: hyphenated and
+    apostrophe'd forms are one word, numbers are words.
+    """
+    text = str(text or '')
+    words = [word.lower() for word in _WORD.findall(text)]
+    sentences = [sentence for sentence in _SENTENCE.findall(text) if _WORD.search(sentence)]
+    paragraphs = [paragraph for paragraph in _PARAGRAPH_BREAK.split(text.strip()) if _WORD.search(paragraph)]
+    stats = {
+        'wordCount': len(words),
+        'uniqueWords': len(set(words)),
+        'sentenceCount': len(sentences),
+        'paragraphCount': len(paragraphs),
+        'meanSentenceLength': round(len(words) / len(sentences), 1) if sentences else 0,
+        'lexicalDiversity': round(moving_type_token_ratio(words), 3),
+    }
+    if word_limit:
+        stats['wordLimit'] = word_limit
+        stats['wordLimitRatio'] = round(len(words) / word_limit, 2)
+        stats['belowWordLimit'] = len(words) < word_limit
+    return stats
+
+
+def submission_text_stats(answer_key, answers):
+    """Statistics of a submission's answered Writing responses, by question key"""
+    limits = answer_key.get('wordLimits') or {}
+    stats = {}
+    for question in exam_questions(answer_key):
+        if not is_manually_marked(question):
+            continue
+        response = lookup_answer(answers or {}, question)
+        if response:
+            key = question_key(question)
+            stats[key] = text_statistics(response, limits.get(key))
+    return stats
+
+
+# Process pool workers receive the answer key once, not with every submission
+_WORKER_KEY = None
+
+
+def _set_worker_key(answer_key):
+    global _WORKER_KEY
+    _WORKER_KEY = answer_key
+
+
+def _submission_stats(job):
+    submission_id, answers = job
+    return submission_id, submission_text_stats(_WORKER_KEY, answers)
+
+
+def batch_text_stats(answer_key, submissions, workers=None, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield ``(submission_id, stats)`` for ``(submission_id, submission)`` pairs, in order
+
+    For backfills: the work is spread over a process pool (``workers=1``
+    stays in process) and results stream back in chunks as they finish.
+    Workers are spawned, not forked, as this runs beside the server's threads.
+    """
+    key = {
+        'questions': [question for question in exam_questions(answer_key) if is_manually_marked(question)],
+        'wordLimits': answer_key.get('wordLimits') or {},
+    }
+    jobs = ((submission_id, (submission or {}).get('answers')) for submission_id, submission in submissions)
+    if workers == 1:
+        _set_worker_key(key)
+        yield from map(_submission_stats, jobs)
+        return
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_set_worker_key, initargs=(key,)) as pool:
+        yield from pool.map(_submission_stats, jobs, chunksize=chunksize)
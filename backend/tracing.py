@@ -0,0 +1,281 @@
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import queue
+import random
+import secrets
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.datastructures import Headers
+from starlette.routing import Match
+
+from metrics import REGISTRY, find_router
+
+
+DEFAULT_SEGMENT_RECORDS = 50000
+DEFAULT_MAX_SEGMENTS = 48
+DEFAULT_QUEUE_SIZE = 10000
+# Request bodies beyond this are only measured, not kept
+MAX_CAPTURED_BODY = 256 * 1024
+
+# Values that identify resources rather than people; replay needs them verbatim.
+# Submission and review item ids are opaque uuids, so keeping them reveals nothing
+KEEP_FIELDS = {
+    'exam_id', 'examId', 'track_id', 'trackId', 'submission_id', 'submissionId', 'item_id', 'itemId',
+    'question_type', 'filename', 'attempt', 'currentQuestionIndex',
+    'timeSpent', 'audioProgress', 'seconds', 'interval_ms',
+}
+# Values that identify people; replaced by a stable keyed pseudonym
+PSEUDONYMIZED_FIELDS = {'studentId', 'student_id', 'x-student-id', 'idempotency-key', 'email', 'uid'}
+# Request headers worth replaying; everything else (cookies, auth) is dropped
+KEPT_HEADERS = {'accept-encoding', 'content-type', 'range', 'if-none-match', 'x-student-id', 'idempotency-key'}
+
+REGISTRY.describe('trace_records_total', 'Request traces captured or dropped')
+
+
+class Sanitizer:
+    """Strips personal data from captured requests while keeping their shape and size
+
+    Student ids and idempotency keys become ``anon-<hmac>``, stable for a
+    given secret so one candidate's requests stay grouped in a trace; other
+    strings are masked to the same length and numbers are kept.
+    """
+
+    def __init__(self, secret=None):
+        self.secret = (secret or secrets.token_hex(16)).encode('utf-8')
+
+    def pseudonym(self, value):
+        digest = hmac.new(self.secret, str(value).encode('utf-8'), hashlib.sha256).hexdigest()
+        return f'anon-{digest[:16]}'
+
+    def value(self, name, value):
+        if name in KEEP_FIELDS:
+            return value
+        if name in PSEUDONYMIZED_FIELDS:
+            return self.pseudonym(value) if value not in (None, '') else value
+        if isinstance(value, dict):
+            return {key: self.value(key, child) for key, child in value.items()}
+        if isinstance(value, list):
+            return [self.value(name, child) for child in value]
+        if isinstance(value, str):
+            return 'x' * len(value)
+        return value
+
+    def body(self, raw):
+        if not raw:
+            return None
+        if len(raw) > MAX_CAPTURED_BODY:
+            return None
+        try:
+            parsed = json.loads(raw)
+        except ValueError:
+            return None
+        return self.value(None, parsed)
+
+
+class TraceWriter:
+    """Background thread writing trace records to rotating gzip'd NDJSON segments
+
+    Requests only pay for a ``put_nowait``; records are dropped (and
+    counted) when the queue is full. A segment is closed after
+    ``segment_records`` records and only the newest ``max_segments`` are
+    kept. Open segments are sync-flushed periodically, so a crash loses at
+    most the last second of traffic.
+    """
+
+    def __init__(self, directory, segment_records=DEFAULT_SEGMENT_RECORDS, max_segments=DEFAULT_MAX_SEGMENTS,
+                 queue_size=DEFAULT_QUEUE_SIZE, flush_interval=1.0):
+        self.directory = Path(directory)
+        self.segment_records = segment_records
+        self.max_segments = max_segments
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._segment = None
+        self._segment_count = 0
+        self._sequence = 0
+
+    def write(self, record):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+            REGISTRY.inc('trace_records_total', (('result', 'captured'),))
+        except queue.Full:
+            self.dropped += 1
+            REGISTRY.inc('trace_records_total', (('result', 'dropped'),))
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self.directory.mkdir(parents=True, exist_ok=True)
+                    self._thread = threading.Thread(target=self._run, name='trace-writer', daemon=True)
+                    self._thread.start()
+
+    def close(self):
+        """Write out queued records and close the open segment"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                record = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                record = False
+            if record is None:
+                self._close_segment()
+                return
+            if record:
+                self._append(record)
+            if self._segment is not None and time.monotonic() - last_flush >= self.flush_interval:
+                self._segment.flush()
+                last_flush = time.monotonic()
+
+    def _append(self, record):
+        if self._segment is None:
+            self._sequence += 1
+            name = f"trace-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{self._sequence}.ndjson.gz"
+            self._segment = gzip.open(self.directory / name, 'wt', encoding='utf-8')
+            self._prune()
+        self._segment.write(json.dumps(record, separators=(',', ':'), default=str) + '\n')
+        self._segment_count += 1
+        if self._segment_count >= self.segment_records:
+            self._close_segment()
+
+    def _close_segment(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+            self._segment_count = 0
+
+    def _prune(self):
+        segments = sorted(self.directory.glob('trace-*.ndjson.gz'), key=lambda path: path.stat().st_mtime)
+        for stale in segments[:max(0, len(segments) - self.max_segments)]:
+            stale.unlink(missing_ok=True)
+
+
+def read_traces(paths):
+    """Yield records from trace segments (files or directories), tolerating a segment still being written"""
+    files = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.glob('trace-*.ndjson.gz')) if path.is_dir() else [path])
+    for path in files:
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as segment:
+                for line in segment:
+                    if line.strip():
+                        yield json.loads(line)
+        except (EOFError, gzip.BadGzipFile):
+            # Unterminated segment from a live or crashed writer: keep what was read
+            continue
+
+
+def match_route(router, scope):
+    """(route template, path params) of the route serving ``scope``"""
+    for route in getattr(router, 'routes', ()):
+        match, child_scope = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, 'path', scope['path']), child_scope.get('path_params', {})
+    return 'unmatched', {}
+
+
+class TraceCaptureMiddleware:
+    """Record sanitized request traces for replay against a staging instance
+
+    Each record has the route template, a replayable path and query with
+    personal data pseudonymized, replay-relevant headers, the sanitized
+    JSON body, request/response sizes, status, server-side duration and
+    the arrival time (which gives inter-arrival times).
+    Requests with an Authorization header (admin and ops tooling) are not
+    captured.
+    """
+
+    def __init__(self, app, writer, sample_rate=1.0, secret=None, exclude=('/api/metrics',)):
+        self.app = app
+        self.writer = writer
+        self.sample_rate = sample_rate
+        self.sanitizer = Sanitizer(secret)
+        self.exclude = set(exclude)
+        self._router = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] == 'OPTIONS' or scope['path'] in self.exclude \
+                or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        if 'authorization' in headers:
+            await self.app(scope, receive, send)
+            return
+
+        arrived = time.time()
+        started = time.monotonic()
+        body = bytearray()
+        request_bytes = 0
+        response = {'status': 500, 'bytes': 0}
+
+        async def receive_wrapper():
+            nonlocal request_bytes
+            message = await receive()
+            if message['type'] == 'http.request':
+                chunk = message.get('body', b'')
+                request_bytes += len(chunk)
+                if len(body) + len(chunk) <= MAX_CAPTURED_BODY:
+                    body.extend(chunk)
+            return message
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+            elif message['type'] == 'http.response.body':
+                response['bytes'] += len(message.get('body', b''))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            self.writer.write(self._record(scope, headers, arrived, started, bytes(body), request_bytes, response))
+
+    def _record(self, scope, headers, arrived, started, body, request_bytes, response):
+        if self._router is None:
+            self._router = find_router(self.app)
+        route, path_params = match_route(self._router, scope)
+
+        path = scope['path']
+        if path_params:
+            path = route
+            for name, value in path_params.items():
+                path = path.replace('{' + name + '}', str(self.sanitizer.value(name, value)))
+        query = [(name, self.sanitizer.value(name, value))
+                 for name, value in parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True)]
+
+        return {
+            'ts': datetime.fromtimestamp(arrived, timezone.utc).isoformat(),
+            # Unix arrival time; workers' clocks agree, so merged traces keep their interleaving
+            'at': round(arrived, 6),
+            'method': scope['method'],
+            'route': route,
+            'path': path,
+            'query': urlencode(query),
+            'headers': {name: self.sanitizer.value(name, value) if name in PSEUDONYMIZED_FIELDS else value
+                        for name, value in headers.items() if name in KEPT_HEADERS},
+            'body': self.sanitizer.body(body),
+            'requestBytes': request_bytes,
+            'status': response['status'],
+            'responseBytes': response['bytes'],
+            'duration': round(time.monotonic() - started, 6),
+        }
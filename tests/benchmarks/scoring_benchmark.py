@@ -0,0 +1,244 @@
+"""Scoring microbenchmarks across question types, exam sizes and submission counts
+
+    python -m tests.benchmarks.scoring_benchmark run --save baseline.json
+    # ... change scoring.py ...
+    python -m tests.benchmarks.scoring_benchmark run --save current.json
+    python -m tests.benchmarks.scoring_benchmark compare baseline.json current.json --threshold 0.1
+
+``run --compare baseline.json`` does both in one go. ``compare`` exits
+with status 1 when any benchmark's median got slower by more than the
+threshold, so it can gate CI.
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[2] / 'backend'
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from scoring import FILL_IN_TYPES, MATCHING_TYPES, compile_answer_key, score_answers, score_question  # noqa: E402
+
+
+# Every branch of scoreQuestion's switch, plus writing (manual review)
+QUESTION_TYPES = (
+    'mcq_single', 'mcq_multiple', 'true_false_ng', *sorted(FILL_IN_TYPES), *sorted(MATCHING_TYPES),
+    'map_labelling', 'writing_task',
+)
+
+DEFAULT_SIZES = (10, 40, 100, 200)
+DEFAULT_SUBMISSIONS = (1, 100, 10000, 100000)
+# Distinct answer sets per case; larger runs cycle through them
+ANSWER_POOL = 1000
+
+
+def build_question(question_type, number, rng):
+    question = {
+        'id': f'q{number}',
+        'number': number,
+        'type': question_type,
+        'section': 'Listening' if number % 2 else 'Reading',
+        'text': f'Question {number}',
+        'points': 1,
+    }
+    if question_type in ('mcq_single', 'mcq_multiple'):
+        correct = {'B'} if question_type == 'mcq_single' else {'A', 'C'}
+        question['options'] = [
+            {'id': letter, 'text': f'Option {letter} {rng.randrange(1000)}', 'correct': letter in correct}
+            for letter in 'ABCDE'
+        ]
+        question['correctAnswer'] = sorted(correct) if question_type == 'mcq_multiple' else 'B'
+    elif question_type == 'true_false_ng':
+        question['correctAnswer'] = rng.choice(['TRUE', 'FALSE', 'NOT GIVEN'])
+    elif question_type in FILL_IN_TYPES or question_type == 'map_labelling':
+        question['correctAnswer'] = [f'answer {number}', f'the answer {number}']
+    elif question_type in MATCHING_TYPES:
+        if number % 3 == 0:
+            question['correctAnswer'] = {str(i): rng.choice('ABCDEFG') for i in range(1, 5)}
+        else:
+            question['correctAnswer'] = rng.choice('ABCDEFG')
+    return question
+
+
+def build_exam(size, rng, question_types=QUESTION_TYPES):
+    return {'questions': [build_question(question_types[n % len(question_types)], n + 1, rng) for n in range(size)]}
+
+
+def build_answer(question, correct, rng):
+    correct_answer = question.get('correctAnswer')
+    if question['type'].startswith('writing'):
+        return 'Some essay text ' * 20
+    if not correct:
+        return rng.choice([None, 'wrong', 'Z'])
+    if isinstance(correct_answer, list) and question['type'] != 'mcq_multiple':
+        return rng.choice(correct_answer).upper()
+    if isinstance(correct_answer, dict):
+        return dict(correct_answer)
+    return correct_answer
+
+
+def build_answer_sets(exam, count, rng):
+    """Answer sets from candidates of varying ability (beta-distributed accuracy)"""
+    sets = []
+    for _ in range(count):
+        ability = rng.betavariate(5, 3)
+        sets.append({
+            question['id']: build_answer(question, rng.random() < ability, rng)
+            for question in exam['questions']
+        })
+    return sets
+
+
+def measure(fn, rounds, max_time):
+    """Time ``fn`` up to ``rounds`` times, stopping early once ``max_time`` seconds are spent"""
+    timings = []
+    spent = 0.0
+    while len(timings) < rounds and (not timings or spent < max_time):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        timings.append(elapsed)
+        spent += elapsed
+    return timings
+
+
+def summarize(timings, items):
+    median = statistics.median(timings)
+    return {
+        'rounds': len(timings),
+        'items': items,
+        'min': min(timings),
+        'median': median,
+        'mean': statistics.fmean(timings),
+        'stddev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        'perItem': median / items,
+    }
+
+
+def question_type_cases(rng, calls):
+    for question_type in QUESTION_TYPES:
+        question = build_question(question_type, 1, rng)
+        answers = [build_answer(question, correct, rng) for correct in (True, False) * 8]
+
+        def run(question=question, answers=answers):
+            for index in range(calls):
+                score_question(question, answers[index % len(answers)])
+
+        yield f'score_question[{question_type}]', run, calls
+
+
+def exam_cases(rng, sizes, submission_counts):
+    for size in sizes:
+        exam = build_exam(size, rng)
+        answer_key = compile_answer_key(exam)
+        answer_sets = build_answer_sets(exam, min(ANSWER_POOL, max(submission_counts)), rng)
+        for count in submission_counts:
+            for source, scored in (('exam', exam), ('answer_key', answer_key)):
+                def run(scored=scored, count=count):
+                    for index in range(count):
+                        score_answers(scored, answer_sets[index % len(answer_sets)])
+
+                yield f'score_answers[{source}-q{size}-n{count}]', run, count
+
+
+def run_benchmarks(options, out=sys.stdout):
+    rng = random.Random(options.seed)
+    cases = list(question_type_cases(rng, options.calls))
+    cases += list(exam_cases(rng, options.sizes, options.submissions))
+    selected = [case for case in cases if not options.filter or options.filter in case[0]]
+
+    results = {}
+    for name, fn, items in selected:
+        fn_timings = measure(fn, options.rounds, options.max_time)
+        results[name] = summarize(fn_timings, items)
+        print(f"{name:<48} median {results[name]['median'] * 1000:10.3f} ms"
+              f"  per item {results[name]['perItem'] * 1e6:9.2f} us  ({len(fn_timings)} rounds)", file=out)
+
+    return {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform()},
+        'benchmarks': results,
+    }
+
+
+def compare(baseline, current, threshold):
+    """Per-benchmark change in median time; returns (rows, regressions)"""
+    rows, regressions = [], []
+    for name, stats in current['benchmarks'].items():
+        base = baseline['benchmarks'].get(name)
+        if base is None:
+            continue
+        # perItem keeps runs with different round sizes comparable
+        change = stats['perItem'] / base['perItem'] - 1
+        rows.append((name, base['perItem'], stats['perItem'], change))
+        if change > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def format_comparison(rows, threshold):
+    lines = [f"{'benchmark':<48}{'baseline us':>13}{'current us':>13}{'change':>9}"]
+    for name, base, current, change in rows:
+        flag = '  REGRESSION' if change > threshold else ''
+        lines.append(f'{name:<48}{base * 1e6:>13.2f}{current * 1e6:>13.2f}{change * 100:>8.1f}%{flag}')
+    return '\n'.join(lines)
+
+
+def _int_list(value):
+    return tuple(int(item) for item in value.split(',') if item)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Scoring microbenchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='run the benchmarks')
+    run.add_argument('--sizes', type=_int_list, default=DEFAULT_SIZES, help='questions per exam, comma separated')
+    run.add_argument('--submissions', type=_int_list, default=DEFAULT_SUBMISSIONS,
+                     help='submissions scored per round, comma separated')
+    run.add_argument('--calls', type=int, default=10000, help='score_question calls per type and round')
+    run.add_argument('--rounds', type=int, default=5)
+    run.add_argument('--max-time', type=float, default=2.0, help='stop repeating a case after this many seconds')
+    run.add_argument('--filter', help='only run benchmarks whose name contains this')
+    run.add_argument('--seed', type=int, default=1)
+    run.add_argument('--save', metavar='PATH', help='write results as a JSON baseline')
+    run.add_argument('--compare', metavar='BASELINE', help='compare against a saved baseline')
+    run.add_argument('--threshold', type=float, default=0.10, help='allowed slowdown before flagging (0.10 = 10%%)')
+
+    diff = commands.add_parser('compare', help='compare two saved results')
+    diff.add_argument('baseline')
+    diff.add_argument('current')
+    diff.add_argument('--threshold', type=float, default=0.10)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    if options.command == 'run':
+        current = run_benchmarks(options)
+        if options.save:
+            Path(options.save).write_text(json.dumps(current, indent=2))
+        if not options.compare:
+            return 0
+        baseline = json.loads(Path(options.compare).read_text())
+    else:
+        baseline = json.loads(Path(options.baseline).read_text())
+        current = json.loads(Path(options.current).read_text())
+
+    rows, regressions = compare(baseline, current, options.threshold)
+    print(format_comparison(rows, options.threshold))
+    if regressions:
+        print(f'{len(regressions)} benchmark(s) slower than the {options.threshold:.0%} threshold')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
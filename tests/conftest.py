@@ -0,0 +1,71 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The backend runs as flat modules from its own directory (uvicorn server:app)
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+
+class Backend:
+    """The API server against a fresh in-memory database, for endpoint tests"""
+
+    admin = {'Authorization': 'Bearer secret'}
+
+    def __init__(self, server, root, client):
+        self.server = server
+        self.root = root
+        self.client = client
+
+    def add_exam(self, exam_id, exam):
+        # Also the way to edit one: cached copies of the exam and its key are dropped
+        self.root.child(f'exams_full/{exam_id}').set(exam)
+        self.invalidate(exam_id)
+
+    def invalidate(self, exam_id):
+        self.server.EXAM_CACHE.invalidate(f'exam:{exam_id}')
+        self.server.EXAM_CACHE.invalidate(f'answer_key:{exam_id}')
+
+    def settle(self):
+        # Fold queued results into cohort stats and rank indexes now, not on the batcher's next tick
+        self.server.COHORT_RESULTS.flush()
+
+    def submit(self, exam_id, student_id, answers, **fields):
+        return self.client.post('/api/submissions', headers={'X-Student-Id': student_id}, json={
+            'examId': exam_id, 'studentId': student_id, 'answers': answers, **fields,
+        })
+
+
+@pytest.fixture
+def backend(monkeypatch, tmp_path):
+    # Everything the server keeps outside the database is swapped for an
+    # empty instance under tmp_path, so tests neither see each other's data
+    # nor write into the host's shared exam cache; the middleware stack is
+    # rebuilt so admission buckets start full
+    monkeypatch.setenv('DATABASE_BACKEND', 'memory')
+    monkeypatch.setenv('ADMIN_API_KEY', 'secret')
+    monkeypatch.setenv('EXAM_CACHE_DIR', str(tmp_path / 'exam-cache'))
+    import database
+    import server
+    from aggregate_batcher import AggregateBatcher
+    from fastapi.testclient import TestClient
+    from idempotency import IdempotencyIndex
+    from incremental_scoring import RunningScores
+    from response_matrix import ResponseMatrixStore
+    from shared_cache import SharedExamCache
+
+    database.reset_local_database()
+    monkeypatch.setattr(server, 'EXAM_CACHE', SharedExamCache(tmp_path / 'exam-cache'))
+    monkeypatch.setattr(server, 'RESPONSE_MATRICES', ResponseMatrixStore(tmp_path / 'response-matrices'))
+    monkeypatch.setattr(server, 'SUBMISSION_INDEX',
+                        IdempotencyIndex(server._load_submission_key, server._save_submission_key,
+                        server._transact_submission_key))
+    monkeypatch.setattr(server, 'RUNNING_SCORES', RunningScores())
+    monkeypatch.setattr(server, 'ARCHIVED_KEY_VERSIONS', set())
+    monkeypatch.setattr(server.app, 'middleware_stack', None)
+    monkeypatch.setattr(server, 'COHORT_RESULTS', AggregateBatcher(server._fold_cohort_results, flush_interval=60))
+    yield Backend(server, database.local_database().reference('/'), TestClient(server.app))
+    server.COHORT_RESULTS.close()
+    database.reset_local_database()
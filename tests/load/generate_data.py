@@ -0,0 +1,448 @@
+"""Seeded synthetic exams, students, submissions and progress records
+
+Exams are generated as the JSON documents admins import (Listening
+``questions``, Reading ``passages``, Writing ``tasks``) and converted to
+the stored ``exams`` / ``exams_full`` records the way parseJsonExam in
+functions/server.js does. Answers follow a Rasch model: each student has
+an ability and each question a difficulty, so per-student scores,
+per-question facility and band distributions look like a real cohort.
+
+Every entity is derived from ``(seed, kind, index)`` alone, so output is
+identical across runs and can be streamed without holding a million
+submissions in memory:
+
+    python -m tests.load.generate_data --students 100000 --submissions 1000000 \\
+        --progress 100000 --out data.ndjson.gz
+    python -m tests.load.generate_data --students 500 --submissions 5000 --format seed --out seed.json
+
+NDJSON lines are ``{"path": ..., "value": ...}`` database writes; the
+``seed`` format is a nested database export usable as LOCAL_DB_SEED.
+In-process callers can use ``load_into(database, records(...))``.
+"""
+import argparse
+import gzip
+import json
+import math
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[2] / 'backend'
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from result_encoding import compact_score  # noqa: E402
+from scoring import compile_answer_key, score_answers  # noqa: E402
+from submission_index import index_writes  # noqa: E402
+
+
+EPOCH = datetime(2025, 1, 6, tzinfo=timezone.utc)
+
+LISTENING_TYPES = ('mcq_single', 'form_completion', 'note_completion', 'map_labelling', 'mcq_multiple',
+                   'sentence_completion', 'table_completion', 'matching')
+READING_TYPES = ('true_false_ng', 'matching_headings', 'mcq_single', 'summary_completion',
+                 'matching_features', 'sentence_completion', 'matching_endings', 'flowchart_completion')
+WORDS = ('library', 'museum', 'station', 'harbour', 'festival', 'garden', 'river', 'market', 'bridge',
+         'climate', 'energy', 'coastline', 'migration', 'archive', 'laboratory', 'ceremony', 'journey',
+         'budget', 'insurance', 'schedule', 'volunteer', 'equipment', 'research', 'tradition')
+FIRST_NAMES = ('Aisha', 'Ben', 'Chen', 'Dina', 'Emeka', 'Fatima', 'Gabriel', 'Hana', 'Ivan', 'Jia',
+               'Karim', 'Lena', 'Mohammed', 'Nadia', 'Omar', 'Priya', 'Rahul', 'Sara', 'Tariq', 'Yuki')
+LAST_NAMES = ('Ahmed', 'Brown', 'Chowdhury', 'Diaz', 'Evans', 'Fernandes', 'Garcia', 'Hassan', 'Islam',
+              'Khan', 'Lee', 'Martin', 'Nguyen', 'Okafor', 'Patel', 'Rahman', 'Silva', 'Tanaka', 'Wang')
+STUDENT_STATUSES = (('approved', 0.85), ('pending', 0.1), ('rejected', 0.05))
+
+
+def entity_random(seed, kind, index):
+    # String seeds hash deterministically (unlike hash() on str)
+    return random.Random(f'{seed}:{kind}:{index}')
+
+
+def entity_id(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def iso(moment):
+    return moment.isoformat().replace('+00:00', 'Z')
+
+
+def phrase(rng, words=2):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+# -- exams -----------------------------------------------------------------
+
+def source_question(question_type, number, rng):
+    """One question as it appears in an import JSON file"""
+    question = {'id': f'q{number}', 'number': number, 'type': question_type}
+    if question_type == 'mcq_single':
+        question['text'] = f'Choose one: what does the speaker say about the {rng.choice(WORDS)}?'
+        question['options'] = [phrase(rng, 3).capitalize() for _ in range(4)]
+        question['answer'] = rng.choice('ABCD')
+    elif question_type == 'mcq_multiple':
+        question['text'] = f'Choose all that apply about the {rng.choice(WORDS)}.'
+        question['options'] = [{'id': letter, 'text': phrase(rng, 3).capitalize(), 'correct': False}
+                               for letter in 'ABCDE']
+        for option in rng.sample(question['options'], 2):
+            option['correct'] = True
+        question['answer'] = sorted(option['id'] for option in question['options'] if option['correct'])
+    elif question_type == 'true_false_ng':
+        question['text'] = f'The {phrase(rng)} was built before the {rng.choice(WORDS)}.'
+        question['answer'] = rng.choice(('True', 'False', 'Not Given'))
+    elif question_type.startswith('matching'):
+        question['text'] = f'Match the {rng.choice(WORDS)} with its description.'
+        question['answer'] = rng.choice('ABCDEFG')
+    else:
+        question['text'] = f'The {rng.choice(WORDS)} is next to the _____.'
+        question['answer'] = rng.choice(WORDS)
+    return question
+
+
+def source_exam(seed, index):
+    """An import document; exams rotate through Listening, Reading and Writing"""
+    rng = entity_random(seed, 'exam', index)
+    section = ('Listening', 'Reading', 'Writing')[index % 3]
+    document = {'title': f'IELTS {section} Practice Test {index + 1}', 'section': section,
+                'description': f'Synthetic {section.lower()} test', 'duration': {'Writing': 60}.get(section, 40)}
+    if section == 'Listening':
+        document['audioFile'] = f'Multiple Choice (one answer)/practice-{index + 1}.ogg'
+        document['questions'] = [
+            source_question(LISTENING_TYPES[(n // 5) % len(LISTENING_TYPES)], n + 1, rng) for n in range(40)
+        ]
+    elif section == 'Reading':
+        document['passages'] = []
+        for passage in range(3):
+            first = passage * 13 + 1
+            count = 14 if passage == 2 else 13
+            document['passages'].append({
+                'passageNumber': passage + 1,
+                'title': phrase(rng).title(),
+                'text': ' '.join(phrase(rng, 8).capitalize() + '.' for _ in range(40)),
+                'questions': [
+                    source_question(READING_TYPES[(n // 4) % len(READING_TYPES)], n, rng)
+                    for n in range(first, first + count)
+                ],
+            })
+    else:
+        document['tasks'] = [
+            {'taskNumber': 1, 'type': 'writing_task1', 'title': 'Task 1', 'wordLimit': 150, 'timeAllocation': 20,
+             'prompt': f'The chart shows {phrase(rng)} between 2000 and 2020. Summarise the information.'},
+            {'taskNumber': 2, 'type': 'writing_task2', 'title': 'Task 2', 'wordLimit': 250, 'timeAllocation': 40,
+             'prompt': f'Some people think {phrase(rng)} should be free. Discuss both views.'},
+        ]
+    return document
+
+
+def parse_json_exam(document):
+    """Stored exam record for an import document; mirrors parseJsonExam in functions/server.js"""
+    section = document.get('section') or 'Unknown'
+    exam = {
+        'title': document.get('title') or 'Untitled Exam',
+        'description': document.get('description') or '',
+        'type': section.lower() if document.get('section') else 'practice',
+        'duration': document.get('duration') or 60,
+        'sections': [],
+    }
+    raw_questions = []
+    if isinstance(document.get('questions'), list):
+        raw_questions = document['questions']
+        section_data = {'name': section}
+        if section.lower() == 'listening' and document.get('audioFile'):
+            section_data['audioFile'] = exam['audioFile'] = document['audioFile']
+            section_data['audioUrl'] = exam['audioUrl'] = f"/audio/{document['audioFile']}"
+        exam['sections'].append(section_data)
+    elif isinstance(document.get('passages'), list):
+        section = 'Reading'
+        for index, passage in enumerate(document['passages']):
+            for question in passage.get('questions') or []:
+                raw_questions.append({
+                    **question,
+                    'passageNumber': passage.get('passageNumber') or index + 1,
+                    'passageTitle': passage.get('title') or f'Passage {index + 1}',
+                    'passageText': passage.get('text') or '',
+                })
+        exam['sections'].append({'name': section})
+    elif isinstance(document.get('tasks'), list):
+        section = 'Writing'
+        for index, task in enumerate(document['tasks']):
+            number = task.get('taskNumber') or index + 1
+            raw_questions.append({**task, 'id': f'writing_task_{number}', 'number': number,
+                                  'type': task.get('type') or 'writing_task1'})
+        exam['sections'].append({'name': section})
+    else:
+        raise ValueError('Invalid JSON structure: must contain questions, passages, or tasks array')
+
+    questions = []
+    for number, raw in enumerate(raw_questions, start=1):
+        question = {
+            'id': raw.get('id') or f'q_{number}',
+            'number': raw.get('number') or number,
+            'type': raw['type'],
+            'section': section,
+            'text': raw.get('text') or raw.get('prompt') or raw.get('instructions') or '',
+            'points': raw.get('points') or 1,
+        }
+        if isinstance(raw.get('options'), list):
+            question['options'] = raw['options']
+        if raw.get('answer') is not None:
+            question['correctAnswer'] = raw['answer']
+        if raw.get('passageNumber'):
+            for field in ('passageNumber', 'passageTitle', 'passageText'):
+                question[field] = raw[field]
+        if 'writing' in question['type']:
+            for field in ('title', 'prompt', 'wordLimit', 'timeAllocation'):
+                if raw.get(field) is not None:
+                    question[field] = raw[field]
+        questions.append(question)
+
+    exam['sections'][0]['questionTypes'] = sorted({question['type'] for question in questions})
+    exam['sections'][0]['questionCount'] = len(questions)
+    exam['questions'] = questions
+    exam['totalQuestions'] = len(questions)
+    return exam
+
+
+def build_exam(seed, index):
+    """``(exam_id, stored exam, difficulties by question id)``"""
+    rng = entity_random(seed, 'exam-meta', index)
+    exam_id = entity_id(rng)
+    created = EPOCH + timedelta(days=index)
+    exam = parse_json_exam(source_exam(seed, index))
+    exam.update({'id': exam_id, 'createdAt': iso(created), 'updatedAt': iso(created),
+                 'status': 'published', 'published': True, 'importedFrom': 'json'})
+    # Later questions in a section are harder, as in real papers
+    difficulties = {
+        question['id']: rng.gauss(-1.0 + 2.5 * position / max(len(exam['questions']) - 1, 1), 0.6)
+        for position, question in enumerate(exam['questions'])
+    }
+    return exam_id, exam, difficulties
+
+
+def exam_records(exam):
+    metadata = {key: value for key, value in exam.items() if key != 'questions'}
+    yield f"exams/{exam['id']}", metadata
+    yield f"exams_full/{exam['id']}", exam
+
+
+# -- students ----------------------------------------------------------------
+
+def student_id(index):
+    return f'student-{index:07d}'
+
+
+def student_ability(seed, index):
+    # Logit-scale ability, mean around a band 6 candidate
+    return entity_random(seed, 'ability', index).gauss(0.4, 1.1)
+
+
+def build_student(seed, index):
+    rng = entity_random(seed, 'student', index)
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    registered = EPOCH - timedelta(days=rng.uniform(0, 365))
+    roll, status = rng.random(), 'approved'
+    for status, share in STUDENT_STATUSES:
+        if roll < share:
+            break
+        roll -= share
+    uid = student_id(index)
+    return uid, {
+        'uid': uid,
+        'email': f'{first}.{last}.{index}@example.com'.lower(),
+        'displayName': f'{first} {last}',
+        'status': status,
+        'registeredAt': iso(registered),
+        'statusUpdatedAt': iso(registered + timedelta(hours=rng.uniform(1, 72))),
+    }
+
+
+# -- answers -----------------------------------------------------------------
+
+def wrong_answer(question, rng):
+    question_type = question['type']
+    if question_type == 'mcq_single' or question_type.startswith('matching'):
+        choices = 'ABCD' if question_type == 'mcq_single' else 'ABCDEFG'
+        return rng.choice([letter for letter in choices if letter != question.get('correctAnswer')])
+    if question_type == 'mcq_multiple':
+        return rng.sample('ABCDE', rng.choice((1, 2, 3)))
+    if question_type == 'true_false_ng':
+        return rng.choice([value for value in ('True', 'False', 'Not Given') if value != question['correctAnswer']])
+    return rng.choice(WORDS[:len(WORDS) // 2]) + rng.choice(('', 's', 'e'))
+
+
+def right_answer(question, rng):
+    correct = question.get('correctAnswer')
+    if isinstance(correct, str) and rng.random() < 0.2:
+        # Candidates vary case and spacing; scoring normalizes both
+        return f' {correct.upper()} ' if rng.random() < 0.5 else correct.lower()
+    return correct
+
+
+def writing_answer(question, rng, ability):
+    words = max(20, int(rng.gauss(question.get('wordLimit', 150) * (1 + 0.15 * ability), 40)))
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def answer_sheet(exam, difficulties, ability, rng, completion=1.0):
+    """Answers keyed by question id; P(correct) = logistic(ability - difficulty)"""
+    answers = {}
+    questions = exam['questions']
+    for question in questions[:max(1, int(len(questions) * completion))]:
+        if 'writing' in question['type']:
+            answers[question['id']] = writing_answer(question, rng, ability)
+            continue
+        p_correct = 1 / (1 + math.exp(difficulties[question['id']] - ability))
+        # Weaker candidates leave more blanks
+        if rng.random() < 0.08 * (1 - p_correct):
+            continue
+        answers[question['id']] = right_answer(question, rng) if rng.random() < p_correct else wrong_answer(question, rng)
+    return answers
+
+
+def build_submission(seed, index, exams, students, score=False, answer_keys=None):
+    rng = entity_random(seed, 'submission', index)
+    exam_id, exam, difficulties = exams[rng.randrange(len(exams))]
+    student_index = rng.randrange(students)
+    ability = student_ability(seed, student_index)
+    submitted = EPOCH + timedelta(days=rng.uniform(0, 180))
+    submission_id = entity_id(rng)
+    submission = {
+        'id': submission_id,
+        'examId': exam_id,
+        'studentId': student_id(student_index),
+        'answers': answer_sheet(exam, difficulties, ability, rng),
+        'timeSpent': int(exam['duration'] * 60 * rng.uniform(0.6, 1.0)),
+        'submittedAt': iso(submitted),
+        'status': 'submitted',
+        'scored': False,
+    }
+    if score:
+        # Stored the way the backend stores them: compact results against the key version
+        answer_key = (answer_keys or {}).get(exam_id) or compile_answer_key(exam)
+        submission.update({'scored': True, 'scoredAt': iso(submitted + timedelta(seconds=2)),
+                           **compact_score(answer_key, score_answers(answer_key, submission['answers']))})
+    return submission_id, submission
+
+
+def build_progress(seed, index, exams, students):
+    rng = entity_random(seed, 'progress', index)
+    exam_id, exam, difficulties = exams[rng.randrange(len(exams))]
+    student_index = rng.randrange(students)
+    completion = rng.uniform(0.05, 0.95)
+    answers = answer_sheet(exam, difficulties, student_ability(seed, student_index), rng, completion)
+    uid = student_id(student_index)
+    return f'{exam_id}_{uid}', {
+        'examId': exam_id,
+        'studentId': uid,
+        'answers': answers,
+        'reviewFlags': [],
+        'currentQuestionIndex': len(answers),
+        'timeSpent': int(exam['duration'] * 60 * completion),
+        'audioProgress': round(completion * 1800, 1) if exam['type'] == 'listening' else 0,
+        'lastSaved': iso(EPOCH + timedelta(days=rng.uniform(0, 180))),
+        'status': 'in_progress',
+    }
+
+
+# -- output ------------------------------------------------------------------
+
+def records(seed=1, exams=6, students=1000, submissions=10000, progress=1000, score=False):
+    """Yield ``(path, value)`` database writes for the whole dataset"""
+    built = [build_exam(seed, index) for index in range(exams)]
+    for _, exam, _ in built:
+        yield from exam_records(exam)
+    answer_keys = {exam_id: compile_answer_key(exam) for exam_id, exam, _ in built} if score else {}
+    for exam_id, answer_key in answer_keys.items():
+        yield f"answer_key_versions/{exam_id}/{answer_key['version']}", answer_key
+    for index in range(students):
+        uid, student = build_student(seed, index)
+        yield f'students/{uid}', student
+    if not students:
+        return
+    for index in range(submissions):
+        submission_id, submission = build_submission(seed, index, built, students, score, answer_keys)
+        yield f'submissions/{submission_id}', submission
+        yield from index_writes(submission_id, submission).items()
+    for index in range(progress):
+        progress_id, record = build_progress(seed, index, built, students)
+        yield f'exam_progress/{progress_id}', record
+
+
+def load_into(database, stream, batch_size=5000):
+    """Write records into an InMemoryDatabase (or any reference root) with batched updates"""
+    root = database.reference('/')
+    batch = {}
+    count = 0
+    for path, value in stream:
+        batch[path] = value
+        count += 1
+        if len(batch) >= batch_size:
+            root.update(batch)
+            batch = {}
+    if batch:
+        root.update(batch)
+    return count
+
+
+def write_ndjson(stream, out):
+    count = 0
+    for path, value in stream:
+        out.write(json.dumps({'path': path, 'value': value}, separators=(',', ':'), ensure_ascii=False))
+        out.write('\n')
+        count += 1
+    return count
+
+
+def nested(stream):
+    tree = {}
+    for path, value in stream:
+        node = tree
+        *parents, leaf = path.split('/')
+        for segment in parents:
+            node = node.setdefault(segment, {})
+        node[leaf] = value
+    return tree
+
+
+def open_output(path):
+    if not path or path == '-':
+        return sys.stdout
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Generate seeded synthetic exam platform data')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--exams', type=int, default=6, help='exams, rotating Listening/Reading/Writing')
+    parser.add_argument('--students', type=int, default=100000)
+    parser.add_argument('--submissions', type=int, default=1000000)
+    parser.add_argument('--progress', type=int, default=100000, help='in-progress autosave records')
+    parser.add_argument('--score', action='store_true', help='store scoring results on submissions')
+    parser.add_argument('--format', choices=('ndjson', 'seed'), default='ndjson',
+                        help='ndjson write stream, or a nested export for LOCAL_DB_SEED (held in memory)')
+    parser.add_argument('--out', default='-', help='output file, .gz to compress; default stdout')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    stream = records(options.seed, options.exams, options.students, options.submissions,
+                     options.progress, options.score)
+    out = open_output(options.out)
+    try:
+        if options.format == 'seed':
+            json.dump(nested(stream), out, separators=(',', ':'), ensure_ascii=False)
+        else:
+            count = write_ndjson(stream, out)
+            print(f'{count} records written', file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""Replay captured request traces against a staging instance
+
+    python -m tests.load.replay_trace /var/traces --base-url https://staging.example.com --speed 4
+
+Requests are re-issued with their original inter-arrival gaps divided by
+``--speed`` (1x-10x is the useful range). The report compares, per route,
+the latency recorded at capture time with the latency seen now, plus
+status mismatches and how late the replayer issued requests (a large lag
+means the client machine, not the server, is the bottleneck).
+
+Recorded latency is measured inside the server, replayed latency at the
+client, so compare deltas between replays of the same trace rather than
+reading the absolute difference as a regression.
+
+Exam, submission and review item ids are captured verbatim, but student
+ids are pseudonymized, so staging must be seeded with the same exams and
+submissions (a restored snapshot from capture time) for reads of them to
+return what they did in production; otherwise those routes show up as
+status mismatches.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from .sitting_benchmark import percentile
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[2] / 'backend'
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from tracing import read_traces  # noqa: E402
+
+
+BODY_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+
+def load_trace(paths, routes=None, limit=None):
+    records = [record for record in read_traces(paths) if not routes or record['route'] in routes]
+    records.sort(key=lambda record: record['at'])
+    return records[:limit] if limit else records
+
+
+async def replay_one(client, record, results):
+    url = record['path'] + (f"?{record['query']}" if record.get('query') else '')
+    kwargs = {'headers': record.get('headers') or {}}
+    if record['method'] in BODY_METHODS and record.get('body') is not None:
+        kwargs['json'] = record['body']
+    started = time.perf_counter()
+    try:
+        response = await client.request(record['method'], url, **kwargs)
+        status = response.status_code
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    results.append((record, time.perf_counter() - started, status))
+
+
+async def replay(client, records, speed=1.0):
+    """Issue ``records`` on their recorded schedule; returns (record, latency, status) and dispatch lags"""
+    results, lags, tasks = [], [], []
+    if not records:
+        return results, lags
+    loop = asyncio.get_running_loop()
+    origin, start = records[0]['at'], loop.time()
+    for record in records:
+        due = start + (record['at'] - origin) / speed
+        delay = due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        lags.append(max(0.0, loop.time() - due))
+        tasks.append(asyncio.create_task(replay_one(client, record, results)))
+    await asyncio.gather(*tasks)
+    return results, lags
+
+
+def summarize(results, lags):
+    by_route = {}
+    for record, latency, status in results:
+        entry = by_route.setdefault(f"{record['method']} {record['route']}",
+                                    {'recorded': [], 'replayed': [], 'statusMismatches': 0, 'errors': 0})
+        entry['recorded'].append(record['duration'])
+        entry['replayed'].append(latency)
+        if status != record['status']:
+            entry['statusMismatches'] += 1
+        if not isinstance(status, int) or status >= 500:
+            entry['errors'] += 1
+
+    report = {}
+    for route, entry in sorted(by_route.items()):
+        recorded, replayed = sorted(entry['recorded']), sorted(entry['replayed'])
+        stats = {'requests': len(replayed), 'statusMismatches': entry['statusMismatches'], 'errors': entry['errors']}
+        for name, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+            before, after = percentile(recorded, fraction), percentile(replayed, fraction)
+            stats[name] = {'recorded': before, 'replayed': after, 'delta': after - before}
+        report[route] = stats
+    lags = sorted(lags)
+    return {
+        'requests': len(results),
+        'dispatchLag': {'p50': percentile(lags, 0.5), 'p99': percentile(lags, 0.99), 'max': lags[-1] if lags else 0},
+        'routes': report,
+    }
+
+
+def format_report(report, speed):
+    lines = [
+        f"{report['requests']} requests replayed at {speed}x, dispatch lag p99 {report['dispatchLag']['p99'] * 1000:.1f} ms",
+        f"{'route':<46}{'reqs':>6}{'mismatch':>9}{'p50 rec/now ms':>18}{'p95 rec/now ms':>18}{'p99 delta ms':>14}",
+    ]
+    for route, stats in report['routes'].items():
+        p50, p95, p99 = stats['p50'], stats['p95'], stats['p99']
+        lines.append(
+            f"{route:<46}{stats['requests']:>6}{stats['statusMismatches']:>9}"
+            f"{p50['recorded'] * 1000:>9.1f}/{p50['replayed'] * 1000:<8.1f}"
+            f"{p95['recorded'] * 1000:>9.1f}/{p95['replayed'] * 1000:<8.1f}{p99['delta'] * 1000:>+14.1f}"
+        )
+    return '\n'.join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Replay captured request traces and compare latency')
+    parser.add_argument('traces', nargs='+', help='trace segments or directories of them')
+    parser.add_argument('--base-url', required=True)
+    parser.add_argument('--speed', type=float, default=1.0, help='time compression, e.g. 4 replays 4x faster')
+    parser.add_argument('--route', action='append', dest='routes', help='only replay this route template (repeatable)')
+    parser.add_argument('--limit', type=int, help='replay at most this many requests')
+    parser.add_argument('--connections', type=int, default=500)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--json', metavar='PATH', help='also write the report as JSON')
+    options = parser.parse_args(argv)
+    if options.speed <= 0:
+        parser.error('--speed must be positive')
+    return options
+
+
+async def run(options):
+    records = load_trace(options.traces, options.routes, options.limit)
+    limits = httpx.Limits(max_connections=options.connections, max_keepalive_connections=options.connections)
+    async with httpx.AsyncClient(base_url=options.base_url, limits=limits, timeout=options.timeout) as client:
+        results, lags = await replay(client, records, options.speed)
+    return summarize(results, lags)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    report = asyncio.run(run(options))
+    print(format_report(report, options.speed))
+    if options.json:
+        Path(options.json).write_text(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,358 @@
+"""Load benchmark simulating a full exam sitting
+
+N candidates open the exam, stream the listening audio with Range
+requests, autosave every 30 (simulated) seconds and submit together when
+the sitting ends. Latency percentiles, throughput and error rate are
+reported per endpoint.
+
+By default the backend runs in-process against the in-memory database
+stand-in (DATABASE_BACKEND=memory), so numbers are reproducible on a
+laptop and no Firebase project is touched:
+
+    python -m tests.load.sitting_benchmark --candidates 200 --time-scale 0.01
+
+Like the frontend, candidates send no X-Student-Id header; POST bodies
+name the student. In-process, all of them share one client address, as
+a test centre behind NAT does. ``--admission`` puts the server's
+admission control in front, with its rates scaled by 1/--time-scale so
+the compressed sitting meets them at realistic pacing:
+
+    python -m tests.load.sitting_benchmark --candidates 300 --admission
+
+To load a running server, seed it with the same data and point at it:
+
+    python -m tests.load.sitting_benchmark --write-seed /tmp/seed.json
+    DATABASE_BACKEND=memory LOCAL_DB_SEED=/tmp/seed.json ADMISSION_CONTROL=off uvicorn server:app
+    python -m tests.load.sitting_benchmark --base-url http://localhost:8000
+"""
+import argparse
+import asyncio
+import dataclasses
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[2] / 'backend'
+
+EXAM_ID = 'bench-listening-exam'
+AUDIO_PATH = 'bench/sitting.ogg'
+QUESTION_TYPES = ('mcq_single', 'true_false_ng', 'sentence_completion', 'matching')
+
+
+def build_exam(exam_id=EXAM_ID, questions=40, audio_path=AUDIO_PATH):
+    """A listening exam in the exams_full shape written by the Node import"""
+    built = []
+    for number in range(1, questions + 1):
+        question_type = QUESTION_TYPES[number % len(QUESTION_TYPES)]
+        question = {
+            'id': f'q{number}',
+            'number': number,
+            'type': question_type,
+            'section': 'Listening',
+            'text': f'Question {number} ' + 'lorem ipsum ' * 20,
+            'points': 1,
+        }
+        if question_type == 'mcq_single':
+            question['options'] = [
+                {'id': letter, 'text': f'Option {letter}', 'correct': letter == 'B'} for letter in 'ABCD'
+            ]
+            question['correctAnswer'] = 'B'
+        elif question_type == 'true_false_ng':
+            question['correctAnswer'] = 'TRUE'
+        elif question_type == 'matching':
+            question['correctAnswer'] = 'C'
+        else:
+            question['correctAnswer'] = f'answer {number}'
+        built.append(question)
+    return {
+        'title': 'Benchmark Listening Test',
+        'examType': 'listening',
+        'duration': 40,
+        'totalQuestions': questions,
+        'audioFile': audio_path,
+        'audioUrl': f'/audio/{audio_path}',
+        'published': True,
+        'questions': built,
+    }
+
+
+def build_seed(questions=40):
+    exam = build_exam(questions=questions)
+    metadata = {key: value for key, value in exam.items() if key != 'questions'}
+    return {'exams': {EXAM_ID: metadata}, 'exams_full': {EXAM_ID: exam}}
+
+
+def answer_for(question, rng, accuracy):
+    if rng.random() < accuracy:
+        return question['correctAnswer']
+    return 'wrong'
+
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    """Latencies, status codes and active window per endpoint"""
+
+    def __init__(self):
+        self.endpoints = {}
+
+    def record(self, endpoint, started, finished, status):
+        stats = self.endpoints.setdefault(endpoint, {
+            'latencies': [], 'errors': 0, 'statuses': {}, 'first': started, 'last': finished,
+        })
+        stats['latencies'].append(finished - started)
+        stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+        if not isinstance(status, int) or status >= 400:
+            stats['errors'] += 1
+        stats['first'] = min(stats['first'], started)
+        stats['last'] = max(stats['last'], finished)
+
+    def summary(self):
+        report = {}
+        for endpoint, stats in sorted(self.endpoints.items()):
+            latencies = sorted(stats['latencies'])
+            window = max(stats['last'] - stats['first'], 1e-9)
+            report[endpoint] = {
+                'requests': len(latencies),
+                'errors': stats['errors'],
+                'errorRate': stats['errors'] / len(latencies),
+                'throughput': len(latencies) / window,
+                'p50': percentile(latencies, 0.50),
+                'p95': percentile(latencies, 0.95),
+                'p99': percentile(latencies, 0.99),
+                'max': latencies[-1],
+                'statuses': {str(status): count for status, count in stats['statuses'].items()},
+            }
+        return report
+
+
+async def timed(client, recorder, endpoint, method, url, **kwargs):
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+        status = response.status_code
+    except httpx.HTTPError as e:
+        response, status = None, type(e).__name__
+    recorder.record(endpoint, started, time.perf_counter(), status)
+    return response
+
+
+async def stream_audio(client, recorder, chunk_size, max_chunks):
+    """Fetch the listening audio the way a seeking <audio> element does, one Range at a time"""
+    start, total = 0, None
+    for _ in range(max_chunks):
+        response = await timed(
+            client, recorder, 'GET /api/audio/{question_type}/{filename}', 'GET', f'/api/audio/{AUDIO_PATH}',
+            headers={'Range': f'bytes={start}-{start + chunk_size - 1}'},
+        )
+        if response is None or response.status_code != 206:
+            return
+        total = int(response.headers['content-range'].rsplit('/', 1)[1])
+        start += chunk_size
+        if start >= total:
+            return
+
+
+async def candidate(client, recorder, options, index, sitting_end, submit_gate, rng):
+    student_id = f'bench-student-{index:05d}'
+    loop = asyncio.get_running_loop()
+    scale = options.time_scale
+
+    # Candidates arrive spread over the ramp-up window
+    await asyncio.sleep(rng.uniform(0, options.ramp_up * scale))
+
+    response = await timed(client, recorder, 'GET /api/exams/{exam_id}', 'GET', f'/api/exams/{EXAM_ID}',
+                           headers={'Accept-Encoding': 'gzip, br, zstd'})
+    if response is None or response.status_code != 200:
+        return
+    questions = response.json().get('questions') or []
+
+    audio = asyncio.create_task(
+        stream_audio(client, recorder, options.audio_chunk, options.audio_chunks)
+    )
+
+    answers = {}
+    remaining = list(questions)
+    per_save = max(1, len(questions) * options.autosave_interval // max(options.sitting_seconds, 1))
+    elapsed = 0
+    while loop.time() + options.autosave_interval * scale < sitting_end:
+        await asyncio.sleep(options.autosave_interval * scale)
+        elapsed += options.autosave_interval
+        for question in remaining[:per_save]:
+            answers[question['id']] = answer_for(question, rng, options.accuracy)
+        remaining = remaining[per_save:]
+        await timed(client, recorder, 'POST /api/progress', 'POST', '/api/progress', json={
+            'examId': EXAM_ID, 'studentId': student_id, 'answers': answers,
+            'currentQuestionIndex': len(answers), 'timeSpent': elapsed,
+        })
+
+    for question in remaining:
+        answers[question['id']] = answer_for(question, rng, options.accuracy)
+    await audio
+
+    # Time is up for everyone at once: the submission burst
+    await submit_gate.wait()
+    await timed(client, recorder, 'POST /api/submissions', 'POST', '/api/submissions', json={
+        'examId': EXAM_ID, 'studentId': student_id, 'answers': answers, 'timeSpent': options.sitting_seconds,
+    })
+
+
+def paced_policies(policies, time_scale):
+    # Simulated seconds pass 1/time_scale times faster than real ones
+    return {route: dataclasses.replace(policy, rate=policy.rate / time_scale) if policy.rate else policy
+            for route, policy in policies.items()}
+
+
+def in_process_app(options, workdir):
+    """Import the backend with the in-memory database, a private exam cache and synthetic audio"""
+    os.environ['DATABASE_BACKEND'] = 'memory'
+    os.environ.setdefault('ADMISSION_CONTROL', 'off')
+    os.environ['EXAM_CACHE_DIR'] = str(workdir / 'exam-cache')
+    os.environ['AUDIO_DIR'] = str(workdir / 'audio')
+    os.environ['RESPONSE_MATRIX_DIR'] = str(workdir / 'response-matrices')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    audio_file = workdir / 'audio' / AUDIO_PATH
+    audio_file.parent.mkdir(parents=True, exist_ok=True)
+    audio_file.write_bytes(random.Random(options.seed).randbytes(options.audio_bytes))
+
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+    import database
+    import server
+    from admission import AdmissionControlMiddleware
+    from aggregate_batcher import AggregateBatcher
+    from idempotency import IdempotencyIndex
+    from incremental_scoring import RunningScores
+    from response_matrix import ResponseMatrixStore
+    from shared_cache import SharedExamCache
+
+    # The server may already have been imported with other settings (e.g. under pytest)
+    server.AUDIO_DIR = workdir / 'audio'
+    server.RESPONSE_MATRICES = ResponseMatrixStore(workdir / 'response-matrices')
+    server.EXAM_CACHE = SharedExamCache(workdir / 'exam-cache', ttl=server.EXAM_CACHE.ttl)
+    # A fresh database and submission state, so repeated runs in one process start alike
+    server.COHORT_RESULTS.close()
+    database.reset_local_database()
+    server.COHORT_RESULTS = AggregateBatcher(server._fold_cohort_results,
+                                             flush_interval=server.COHORT_RESULTS.flush_interval)
+    server.SUBMISSION_INDEX = IdempotencyIndex(
+        server._load_submission_key, server._save_submission_key, server._transact_submission_key)
+    server.RUNNING_SCORES = RunningScores()
+    server.ARCHIVED_KEY_VERSIONS.clear()
+
+    database.local_database().reference('/').update(build_seed(options.questions))
+
+    # In-process the benchmark owns admission control: the server's own layer,
+    # if it was imported with one, is dropped so --admission decides
+    server.app.user_middleware = [middleware for middleware in server.app.user_middleware
+                                  if middleware.cls is not AdmissionControlMiddleware]
+    server.app.middleware_stack = None
+    if options.admission:
+        return AdmissionControlMiddleware(
+            server.app,
+            policies=paced_policies(server.ADMISSION_POLICIES, options.time_scale),
+            default_policy=paced_policies({'': server.DEFAULT_ADMISSION_POLICY}, options.time_scale)[''],
+        )
+    return server.app
+
+
+async def run(options):
+    recorder = Recorder()
+    rng = random.Random(options.seed)
+    limits = httpx.Limits(max_connections=options.connections, max_keepalive_connections=options.connections)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if options.base_url:
+            client = httpx.AsyncClient(base_url=options.base_url, limits=limits, timeout=options.timeout)
+        else:
+            transport = httpx.ASGITransport(app=in_process_app(options, Path(workdir)))
+            client = httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=options.timeout)
+
+        async with client:
+            loop = asyncio.get_running_loop()
+            started = time.perf_counter()
+            sitting_end = loop.time() + (options.ramp_up + options.sitting_seconds) * options.time_scale
+            submit_gate = asyncio.Event()
+            loop.call_at(sitting_end, submit_gate.set)
+
+            await asyncio.gather(*(
+                candidate(client, recorder, options, index, sitting_end, submit_gate, random.Random(rng.random()))
+                for index in range(options.candidates)
+            ))
+            wall_time = time.perf_counter() - started
+
+    return {
+        'candidates': options.candidates,
+        'wallTime': wall_time,
+        'target': options.base_url or 'in-process',
+        'endpoints': recorder.summary(),
+    }
+
+
+def format_report(report):
+    lines = [
+        f"{report['candidates']} candidates against {report['target']} in {report['wallTime']:.2f}s",
+        f"{'endpoint':<46}{'reqs':>7}{'err%':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}",
+    ]
+    for endpoint, stats in report['endpoints'].items():
+        lines.append(
+            f"{endpoint:<46}{stats['requests']:>7}{stats['errorRate'] * 100:>7.2f}{stats['throughput']:>9.1f}"
+            f"{stats['p50'] * 1000:>9.1f}{stats['p95'] * 1000:>9.1f}{stats['p99'] * 1000:>9.1f}{stats['max'] * 1000:>9.1f}"
+        )
+    return '\n'.join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Simulate an exam sitting and report per-endpoint latency')
+    parser.add_argument('--candidates', type=int, default=100)
+    parser.add_argument('--questions', type=int, default=40)
+    parser.add_argument('--sitting-seconds', type=int, default=40 * 60, help='simulated sitting length')
+    parser.add_argument('--ramp-up', type=float, default=120, help='simulated seconds over which candidates arrive')
+    parser.add_argument('--autosave-interval', type=int, default=30)
+    parser.add_argument('--time-scale', type=float, default=0.01, help='real seconds per simulated second')
+    parser.add_argument('--audio-bytes', type=int, default=4 * 1024 * 1024)
+    parser.add_argument('--audio-chunk', type=int, default=256 * 1024)
+    parser.add_argument('--audio-chunks', type=int, default=16, help='Range requests per candidate at most')
+    parser.add_argument('--accuracy', type=float, default=0.7, help='share of answers that are correct')
+    parser.add_argument('--connections', type=int, default=200, help='connection pool size for --base-url')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--admission', action='store_true',
+                        help='in-process: run behind admission control paced to --time-scale')
+    parser.add_argument('--base-url', help='benchmark a running server instead of an in-process app')
+    parser.add_argument('--write-seed', metavar='PATH', help='write LOCAL_DB_SEED data for a server and exit')
+    parser.add_argument('--json', metavar='PATH', help='also write the report as JSON')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    if options.write_seed:
+        Path(options.write_seed).write_text(json.dumps(build_seed(options.questions), indent=2))
+        return 0
+
+    report = asyncio.run(run(options))
+    print(format_report(report))
+    if options.json:
+        Path(options.json).write_text(json.dumps(report, indent=2))
+    errors = sum(stats['errors'] for stats in report['endpoints'].values())
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import asyncio
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from admission import ADMIN, AdmissionControlMiddleware, ClientBuckets, RoutePolicy
+
+
+class FixedLag:
+    def __init__(self, lag):
+        self.lag = lag
+
+    def ensure_started(self):
+        pass
+
+
+def _app(policies, lag=0.0, **kwargs):
+    app = FastAPI()
+
+    @app.post('/api/progress')
+    async def save_progress():
+        return {'success': True}
+
+    @app.post('/api/submissions')
+    async def submit(request: Request):
+        return {'received': (await request.json())['studentId']}
+
+    @app.post('/api/import')
+    async def import_exam():
+        await asyncio.sleep(0)
+        return {'success': True}
+
+    app.add_middleware(AdmissionControlMiddleware, policies=policies, lag_monitor=FixedLag(lag), **kwargs)
+    return app
+
+
+def test_token_bucket_is_per_student_and_sets_retry_after():
+    client = TestClient(_app({'POST /api/progress': RoutePolicy(rate=0.1, burst=2)}))
+    alice = {'X-Student-Id': 'alice'}
+
+    assert client.post('/api/progress', headers=alice).status_code == 200
+    assert client.post('/api/progress', headers=alice).status_code == 200
+    limited = client.post('/api/progress', headers=alice)
+    assert limited.status_code == 429
+    assert int(limited.headers['retry-after']) >= 1
+
+    assert client.post('/api/progress', headers={'X-Student-Id': 'bob'}).status_code == 200
+
+
+def test_candidates_behind_one_address_get_buckets_of_their_own():
+    policies = {'POST /api/submissions': RoutePolicy(rate=0.1, burst=1)}
+    client = TestClient(_app(policies, shared_ip_clients=3))
+
+    # Identified by the body they submit; the body still reaches the route
+    for student in ('s1', 's2', 's3'):
+        response = client.post('/api/submissions', json={'studentId': student, 'answers': {}})
+        assert response.json() == {'received': student}
+    assert client.post('/api/submissions', json={'studentId': 's1'}).status_code == 429
+    # Rotating ids runs into the address's ceiling of three candidates
+    limited = client.post('/api/submissions', json={'studentId': 's4'})
+    assert (limited.status_code, limited.json()['reason']) == (429, 'rate_limited')
+
+
+def test_anonymous_requests_share_the_address_ceiling():
+    client = TestClient(_app({'POST /api/progress': RoutePolicy(rate=0.1, burst=1)}, shared_ip_clients=2))
+    assert [client.post('/api/progress').status_code for _ in range(3)] == [200, 200, 429]
+
+
+def test_lag_sheds_admin_before_candidates():
+    policies = {'POST /api/import': RoutePolicy(priority=ADMIN)}
+    client = TestClient(_app(policies, lag=0.2))
+
+    shed = client.post('/api/import')
+    assert shed.status_code == 503
+    assert shed.json()['reason'] == 'overloaded'
+    assert 'retry-after' in shed.headers
+    assert client.post('/api/progress').status_code == 200
+
+
+def test_concurrency_cap_rejects_when_full():
+    policies = {'POST /api/import': RoutePolicy(max_concurrency=1, priority=ADMIN)}
+    middleware = _app(policies).build_middleware_stack()
+    while not isinstance(middleware, AdmissionControlMiddleware):
+        middleware = middleware.app
+    middleware.in_flight['POST /api/import'] = 1
+
+    assert middleware._check({}, 'POST /api/import', policies['POST /api/import'])[1] == 'concurrency'
+
+
+def test_client_buckets_refill_over_time():
+    buckets = ClientBuckets()
+    assert buckets.take('k', rate=1, capacity=1, now=0.0) == 0
+    assert buckets.take('k', rate=1, capacity=1, now=0.5) == 0.5
+    assert buckets.take('k', rate=1, capacity=1, now=1.5) == 0
@@ -0,0 +1,62 @@
+import threading
+
+from aggregate_batcher import AggregateBatcher
+
+
+def test_items_fold_once_per_key_and_batch():
+    folds = []
+    batcher = AggregateBatcher(lambda key, items: folds.append((key, list(items))), flush_interval=60)
+    for n in range(5):
+        batcher.add('e1' if n % 2 else 'e2', n)
+    assert batcher.pending() == 5
+    assert batcher.flush() == 5
+    assert sorted(folds) == [('e1', [1, 3]), ('e2', [0, 2, 4])]
+    assert batcher.flush() == 0
+    batcher.close()
+
+
+def test_full_batches_wake_the_thread_and_close_folds_the_rest():
+    folded = threading.Event()
+    folds = []
+
+    def fold(key, items):
+        folds.append(len(items))
+        folded.set()
+
+    batcher = AggregateBatcher(fold, flush_interval=60, max_batch=3)
+    for n in range(3):
+        batcher.add('e1', n)
+    assert folded.wait(5)
+    batcher.add('e1', 3)
+    batcher.close()
+    assert folds == [3, 1]
+
+
+def test_failed_folds_are_dropped_without_stopping_other_keys():
+    folds = []
+
+    def fold(key, items):
+        if key == 'broken':
+            raise RuntimeError('database unavailable')
+        folds.append(key)
+
+    batcher = AggregateBatcher(fold, flush_interval=60)
+    batcher.add('broken', 1)
+    batcher.add('e1', 2)
+    assert batcher.flush() == 1
+    assert folds == ['e1'] and batcher.pending() == 0
+    batcher.close()
+
+
+def test_discarded_items_are_not_folded():
+    folds = []
+    batcher = AggregateBatcher(lambda key, items: folds.append((key, list(items))), flush_interval=60)
+    for n in range(4):
+        batcher.add('e1', n)
+    batcher.add('e2', 0)
+    assert batcher.discard('e1', lambda n: n % 2) == 2
+    assert batcher.discard('e2', lambda n: True) == 1
+    assert batcher.discard('e3', lambda n: True) == 0
+    batcher.flush()
+    assert folds == [('e1', [0, 2])]
+    batcher.close()
@@ -0,0 +1,56 @@
+import pytest
+
+from answer_normalization import acceptable_forms, canonical_forms, matches_acceptable
+from scoring import compile_answer_key, prepare_answer_key, score_answers
+
+
+@pytest.mark.parametrize('correct, given', [
+    ('3', 'three'),
+    ('twenty-one', '21'),
+    ('105', 'one hundred and five'),
+    ('1,000', 'one thousand'),
+    ('3rd', 'third'),
+    ('museum', 'The Museum'),
+    ('colour', 'color'),
+    ('organisation', 'Organization'),
+    ('email', 'e-mail'),
+    ('well-known', 'well known'),
+    ("St Paul's", 'st. pauls'),
+    ('café', 'CAFE'),
+    ('night market', '  Night Market. '),
+    ("children's", 'children’s'),
+])
+def test_variants_are_accepted(correct, given):
+    assert matches_acceptable(given, acceptable_forms(correct))
+
+
+@pytest.mark.parametrize('correct, given', [
+    ('3', '4'),
+    ('3.5', '35'),
+    ('museum', 'museums'),
+    ('north', 'north east'),
+])
+def test_different_answers_are_rejected(correct, given):
+    assert not matches_acceptable(given, acceptable_forms(correct))
+
+
+def test_forms_are_cached_and_non_text_has_none():
+    assert canonical_forms('The Colour') is canonical_forms('The Colour')
+    assert acceptable_forms(['three', None, '']) == {'3'}
+    assert not matches_acceptable(['a', 'b'], acceptable_forms('a'))
+
+
+def test_compiled_key_precomputes_acceptable_sets():
+    exam = {'questions': [
+        {'id': 'q1', 'type': 'sentence_completion', 'section': 'Listening', 'correctAnswer': ['3', 'the centre']},
+        {'id': 'q2', 'type': 'true_false_ng', 'section': 'Listening', 'correctAnswer': 'TRUE'},
+    ]}
+    key = compile_answer_key(exam)
+    assert key['questions'][0]['acceptableAnswers'] == ['3', 'centre']
+    assert 'acceptableAnswers' not in key['questions'][1]
+
+    prepared = prepare_answer_key(key)
+    assert isinstance(prepared['questions'][0]['acceptableAnswers'], frozenset)
+    answers = {'q1': 'Center', 'q2': 'true'}
+    assert score_answers(prepared, answers)['totalCorrect'] == 2
+    assert score_answers(exam, answers)['totalCorrect'] == 2
@@ -0,0 +1,37 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+import auth
+
+
+def test_token_checks_run_off_the_event_loop(monkeypatch):
+    threads = []
+
+    def verify(token):
+        threads.append(threading.current_thread())
+        return {'email': 'admin@example.com', 'uid': 'u1'}
+
+    def whitelisted(email):
+        threads.append(threading.current_thread())
+        return email == 'admin@example.com'
+
+    monkeypatch.delenv('ADMIN_API_KEY', raising=False)
+    monkeypatch.setattr(auth.firebase_auth, 'verify_id_token', verify)
+    monkeypatch.setattr(auth, 'is_whitelisted_admin', whitelisted)
+
+    async def check():
+        loop_thread = threading.current_thread()
+        admin = await auth.require_admin('Bearer token')
+        return loop_thread, admin
+
+    loop_thread, admin = asyncio.run(check())
+    assert admin == {'email': 'admin@example.com', 'uid': 'u1', 'via': 'firebase'}
+    assert len(threads) == 2 and loop_thread not in threads
+
+    monkeypatch.setattr(auth, 'is_whitelisted_admin', lambda email: False)
+    with pytest.raises(HTTPException) as denied:
+        asyncio.run(auth.require_admin('Bearer token'))
+    assert denied.value.status_code == 403
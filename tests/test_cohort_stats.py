@@ -0,0 +1,99 @@
+import asyncio
+
+from cohort_stats import add_result, build_stats, empty_stats, merge_stats, summarize_stats
+
+
+def _result(overall, reading_band, reading_raw, writing_band=None):
+    sections = {'Reading': {'bandScore': reading_band, 'rawScore': reading_raw, 'correctAnswers': reading_raw}}
+    sections['Writing'] = {'bandScore': writing_band, 'rawScore': 0, 'correctAnswers': 0}
+    return {'overallBandScore': overall, 'sectionScores': sections}
+
+
+def test_results_fold_into_histograms_and_summaries():
+    stats = empty_stats()
+    for result in (_result(6.5, 6.5, 27), _result(7.0, 7.0, 30), _result(5.5, 5.5, 19), _result(7.0, 7.0, 31)):
+        add_result(stats, result)
+
+    summary = summarize_stats(stats)
+    assert summary['count'] == 4
+    assert summary['overallBand'] == {'mean': 6.5, 'median': 6.75, 'distribution': {'5.5': 1, '6.5': 1, '7.0': 2}}
+    reading = summary['sections']['Reading']
+    assert (reading['count'], reading['meanRawScore'], reading['medianRawScore']) == (4, 26.75, 28.5)
+    # Sections awaiting manual marking are not counted
+    assert 'Writing' not in summary['sections']
+
+    add_result(stats, _result(7.0, 7.0, 31), weight=-1)
+    assert summarize_stats(stats)['overallBand']['median'] == 6.5
+
+
+def test_merged_and_rebuilt_aggregates_match_incremental_ones():
+    results = [_result(6.0, 6.0, 23), _result(8.0, 8.0, 35), _result(4.0, 4.0, 10)]
+    incremental = empty_stats()
+    for result in results:
+        add_result(incremental, result)
+
+    rebuilt = build_stats([('a', {**results[0], 'scored': True}), ('b', {'scored': False}),
+                           ('c', {**results[1], 'scored': True}), ('d', {**results[2], 'scored': True})])
+    assert summarize_stats(rebuilt) == summarize_stats(incremental)
+    merged = merge_stats([build_stats([('a', {**results[0], 'scored': True})]),
+                          build_stats([('c', {**results[1], 'scored': True}), ('d', {**results[2], 'scored': True})])])
+    assert summarize_stats(merged) == summarize_stats(incremental)
+
+    # Sparse arrays come back from the database as objects
+    stored = {**incremental, 'overallBand': {str(i): n for i, n in enumerate(incremental['overallBand']) if n}}
+    assert summarize_stats(stored) == summarize_stats(incremental)
+
+
+def test_submissions_update_exam_and_track_stats(backend):
+    root, client = backend.root, backend.client
+    questions = [{'id': f'q{n}', 'number': n, 'type': 'true_false_ng', 'section': 'Reading', 'correctAnswer': 'TRUE'}
+                 for n in range(1, 41)]
+    backend.add_exam('cohort-exam', {'title': 'Cohort', 'track_id': 'cohort-track', 'questions': questions})
+    root.child('exam_tracks/cohort-track').set({'name': 'Mock tests', 'exams': ['cohort-exam']})
+
+    for student, correct in (('c1', 30), ('c2', 35), ('c3', 10)):
+        answers = {f'q{n}': 'TRUE' if n <= correct else 'FALSE' for n in range(1, 41)}
+        assert backend.submit('cohort-exam', student, answers).status_code == 200
+    assert backend.server.COHORT_RESULTS.pending() == 3
+    backend.settle()
+
+    # A retried create_submission records its result again; it is counted once
+    submission_id, submission = next(iter(root.child('submissions').get().items()))
+    answer_key = asyncio.run(backend.server.load_answer_key('cohort-exam'))
+    asyncio.run(backend.server.record_cohort_result('cohort-exam', answer_key, {**submission, 'id': submission_id}))
+    assert backend.server.COHORT_RESULTS.pending() == 0
+
+    exam = client.get('/api/exams/cohort-exam/cohort-stats').json()
+    assert exam['count'] == 3 and exam['overallBand']['distribution'] == {'4.0': 1, '7.0': 1, '8.0': 1}
+    assert exam['sections']['Reading']['medianRawScore'] == 30
+    track = client.get('/api/tracks/cohort-track/cohort-stats').json()
+    assert track['count'] == 3 and track['overallBand'] == exam['overallBand']
+
+    root.child('cohort_stats').delete()
+    rebuilt = client.post('/api/exams/cohort-exam/cohort-stats/rebuild', headers=backend.admin)
+    assert rebuilt.json()['count'] == 3
+    assert client.get('/api/tracks/cohort-track/cohort-stats').json()['overallBand'] == exam['overallBand']
+
+
+def test_results_queued_during_a_rebuild_are_counted_once(backend, monkeypatch):
+    server = backend.server
+    questions = [{'id': f'q{n}', 'number': n, 'type': 'true_false_ng', 'section': 'Reading', 'correctAnswer': 'TRUE'}
+                 for n in range(1, 41)]
+    backend.add_exam('racing-exam', {'title': 'Racing', 'questions': questions})
+    answers = {f'q{n}': 'TRUE' for n in range(1, 41)}
+    assert backend.submit('racing-exam', 'r1', answers).status_code == 200
+    flush = server.COHORT_RESULTS.flush
+
+    def flush_then_submit():
+        # A submission lands between the rebuild's flush and its query
+        folded = flush()
+        assert backend.submit('racing-exam', 'r2', answers).status_code == 200
+        return folded
+
+    monkeypatch.setattr(server.COHORT_RESULTS, 'flush', flush_then_submit)
+    answer_key = asyncio.run(server.load_answer_key('racing-exam'))
+    stats, counted = asyncio.run(server.rebuild_cohort_stats('racing-exam', answer_key))
+    monkeypatch.setattr(server.COHORT_RESULTS, 'flush', flush)
+    assert counted == 2 and server.COHORT_RESULTS.pending() == 0
+    backend.settle()
+    assert backend.client.get('/api/exams/racing-exam/cohort-stats').json()['count'] == 2
@@ -0,0 +1,70 @@
+import gzip
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from compression import CompressionMiddleware, etag_json_response, negotiate_encoding
+
+
+def _app(encoders=None):
+    app = FastAPI()
+    exam = {'id': 'exam-1', 'questions': [{'id': f'q{i}', 'text': 'The meeting is scheduled for _____'} for i in range(200)]}
+
+    @app.get('/exam')
+    async def get_exam(request: Request):
+        return etag_json_response(request, exam)
+
+    @app.get('/small')
+    async def small():
+        return {'ok': True}
+
+    middleware = {'min_size': 512}
+    if encoders is not None:
+        middleware['encoders'] = encoders
+    app.add_middleware(CompressionMiddleware, **middleware)
+    return app
+
+
+def test_negotiation_honours_q_values_and_server_preference():
+    encoders = {'zstd': None, 'br': None, 'gzip': None}
+    assert negotiate_encoding('gzip, br', encoders) == 'br'
+    assert negotiate_encoding('br;q=0.5, gzip', encoders) == 'gzip'
+    assert negotiate_encoding('*;q=0.1, gzip;q=0', encoders) == 'zstd'
+    assert negotiate_encoding('identity', encoders) is None
+
+
+def test_large_etag_responses_are_compressed_once_and_cached():
+    calls = []
+
+    def counting_gzip(body):
+        calls.append(len(body))
+        return gzip.compress(body)
+
+    client = TestClient(_app({'gzip': counting_gzip}))
+    first = client.get('/exam', headers={'Accept-Encoding': 'gzip'})
+    second = client.get('/exam', headers={'Accept-Encoding': 'gzip'})
+
+    assert first.headers['content-encoding'] == 'gzip'
+    assert first.headers['etag'].startswith('W/"')
+    assert 'accept-encoding' in first.headers['vary'].lower()
+    assert first.json()['id'] == 'exam-1'
+    assert second.content == first.content
+    assert len(calls) == 1
+    assert int(first.headers['content-length']) * 5 < calls[0]
+
+
+def test_small_bodies_and_revalidation_skip_compression():
+    client = TestClient(_app())
+    small = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+    assert 'content-encoding' not in small.headers
+
+    # Sent uncompressed, but a shared cache must still key them on Accept-Encoding
+    identity = client.get('/exam', headers={'Accept-Encoding': 'identity'})
+    assert 'content-encoding' not in identity.headers
+    for response in (small, identity):
+        assert response.headers['vary'].lower() == 'accept-encoding'
+
+    etag = client.get('/exam', headers={'Accept-Encoding': 'gzip'}).headers['etag']
+    not_modified = client.get('/exam', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b''
@@ -0,0 +1,69 @@
+import io
+import json
+from pathlib import Path
+
+from rtdb_emulator import InMemoryDatabase
+from scoring import score_answers
+from tests.load import generate_data
+
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+
+def test_records_are_deterministic_per_seed():
+    first = list(generate_data.records(seed=5, exams=3, students=20, submissions=30, progress=10))
+    again = list(generate_data.records(seed=5, exams=3, students=20, submissions=30, progress=10))
+    other = list(generate_data.records(seed=6, exams=3, students=20, submissions=30, progress=10))
+    assert first == again
+    assert first != other
+    kinds = [path.split('/')[0] for path, _ in first]
+    assert kinds.count('exams_full') == 3
+    assert kinds.count('students') == 20
+    assert kinds.count('submissions') == 30
+
+
+def test_exam_shapes_cover_questions_passages_and_tasks():
+    exams = [generate_data.build_exam(1, index)[1] for index in range(3)]
+    assert [exam['type'] for exam in exams] == ['listening', 'reading', 'writing']
+    assert exams[0]['audioUrl'].startswith('/audio/')
+    assert exams[1]['totalQuestions'] == 40 and exams[1]['questions'][0]['passageNumber'] == 1
+    assert [question['id'] for question in exams[2]['questions']] == ['writing_task_1', 'writing_task_2']
+
+
+def test_parse_json_exam_accepts_the_sample_import():
+    document = json.loads((REPO_DIR / 'sample-listening-with-audio.json').read_text())
+    exam = generate_data.parse_json_exam(document)
+    assert exam['type'] == 'listening'
+    assert exam['totalQuestions'] == len(document['questions'])
+    assert exam['questions'][0]['correctAnswer'] == document['questions'][0]['answer']
+
+
+def test_abler_students_score_higher():
+    exam_id, exam, difficulties = generate_data.build_exam(1, 0)
+    rng = generate_data.entity_random(1, 'test', 0)
+    weak = [score_answers(exam, generate_data.answer_sheet(exam, difficulties, -1.5, rng))['totalCorrect']
+            for _ in range(20)]
+    strong = [score_answers(exam, generate_data.answer_sheet(exam, difficulties, 2.0, rng))['totalCorrect']
+              for _ in range(20)]
+    assert sum(strong) > sum(weak) * 2
+
+
+def test_load_into_and_output_formats():
+    stream = list(generate_data.records(seed=2, exams=2, students=5, submissions=8, progress=3, score=True))
+    database = InMemoryDatabase()
+    assert generate_data.load_into(database, iter(stream), batch_size=4) == len(stream)
+    submissions = database.reference('submissions').get()
+    assert len(submissions) == 8 and all(record['scored'] for record in submissions.values())
+    assert all(record['results']['count'] == len(database.reference(f"exams_full/{record['examId']}/questions").get())
+               for record in submissions.values())
+    assert len(database.reference('exam_progress').get()) <= 3
+
+    out = io.StringIO()
+    generate_data.write_ndjson(iter(stream), out)
+    lines = out.getvalue().splitlines()
+    assert json.loads(lines[0]) == {'path': stream[0][0], 'value': stream[0][1]}
+    assert set(generate_data.nested(iter(stream))) == {'exams', 'exams_full', 'answer_key_versions', 'students',
+                                                       'submissions', 'student_submissions', 'exam_submissions',
+                                                       'exam_progress'}
+    indexed = database.reference('exam_submissions').get()
+    assert sum(len(entries) for entries in indexed.values()) == 8
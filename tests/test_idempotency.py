@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+import pytest
+
+from idempotency import IN_PROGRESS, IdempotencyConflict, IdempotencyIndex, key_hash
+
+
+class MemoryStore:
+    def __init__(self):
+        self.records = {}
+
+    async def load(self, digest):
+        return self.records.get(digest)
+
+    async def save(self, digest, record):
+        self.records[digest] = record
+
+    async def transact(self, digest, update):
+        # Workers share one event loop in these tests, so this is atomic
+        self.records[digest] = update(self.records.get(digest))
+        return self.records[digest]
+
+    def index(self, **options):
+        return IdempotencyIndex(self.load, self.save, self.transact, **options)
+
+
+def test_concurrent_duplicates_share_one_run():
+    store = MemoryStore()
+    index = store.index()
+    calls = []
+
+    async def submit():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {'submissionId': 's1'}
+
+    async def run():
+        return await asyncio.gather(*(index.run('exam:student:1', submit, fingerprint='f') for _ in range(20)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(result == {'submissionId': 's1'} for result, _ in results)
+    assert sum(1 for _, replayed in results if not replayed) == 1
+
+
+def test_persisted_results_replay_after_restart_and_conflicts_are_rejected():
+    store = MemoryStore()
+
+    async def submit():
+        return {'submissionId': 's1'}
+
+    async def fail():
+        raise AssertionError('should not run again')
+
+    asyncio.run(store.index().run('k', submit, fingerprint='f'))
+    restarted = store.index()
+
+    assert asyncio.run(restarted.run('k', fail, fingerprint='f')) == ({'submissionId': 's1'}, True)
+    with pytest.raises(IdempotencyConflict):
+        asyncio.run(restarted.run('k', fail, fingerprint='other'))
+
+
+def test_failed_operation_leaves_key_unused():
+    store = MemoryStore()
+    index = store.index()
+
+    async def boom():
+        raise RuntimeError('database unavailable')
+
+    async def submit():
+        return {'submissionId': 's2'}
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(index.run('k', boom))
+    assert asyncio.run(index.run('k', submit)) == ({'submissionId': 's2'}, False)
+
+
+def test_duplicates_on_another_worker_wait_for_the_claim():
+    store = MemoryStore()
+    workers = [store.index(poll_interval=0.001) for _ in range(3)]
+    calls = []
+
+    async def submit():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {'submissionId': 's1'}
+
+    async def run():
+        return await asyncio.gather(*(worker.run('k', submit, fingerprint='f') for worker in workers))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert [replayed for _, replayed in results].count(False) == 1
+    assert all(result == {'submissionId': 's1'} for result, _ in results)
+    assert 'state' not in store.records[key_hash('k')]
+
+
+def test_failed_claims_are_released_and_abandoned_ones_taken_over():
+    store = MemoryStore()
+
+    async def boom():
+        raise RuntimeError('database unavailable')
+
+    async def submit():
+        return {'submissionId': 's3'}
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(store.index().run('k', boom))
+    assert store.records[key_hash('k')] is None
+
+    claim = {'key': 'k', 'fingerprint': 'f', 'state': IN_PROGRESS, 'token': 't', 'startedAt': time.time()}
+    store.records[key_hash('k')] = claim
+    with pytest.raises(IdempotencyConflict):
+        asyncio.run(store.index().run('k', submit, fingerprint='other'))
+    # The worker holding the claim died
+    store.records[key_hash('k')] = {**claim, 'startedAt': time.time() - 120}
+    assert asyncio.run(store.index().run('k', submit, fingerprint='f')) == ({'submissionId': 's3'}, False)
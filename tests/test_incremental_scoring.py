@@ -0,0 +1,61 @@
+import scoring
+from incremental_scoring import RunningScores, progress_scoring
+from scoring import compile_answer_key, score_answers
+
+
+EXAM = {'questions': [
+    {'id': f'q{n}', 'number': n, 'type': 'sentence_completion', 'section': 'Listening', 'correctAnswer': f'word {n}'}
+    for n in range(1, 11)
+] + [{'id': 'writing_task_1', 'number': 11, 'type': 'writing_task1', 'section': 'Writing'}]}
+
+
+def _counting(monkeypatch):
+    calls = []
+    original = scoring.is_answer_correct
+
+    def counted(question, answer):
+        calls.append(question['id'])
+        return original(question, answer)
+
+    monkeypatch.setattr(scoring, 'is_answer_correct', counted)
+    return calls
+
+
+def test_autosaves_only_evaluate_changed_answers(monkeypatch):
+    calls = _counting(monkeypatch)
+    key = compile_answer_key(EXAM)
+    running = RunningScores()
+
+    answers = {'q1': 'word 1', 'q2': 'wrong'}
+    running.update('exam_alice', key, answers)
+    assert len(calls) == 10
+
+    calls.clear()
+    answers = {**answers, 'q2': 'word 2', 'q3': 'other'}
+    correctness = running.update('exam_alice', key, answers)
+    assert calls == ['q2', 'q3']
+    assert progress_scoring(key, answers, correctness)['correctSoFar'] == 2
+
+    calls.clear()
+    final = {**answers, 'q4': 'word 4', 'writing_task_1': 'An essay'}
+    result = running.finalize('exam_alice', key, final)
+    assert calls == ['q4']
+    assert result == score_answers(key, final)
+    assert result['totalCorrect'] == 3
+
+
+def test_new_key_version_or_unknown_sitting_scores_in_full(monkeypatch):
+    calls = _counting(monkeypatch)
+    running = RunningScores()
+    key = compile_answer_key(EXAM)
+    running.update('exam_bob', key, {'q1': 'word 1'})
+
+    corrected = compile_answer_key({'questions': [{**EXAM['questions'][0], 'correctAnswer': 'other'}] + EXAM['questions'][1:]})
+    assert corrected['version'] != key['version']
+    calls.clear()
+    result = running.finalize('exam_bob', corrected, {'q1': 'word 1'})
+    assert len(calls) == 10 and result['totalCorrect'] == 0
+
+    calls.clear()
+    running.finalize('exam_carol', key, {'q1': 'word 1'})
+    assert len(calls) == 10
@@ -0,0 +1,74 @@
+import json
+import time
+
+import numpy as np
+
+from item_analysis import analyze_items, point_biserial
+from response_matrix import ResponseMatrix
+
+
+def _matrix(correct, answers=None, columns=None, vocabulary=None):
+    correct = np.asarray(correct, dtype=np.int8)
+    rows, width = correct.shape
+    columns = columns or [
+        {'key': f'q{j}', 'type': 'sentence_completion', 'section': 'Reading', 'maxPoints': 1, 'manual': False}
+        for j in range(width)
+    ]
+    answers = np.ones_like(correct, dtype=np.int32) if answers is None else np.asarray(answers, dtype=np.int32)
+    vocabulary = vocabulary or [['"x"'] * int(answers[:, j].max()) for j in range(width)]
+    ids = [f's{i}' for i in range(rows)]
+    return ResponseMatrix('e1', 'v1', columns, ids, ids, answers, correct, vocabulary)
+
+
+def test_point_biserial_matches_a_direct_correlation():
+    rng = np.random.default_rng(3)
+    correct = (rng.random((200, 6)) < np.linspace(0.2, 0.8, 6)).astype(np.int8)
+    expected = [np.corrcoef(correct[:, j], correct.sum(axis=1) - correct[:, j])[0, 1] for j in range(6)]
+    assert np.allclose(point_biserial(correct), expected)
+
+
+def test_miskeyed_option_is_flagged_with_the_likely_key():
+    rng = np.random.default_rng(7)
+    ability = rng.random(100)
+    correct = (rng.random((100, 5)) < ability[:, None]).astype(np.int8)
+    # q4 is miskeyed: strong candidates choose "B" (code 2), which is marked wrong
+    picks_b = ability > 0.4
+    answers = np.ones((100, 5), dtype=np.int32)
+    answers[:, 4] = np.where(picks_b, 2, 1)
+    correct[:, 4] = ~picks_b
+    columns = [{'key': f'q{j}', 'type': 'mcq_single', 'section': 'Reading', 'maxPoints': 1, 'manual': False}
+               for j in range(5)]
+    vocabulary = [['"A"'], ['"A"'], ['"A"'], ['"A"'], ['"A"', '"B"']]
+
+    analysis = analyze_items(_matrix(correct, answers, columns, vocabulary))
+    item = analysis['items'][4]
+    assert 'possible_miskey' in item['flags'] and item['suggestedKey'] == 'B'
+    assert item['discrimination'] < 0
+    assert {option['answer']: option['isKey'] for option in item['distractors']} == {'A': True, 'B': False}
+    assert all('possible_miskey' not in other['flags'] for other in analysis['items'][:4])
+    assert analysis['byType']['mcq_single']['questions'] == 5
+    json.dumps(analysis)
+
+
+def test_easy_hard_and_manual_questions():
+    correct = np.zeros((40, 3), dtype=np.int8)
+    correct[:, 0] = 1
+    correct[:38, 1] = np.arange(38) % 2
+    columns = [
+        {'key': 'q0', 'type': 'fill_gaps', 'section': 'Reading', 'maxPoints': 1, 'manual': False},
+        {'key': 'q1', 'type': 'fill_gaps', 'section': 'Reading', 'maxPoints': 1, 'manual': False},
+        {'key': 'w1', 'type': 'writing_task1', 'section': 'Writing', 'maxPoints': 1, 'manual': True},
+    ]
+    analysis = analyze_items(_matrix(correct, columns=columns))
+    assert [item['questionKey'] for item in analysis['items']] == ['q0', 'q1']
+    assert analysis['items'][0]['flags'] == ['too_easy'] and analysis['items'][0]['discrimination'] is None
+    assert analyze_items(_matrix(correct[:5], columns=columns))['items'][0]['flags'] == []
+
+
+def test_thousands_of_candidates_in_milliseconds():
+    rng = np.random.default_rng(1)
+    correct = (rng.random((5000, 40)) < 0.6).astype(np.int8)
+    started = time.perf_counter()
+    analysis = analyze_items(_matrix(correct))
+    assert analysis['candidates'] == 5000 and len(analysis['items']) == 40
+    assert time.perf_counter() - started < 1
@@ -0,0 +1,77 @@
+import io
+import json
+import logging
+import queue
+
+import log_config
+
+from log_config import (
+    JsonFormatter,
+    NonBlockingQueueHandler,
+    RateLimitFilter,
+    configure_logging,
+    parse_logger_map,
+    shutdown_logging,
+)
+
+
+def _record(name='server', level=logging.INFO, msg='hello', args=()):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_configure_logging_writes_json_through_listener():
+    stream = io.StringIO()
+    try:
+        configure_logging(handlers=[logging.StreamHandler(stream)], max_message_bytes=32)
+        logging.getLogger('server').info('Writing %s', 'x' * 100, extra={'examId': 'e1'})
+    finally:
+        shutdown_logging()
+
+    payload = json.loads(stream.getvalue().splitlines()[-1])
+    assert payload['logger'] == 'server'
+    assert payload['examId'] == 'e1'
+    assert payload['message'].startswith('Writing xxx')
+    assert 'truncated' in payload['message']
+
+
+def test_queue_handler_merges_args_eagerly_and_never_blocks():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    data = {'answers': 1}
+    handler.handle(_record(msg='data %s', args=(data,)))
+    data['answers'] = 2
+    handler.handle(_record())
+
+    queued = handler.queue.get_nowait()
+    assert queued.getMessage() == "data {'answers': 1}"
+    assert handler.dropped == 1
+
+
+def test_rate_limit_filter_drops_info_but_keeps_warnings():
+    rate_filter = RateLimitFilter(rate_limits={'server': 2})
+    results = [rate_filter.filter(_record()) for _ in range(5)]
+    assert results[:2] == [True, True]
+    assert not any(results[2:])
+
+    warning = _record(level=logging.WARNING)
+    assert rate_filter.filter(warning)
+    assert warning._dropped == 3
+    assert 'dropped_before' in JsonFormatter().format(warning)
+
+
+def test_sampling_uses_longest_prefix():
+    rate_filter = RateLimitFilter(sampling={'': 1.0, 'httpx': 0.0})
+    assert rate_filter.filter(_record(name='server'))
+    assert not rate_filter.filter(_record(name='httpx._client'))
+    assert parse_logger_map('httpx=0.1, server = 5') == {'httpx': 0.1, 'server': 5.0}
+
+
+def test_fractional_rate_limit_lets_records_through(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(log_config.time, 'monotonic', lambda: clock[0])
+    rate_filter = RateLimitFilter(rate_limits={'server': 0.5})
+    results = []
+    for _ in range(6):
+        results.append(rate_filter.filter(_record()))
+        clock[0] += 0.6
+    # One at once, then one every two seconds
+    assert results == [True, False, False, False, True, False]
@@ -0,0 +1,67 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from metrics import Histogram, MetricsMiddleware, MetricsRegistry, instrument_reference
+
+
+def test_histogram_quantiles_interpolate_within_buckets():
+    histogram = Histogram(buckets=(0.1, 0.2, 0.5))
+    for _ in range(50):
+        histogram.observe(0.05)
+    for _ in range(50):
+        histogram.observe(0.15)
+
+    assert histogram.count == 100
+    assert histogram.quantile(0.5) == 0.1
+    assert 0.1 < histogram.quantile(0.95) <= 0.2
+
+
+def test_middleware_labels_by_route_template():
+    registry = MetricsRegistry()
+    app = FastAPI()
+
+    @app.get('/api/exams/{exam_id}')
+    async def get_exam(exam_id: str):
+        return {'id': exam_id}
+
+    app.add_middleware(MetricsMiddleware, registry=registry)
+    client = TestClient(app)
+    client.get('/api/exams/a')
+    client.get('/api/exams/b')
+    client.get('/nowhere')
+
+    text = registry.render()
+    assert 'http_requests_total{method="GET",route="/api/exams/{exam_id}",status="200"} 2' in text
+    assert 'route="unmatched",status="404"' in text
+    assert 'http_requests_in_flight{route="/api/exams/{exam_id}"} 0' in text
+    assert 'http_request_duration_seconds_quantile{method="GET",route="/api/exams/{exam_id}",quantile="0.99"}' in text
+
+
+def test_instrumented_reference_times_operations_and_queries():
+    class FakeQuery:
+        def get(self):
+            return {'a': 1}
+
+    class FakeRef(FakeQuery):
+        key = 'submissions'
+
+        def order_by_child(self, child):
+            return FakeQuery()
+
+        def set(self, value):
+            raise RuntimeError('denied')
+
+    registry = MetricsRegistry()
+    ref = instrument_reference(FakeRef(), 'submissions/abc', registry)
+
+    assert ref.key == 'submissions'
+    assert ref.order_by_child('studentId').get() == {'a': 1}
+    try:
+        ref.set({})
+    except RuntimeError:
+        pass
+
+    text = registry.render()
+    assert 'db_operations_total{node="submissions",op="get",outcome="ok"} 1' in text
+    assert 'db_operations_total{node="submissions",op="set",outcome="error"} 1' in text
+    assert registry.histogram('db_operation_duration_seconds', (('node', 'submissions'), ('op', 'get'))).count == 1
@@ -0,0 +1,55 @@
+import asyncio
+import threading
+import time
+
+from profiling import SamplingProfiler, profile_for
+
+
+def _busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampling_profiler_collects_collapsed_stacks_from_other_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_loop, args=(stop,), name='busy-worker')
+    worker.start()
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    time.sleep(0.1)
+    profiler.stop()
+    stop.set()
+    worker.join()
+
+    assert profiler.samples > 0
+    lines = profiler.collapsed().splitlines()
+    assert any(line.startswith('thread:busy-worker;') and '_busy_loop' in line for line in lines)
+    stack, count = lines[0].rsplit(' ', 1)
+    assert int(count) >= 1
+
+
+def test_profile_for_samples_event_loop_tasks():
+    async def sleeper():
+        await asyncio.sleep(0.2)
+
+    async def run():
+        task = asyncio.create_task(sleeper(), name='sleeper')
+        profiler = await profile_for(0.05, interval=0.001)
+        await task
+        return profiler
+
+    profiler = asyncio.run(run())
+    assert any(stack.startswith('task:sleeper;') for stack in profiler.stacks)
+
+
+def test_profile_endpoint_requires_admin(backend):
+    client = backend.client
+
+    assert client.get('/api/debug/profile?seconds=0.05').status_code == 401
+    response = client.get(
+        '/api/debug/profile?seconds=0.05&download=true',
+        headers=backend.admin,
+    )
+    assert response.status_code == 200
+    assert 'attachment' in response.headers['content-disposition']
+    assert int(response.headers['x-profile-samples']) > 0
@@ -0,0 +1,68 @@
+import random
+
+from rank_index import FenwickTree, build_rank_index, percentile_rank, record_score, top_entries, top_threshold
+
+
+def test_fenwick_queries_match_sorting():
+    rng = random.Random(5)
+    scores = [rng.randint(0, 40) for _ in range(500)]
+    tree = None
+    for score in scores:
+        tree = record_score(tree, score, 41)
+    fenwick = FenwickTree(tree=tree)
+    assert fenwick.tree == FenwickTree.from_counts([scores.count(s) for s in range(41)]).tree
+
+    ordered = sorted(scores)
+    for k in (1, 2, 250, 499, 500):
+        assert fenwick.kth_smallest(k) == ordered[k - 1]
+    for score in (0, 17, 40):
+        standing = percentile_rank(fenwick, score)
+        assert standing['rank'] == 1 + sum(s > score for s in scores)
+        below, equal = sum(s < score for s in scores), scores.count(score)
+        assert standing['percentile'] == round((below + equal / 2) / 500 * 100, 1)
+
+
+def test_resizing_keeps_counts_and_clamps_scores():
+    tree = None
+    for score in (3, 5, 9, 9):
+        tree = record_score(tree, score, 10)
+    fenwick = FenwickTree(tree=record_score(tree, 2, 6))
+    assert fenwick.counts() == [0, 0, 1, 1, 0, 3]
+    assert percentile_rank(FenwickTree(6), 3) is None
+
+
+def test_top_entries_rank_ties_together():
+    submissions = [(f'sub{i}', {'scored': True, 'studentId': f'st{i}', 'totalCorrect': score})
+                   for i, score in enumerate([30, 35, 30, 12, 40])] + [('x', {'scored': False, 'totalCorrect': 40})]
+    index = build_rank_index(submissions, 41)
+    fenwick = FenwickTree(tree=index['fenwick'])
+    threshold = top_threshold(fenwick, 3)
+    assert threshold == 30
+    members = {key: value for key, value in index['members'].items() if int(key[1:]) >= threshold}
+    entries = top_entries(fenwick, members, 3)
+    assert [(e['rank'], e['score'], e['studentId']) for e in entries] == [(1, 40, 'st4'), (2, 35, 'st1'),
+                                                                          (3, 30, 'st0')]
+
+
+def test_percentile_and_leaderboard_endpoints(backend):
+    root, client, admin = backend.root, backend.client, backend.admin
+    questions = [{'id': f'q{n}', 'number': n, 'type': 'true_false_ng', 'section': 'Listening', 'correctAnswer': 'TRUE'}
+                 for n in range(1, 11)]
+    backend.add_exam('rank-exam', {'title': 'Rank', 'questions': questions})
+
+    for student, correct in (('r1', 4), ('r2', 9), ('r3', 6), ('r4', 6)):
+        answers = {f'q{n}': 'TRUE' for n in range(1, correct + 1)}
+        assert backend.submit('rank-exam', student, answers).status_code == 200
+    backend.settle()
+
+    standing = client.get('/api/exams/rank-exam/percentile', params={'score': 6}).json()
+    assert (standing['count'], standing['rank'], standing['percentile']) == (4, 2, 50.0)
+    assert client.get('/api/exams/other-exam/percentile', params={'score': 6}).json()['count'] == 0
+
+    board = client.get('/api/exams/rank-exam/leaderboard', params={'limit': 2}, headers=admin).json()
+    assert [e['rank'] for e in board['entries']] == [1, 2] and board['entries'][0]['studentId'] == 'r2'
+    assert board['entries'][1]['studentId'] in ('r3', 'r4')
+
+    root.child('rank_index').delete()
+    client.post('/api/exams/rank-exam/cohort-stats/rebuild', headers=admin)
+    assert client.get('/api/exams/rank-exam/percentile', params={'score': 9}).json()['rank'] == 1
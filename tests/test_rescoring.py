@@ -0,0 +1,142 @@
+
+from rescoring import diff_answer_keys, rescore_submission, stored_form
+from result_encoding import compact_score, expand_results, unpack_bits
+from scoring import compile_answer_key, score_answers
+
+
+def _exam(q2='B', q3='three'):
+    return {'title': 'Rescore', 'questions': [
+        {'id': 'q1', 'number': 1, 'type': 'true_false_ng', 'section': 'Reading', 'correctAnswer': 'TRUE'},
+        {'id': 'q2', 'number': 2, 'type': 'matching', 'section': 'Reading', 'correctAnswer': q2},
+        {'id': 'q3', 'number': 3, 'type': 'sentence_completion', 'section': 'Reading', 'correctAnswer': q3},
+    ]}
+
+
+def _stored_submission(exam, answers):
+    return stored_form({'scored': True, 'answers': answers, **score_answers(compile_answer_key(exam), answers)})
+
+
+def test_diff_reports_changed_questions_or_layout_change():
+    old, new = compile_answer_key(_exam()), compile_answer_key(_exam(q2='C'))
+    assert diff_answer_keys(old, new) == {'q2'}
+    assert diff_answer_keys(old, old) == set()
+    shorter = compile_answer_key({'questions': _exam()['questions'][:2]})
+    assert diff_answer_keys(old, shorter) is None
+
+
+def test_only_changed_fields_of_full_results_are_written():
+    # Full questionResults, as the Node functions store them
+    answers = {'q1': 'true', 'q2': 'C', 'q3': '3'}
+    submission = _stored_submission(_exam(), answers)
+    new_key = compile_answer_key(_exam(q2='C'))
+
+    updates = rescore_submission(new_key, submission, {'q2'}, rescored_at='now')
+    assert set(updates) == {'questionResults/1', 'sectionScores/Reading', 'overallBandScore', 'totalCorrect',
+                            'percentage', 'rescoredAt'}
+    assert updates['questionResults/1']['isCorrect'] is True
+    assert updates['totalCorrect'] == 3
+
+    # Stored results already match the key: nothing to write
+    assert rescore_submission(compile_answer_key(_exam()), submission, {'q2'}) == {}
+
+
+def test_compact_results_are_rewritten_whole():
+    answers = {'q1': 'true', 'q2': 'C', 'q3': '3'}
+    key = compile_answer_key(_exam())
+    submission = stored_form({'scored': True, 'answers': answers, **compact_score(key, score_answers(key, answers))})
+    new_key = compile_answer_key(_exam(q2='C'))
+
+    updates = rescore_submission(new_key, submission, {'q2'}, rescored_at='now')
+    assert set(updates) == {'results', 'sectionScores/Reading', 'overallBandScore', 'totalCorrect', 'percentage',
+                            'rescoredAt'}
+    assert updates['results']['keyVersion'] == new_key['version']
+    assert unpack_bits(updates['results']['correct'], 3) == [True, True, True]
+    assert rescore_submission(key, submission, {'q2'}) == {}
+
+
+def test_reviewer_points_survive_rescoring():
+    exam = {'questions': [*_exam()['questions'], {'id': 'w1', 'number': 4, 'type': 'writing_task1',
+                                                    'section': 'Writing', 'points': 9}]}
+    key = compile_answer_key(exam)
+    answers = {'q1': 'TRUE', 'w1': 'The chart shows...'}
+    submission = stored_form({'scored': True, 'answers': answers, **compact_score(key, score_answers(key, answers))})
+    submission['results']['points'] = {'w1': 6}
+
+    # Every question re-marked, but not the manually marked one
+    updates = rescore_submission(compile_answer_key({'questions': exam['questions']}), submission, rescored_at='now')
+    assert updates == {}
+    new_key = compile_answer_key({'questions': [{**exam['questions'][0], 'correctAnswer': 'FALSE'},
+                                                *exam['questions'][1:]]})
+    updates = rescore_submission(new_key, submission, rescored_at='now')
+    assert updates['results']['points'] == {'w1': 6}
+    assert updates['sectionScores/Writing']['totalPoints'] == 6
+
+    # A changed layout scores in full, carrying the reviewer's points over
+    shorter = compile_answer_key({'questions': exam['questions'][1:]})
+    updates = rescore_submission(shorter, submission, rescored_at='now')
+    assert updates['results']['points'] == {'w1': 6}
+    assert updates['sectionScores']['Writing']['totalPoints'] == 6
+
+
+def test_unscored_or_misaligned_submissions_are_scored_in_full():
+    key = compile_answer_key(_exam())
+    updates = rescore_submission(key, {'answers': {'q1': 'TRUE'}, 'scored': False}, {'q2'}, rescored_at='now')
+    assert updates['scored'] is True and updates['totalCorrect'] == 1
+    # Stored compactly, dropping any full questionResults
+    assert updates['questionResults'] is None and updates['results']['count'] == 3
+
+
+def test_rescore_endpoint_updates_affected_submissions(backend):
+    root, client, admin = backend.root, backend.client, backend.admin
+    backend.add_exam('rescore-exam', _exam())
+
+    for student, answers in (('s1', {'q1': 'TRUE', 'q2': 'B'}), ('s2', {'q1': 'TRUE', 'q2': 'C'}),
+                             ('s3', {'q3': 'one'})):
+        assert backend.submit('rescore-exam', student, answers).status_code == 200
+
+    root.child('exams_full/rescore-exam/questions/1/correctAnswer').set('C')
+    first = client.post('/api/exams/rescore-exam/rescore', headers=admin).json()
+    # Diffed against the key version the submissions were scored with; results carry the new correctAnswer
+    assert first['changedQuestions'] == ['q2']
+    assert (first['submissionsScanned'], first['submissionsUpdated']) == (3, 3)
+
+    root.child('exams_full/rescore-exam/questions/2/correctAnswer').set('one')
+    second = client.post('/api/exams/rescore-exam/rescore', headers=admin).json()
+    assert second['changedQuestions'] == ['q3'] and second['submissionsUpdated'] == 3
+
+    key = compile_answer_key(root.child('exams_full/rescore-exam').get())
+    for submission in root.child('submissions').order_by_child('examId').equal_to('rescore-exam').get().values():
+        expected = score_answers(key, submission['answers'])
+        assert submission['totalCorrect'] == expected['totalCorrect']
+        assert expand_results(key, submission['results'], submission['answers']) == expected['questionResults']
+
+    unchanged = client.post('/api/exams/rescore-exam/rescore', headers=admin).json()
+    assert (unchanged['changedQuestions'], unchanged['submissionsUpdated']) == ([], 0)
+
+    # The response matrix follows the corrected key too
+    matrix = backend.server.RESPONSE_MATRICES.load('rescore-exam')
+    assert matrix.version == key['version'] and sorted(matrix.raw_scores().tolist()) == [1, 1, 2]
+
+
+def test_rescore_diffs_each_submission_against_its_own_key_version(backend):
+    root, client, admin = backend.root, backend.client, backend.admin
+    backend.add_exam('versions-exam', _exam())
+    assert backend.submit('versions-exam', 'v1', {'q2': 'B'}).status_code == 200
+    assert client.post('/api/exams/versions-exam/rescore', headers=admin).json()['submissionsUpdated'] == 0
+
+    # Edited without a rescore: later submissions are scored against the edit
+    backend.add_exam('versions-exam', _exam(q2='C'))
+    assert backend.submit('versions-exam', 'v2', {'q2': 'C'}).status_code == 200
+
+    # Reverted, with q3 corrected; against the last snapshot only q3 changed
+    backend.add_exam('versions-exam', _exam(q3='3'))
+    rescored = client.post('/api/exams/versions-exam/rescore', headers=admin).json()
+    assert rescored['changedQuestions'] == ['q2', 'q3']
+    assert sorted(rescored['keyVersions'].values()) == [['q2', 'q3'], ['q3']]
+    assert rescored['submissionsUpdated'] == 2
+
+    key = compile_answer_key(root.child('exams_full/versions-exam').get())
+    for submission in root.child('submissions').get().values():
+        expected = score_answers(key, submission['answers'])
+        assert submission['totalCorrect'] == expected['totalCorrect']
+        assert submission['results']['keyVersion'] == key['version']
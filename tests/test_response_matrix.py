@@ -0,0 +1,67 @@
+import numpy as np
+
+from response_matrix import BLANK, ResponseMatrixStore
+from scoring import compile_answer_key, prepare_answer_key
+
+
+def _key(q1='A', q2='paris', questions=None):
+    return prepare_answer_key(compile_answer_key({'questions': questions or [
+        {'id': 'q1', 'number': 1, 'type': 'true_false_ng', 'section': 'Reading', 'correctAnswer': q1},
+        {'id': 'q2', 'number': 2, 'type': 'sentence_completion', 'section': 'Reading', 'correctAnswer': q2},
+        {'id': 'q3', 'number': 3, 'type': 'writing_task1', 'section': 'Writing'},
+    ]}))
+
+
+def test_rows_share_column_vocabularies_and_survive_growth(tmp_path):
+    store = ResponseMatrixStore(tmp_path, capacity=2)
+    key = _key()
+    sheets = [{'q1': 'A', 'q2': 'Paris'}, {'q1': 'B', 'q2': 'paris'}, {'q1': 'A'}, {'q2': 'Paris', 'q3': 'Essay'}]
+    for index, answers in enumerate(sheets):
+        assert store.append('e1', key, f's{index}', f'student{index}', answers)
+    assert not store.append('e1', key, 's0', 'student0', sheets[0])
+
+    matrix = store.load('e1')
+    assert len(matrix) == 4 and matrix.submission_ids == ['s0', 's1', 's2', 's3']
+    assert matrix.correct.tolist() == [[1, 1, 0], [0, 1, 0], [1, 0, 0], [0, 1, 0]]
+    assert matrix.answers[:, 0].tolist() == [1, 2, 1, BLANK]
+    assert matrix.decode(1, matrix.answers[3, 1]) == 'Paris'
+    assert matrix.raw_scores().tolist() == [2, 1, 1, 1]
+    assert np.load(tmp_path / 'e1' / 'answers.npy').shape == (4, 3)
+
+
+def test_other_workers_see_appends_and_corrections(tmp_path):
+    writer, reader = ResponseMatrixStore(tmp_path), ResponseMatrixStore(tmp_path)
+    writer.append('e1', _key(), 's1', 'a', {'q1': 'A', 'q2': 'london'})
+    assert reader.load('e1').correct.tolist() == [[1, 0, 0]]
+
+    reader.append('e1', _key(), 's2', 'b', {'q1': 'B', 'q2': 'London'})
+    # A corrected key re-marks stored rows from their distinct answers
+    writer.rekey('e1', _key(q1='B', q2='london'))
+    matrix = reader.load('e1')
+    assert matrix.version == _key(q1='B', q2='london')['version']
+    assert matrix.correct.tolist() == [[0, 1, 0], [1, 1, 0]]
+
+
+def test_torn_log_line_is_not_a_row(tmp_path):
+    store = ResponseMatrixStore(tmp_path)
+    store.append('e1', _key(), 's1', 'a', {'q1': 'A'})
+    with open(tmp_path / 'e1' / 'rows.ndjson', 'ab') as log:
+        log.write(b'{"id": "s2"')
+    assert ResponseMatrixStore(tmp_path).load('e1').submission_ids == ['s1']
+
+
+def test_rebuild_and_layout_change_start_over(tmp_path):
+    store = ResponseMatrixStore(tmp_path)
+    submissions = {
+        's1': {'studentId': 'a', 'scored': True, 'answers': {'q1': 'A'}},
+        's2': {'studentId': 'b', 'scored': False, 'answers': {'q1': 'A'}},
+        's3': {'studentId': 'c', 'scored': True, 'answers': {'q2': 'paris'}},
+    }
+    assert store.rebuild('e1', _key(), submissions.items()) == 2
+    assert store.load('e1').student_ids == ['a', 'c']
+
+    shorter = _key(questions=[{'id': 'q1', 'number': 1, 'type': 'true_false_ng', 'correctAnswer': 'A'}])
+    store.append('e1', shorter, 's4', 'd', {'q1': 'A'})
+    matrix = store.load('e1')
+    assert matrix.submission_ids == ['s4'] and matrix.correct.shape == (1, 1)
+    assert store.load('missing') is None
@@ -0,0 +1,57 @@
+import json
+
+from result_encoding import compact_score, encode_results, expand_results, pack_bits, unpack_bits
+from scoring import compile_answer_key, prepare_answer_key, score_answers
+
+
+def _exam(q1='TRUE'):
+    questions = [{'id': f'q{n}', 'number': n, 'type': 'sentence_completion', 'section': 'Reading',
+                  'correctAnswer': f'word {n}'} for n in range(2, 41)]
+    questions.insert(0, {'id': 'q1', 'number': 1, 'type': 'true_false_ng', 'section': 'Reading',
+                         'correctAnswer': q1, 'points': 2})
+    questions.append({'id': 'w1', 'number': 41, 'type': 'writing_task1', 'section': 'Writing'})
+    return {'title': 'Compact', 'questions': questions}
+
+
+def test_bits_round_trip():
+    flags = [True, False, False, True, True, False, False, False, True]
+    assert unpack_bits(pack_bits(flags), len(flags)) == flags
+    assert unpack_bits(pack_bits([]), 3) == [False, False, False]
+
+
+def test_expansion_reproduces_full_results_in_a_fraction_of_the_size():
+    key = prepare_answer_key(compile_answer_key(_exam()))
+    answers = {f'q{n}': f'word {n}' if n % 3 else 'wrong' for n in range(2, 41)}
+    answers.update({'q1': 'true', 'w1': 'An essay'})
+    scored = score_answers(key, answers)
+
+    compact = encode_results(key, scored['questionResults'])
+    assert expand_results(key, compact, answers) == scored['questionResults']
+    assert len(json.dumps(compact)) * 10 < len(json.dumps(scored['questionResults']))
+
+    stored = compact_score(key, scored)
+    assert 'questionResults' not in stored and stored['totalCorrect'] == scored['totalCorrect']
+
+    # Points that differ from the default (e.g. awarded by a marker) are kept per question
+    scored['questionResults'][40]['points'] = 6
+    compact = encode_results(key, scored['questionResults'])
+    assert compact['points'] == {'w1': 6}
+    assert expand_results(key, compact, answers)[40]['points'] == 6
+
+
+def test_submission_reads_expand_against_the_scoring_key_version(backend):
+    root, client = backend.root, backend.client
+    backend.add_exam('compact-exam', _exam())
+
+    answers = {'q1': 'TRUE', 'q2': 'word 2'}
+    submission_id = backend.submit('compact-exam', 'k1', answers).json()['submissionId']
+    stored = root.child(f'submissions/{submission_id}').get()
+    assert 'questionResults' not in stored
+
+    # The exam is edited afterwards: the submission still expands against the key it was scored with
+    backend.add_exam('compact-exam', _exam(q1='FALSE'))
+    submission = client.get(f'/api/submissions/{submission_id}').json()['submission']
+    assert submission['questionResults'] == score_answers(compile_answer_key(_exam()), answers)['questionResults']
+    assert 'questionResults' not in client.get(f'/api/submissions/{submission_id}',
+                                               params={'expand': 'false'}).json()['submission']
+    assert client.get('/api/submissions/missing').status_code == 404
@@ -0,0 +1,111 @@
+import pytest
+
+from review_queue import LeaseConflict, claim, complete, expire, release, renew, review_items
+
+
+ANSWER_KEY = {'version': 'v1', 'questions': [
+    {'id': 'q1', 'number': 1, 'type': 'true_false_ng', 'section': 'Writing', 'correctAnswer': 'TRUE'},
+    {'id': 'w1', 'number': 2, 'type': 'writing_task1', 'section': 'Writing'},
+    {'id': 'w2', 'number': 3, 'type': 'writing_task2', 'section': 'Writing'},
+]}
+
+
+def test_items_are_queued_for_answered_writing_tasks_by_due_time():
+    submission = {'id': 'sub1', 'examId': 'e1', 'studentId': 's1', 'submittedAt': '2026-01-05T10:00:00+00:00',
+                  'answers': {'q1': 'TRUE', 'w1': 'The chart shows...', 'w2': ''}}
+    items = review_items(ANSWER_KEY, submission, target_hours=24)
+    assert list(items) == ['sub1_w1']
+    assert items['sub1_w1']['due'] == '2026-01-06T10:00:00+00:00'
+    assert items['sub1_w1']['priority'] == '2026-01-06T10:00:00+00:00|2026-01-05T10:00:00+00:00'
+
+    deadline = review_items({**ANSWER_KEY, 'reviewDeadline': '2026-01-05T18:00:00+00:00'}, submission)
+    assert deadline['sub1_w1']['priority'].startswith('2026-01-05T18:00:00')
+
+    # Deadlines in other offsets or without a time still sort as times against computed due times
+    for written, due in (('2026-01-05T20:00:00+02:00', '2026-01-05T18:00:00+00:00'),
+                         ('2026-01-05T18:00Z', '2026-01-05T18:00:00+00:00'),
+                         ('2026-01-06', '2026-01-06T00:00:00+00:00'),
+                         ('next week', '2026-01-06T10:00:00+00:00')):
+        item = review_items({**ANSWER_KEY, 'reviewDeadline': written}, submission, target_hours=24)['sub1_w1']
+        assert item['due'] == due and item['priority'] == f'{due}|2026-01-05T10:00:00+00:00'
+
+
+def test_leases_exclude_other_reviewers_until_they_lapse():
+    item = {'status': 'pending', 'priority': 'p'}
+    held = claim('alice', 100, lease_seconds=60)(item)
+    assert (held['claimedBy'], held['leaseExpiresAt']) == ('alice', 160)
+    with pytest.raises(LeaseConflict):
+        claim('bob', 120)(held)
+    with pytest.raises(LeaseConflict):
+        complete('bob', 120)(held)
+    with pytest.raises(LeaseConflict):
+        expire(120)(held)
+    assert claim('alice', 150, lease_seconds=60)(held)['leaseExpiresAt'] == 210
+    assert renew('alice', 150, lease_seconds=60)(held)['leaseExpiresAt'] == 210
+    # Renewing only extends a lease still held; it never takes an unleased or lapsed item
+    for reviewer, now, item in (('bob', 150, held), ('alice', 170, held), ('alice', 150, item), ('alice', 150, None)):
+        with pytest.raises(LeaseConflict):
+            renew(reviewer, now)(item)
+
+    returned = expire(170)(held)
+    assert returned == {'status': 'pending', 'priority': 'p'}
+    assert claim('bob', 170)(held)['claimedBy'] == 'bob'
+    assert release('alice', 120)(held)['status'] == 'pending'
+    with pytest.raises(LeaseConflict):
+        claim('alice', 120)({**held, 'status': 'done'})
+
+
+def test_reviewers_claim_disjoint_batches_and_complete(backend):
+    root, client, admin = backend.root, backend.client, backend.admin
+    backend.add_exam('review-exam', {'title': 'Review', 'questions': ANSWER_KEY['questions']})
+
+    for n in range(5):
+        assert backend.submit('review-exam', f'rv{n}', {'q1': 'TRUE', 'w1': f'essay {n}'}).status_code == 200
+    assert len(root.child('review_queue/pending').get()) == 5
+
+    assert client.post('/api/review/claim', headers=admin, json={'limit': 2}).status_code == 400
+    first = client.post('/api/review/claim', headers=admin, json={'limit': 3, 'reviewer': 'alice'}).json()['items']
+    second = client.post('/api/review/claim', headers=admin, json={'limit': 3, 'reviewer': 'bob'}).json()['items']
+    assert (len(first), len(second)) == (3, 2)
+    assert not {item['id'] for item in first} & {item['id'] for item in second}
+    assert all(item['response'].startswith('essay') for item in first)
+    assert root.child('review_queue/pending').get() is None
+
+    target = first[0]
+    url = f"/api/review/items/{target['id']}"
+    assert client.post(f'{url}/complete', headers=admin, json={'reviewer': 'bob', 'points': 6}).status_code == 409
+    done = client.post(f'{url}/complete', headers=admin, json={'reviewer': 'alice', 'points': 6, 'bandScore': 6.5,
+                                                                 'feedback': 'Clear overview'})
+    assert done.status_code == 200
+    assert root.child(f"review_queue/items/{target['id']}").get() is None
+    submission = root.child(f"submissions/{target['submissionId']}").get()
+    assert submission['reviews']['w1']['bandScore'] == 6.5
+    assert submission['results']['points']['w1'] == 6
+
+    # A question added: every submission is re-marked in full, the reviewer's mark stays
+    backend.add_exam('review-exam', {'title': 'Review', 'questions': [
+        *ANSWER_KEY['questions'],
+        {'id': 'q4', 'number': 4, 'type': 'true_false_ng', 'section': 'Writing', 'correctAnswer': 'TRUE'},
+    ]})
+    rescored = client.post('/api/exams/review-exam/rescore', headers=admin).json()
+    assert (rescored['changedQuestions'], rescored['submissionsUpdated']) == (None, 5)
+    submission = root.child(f"submissions/{target['submissionId']}").get()
+    assert submission['results']['count'] == 4 and submission['results']['points'] == {'w1': 6}
+
+    released = first[1]['id']
+    assert client.post(f'/api/review/items/{released}/release', headers=admin,
+                       json={'reviewer': 'alice'}).status_code == 200
+    assert client.post(f'/api/review/items/{released}/renew', headers=admin,
+                       json={'reviewer': 'alice'}).status_code == 409
+    assert root.child(f'review_queue/items/{released}/status').get() == 'pending'
+    again = client.post('/api/review/claim', headers=admin, json={'limit': 3, 'reviewer': 'carol'}).json()['items']
+    assert [item['id'] for item in again] == [released]
+    renewed = client.post(f'/api/review/items/{released}/renew', headers=admin, json={'reviewer': 'carol'})
+    assert renewed.status_code == 200
+    assert root.child(f'review_queue/leases/{released}/expiresAt').get() == renewed.json()['leaseExpiresAt']
+
+    # A lapsed lease is swept back into the queue by the next claim
+    root.child(f"review_queue/items/{first[2]['id']}/leaseExpiresAt").set(0)
+    root.child(f"review_queue/leases/{first[2]['id']}/expiresAt").set(0)
+    swept = client.post('/api/review/claim', headers=admin, json={'limit': 3, 'reviewer': 'carol'}).json()['items']
+    assert [item['id'] for item in swept] == [first[2]['id']]
@@ -0,0 +1,144 @@
+import threading
+
+import pytest
+from firebase_admin import exceptions
+from firebase_admin.db import TransactionAbortedError
+
+from rtdb_emulator import MAX_TRANSACTION_RETRIES, InMemoryDatabase
+
+
+def test_set_get_update_and_delete_prune_empty_parents():
+    database = InMemoryDatabase()
+    ref = database.reference('exam_progress/e1_s1')
+    ref.set({'answers': {'q1': 'A'}, 'timeSpent': 30, 'skipped': None})
+    assert ref.get() == {'answers': {'q1': 'A'}, 'timeSpent': 30}
+
+    ref.update({'answers/q2': 'B', 'timeSpent': 60})
+    assert ref.get() == {'answers': {'q1': 'A', 'q2': 'B'}, 'timeSpent': 60}
+
+    ref.delete()
+    assert database.reference('exam_progress').get() is None
+
+
+def test_arrays_round_trip_like_rtdb():
+    database = InMemoryDatabase({'exams_full': {'e1': {'questions': [{'id': 'q1'}, {'id': 'q2'}]}}})
+    assert database.reference('exams_full/e1/questions').get() == [{'id': 'q1'}, {'id': 'q2'}]
+    assert database.reference('exams_full/e1/questions/1/id').get() == 'q2'
+
+
+def test_transaction_applies_the_update_to_the_current_value():
+    database = InMemoryDatabase()
+    ref = database.reference('cohort_stats/exams/e1/count')
+    assert ref.transaction(lambda current: (current or 0) + 1) == 1
+    assert ref.transaction(lambda current: (current or 0) + 1) == 2
+    assert database.operations['transaction'] == 2
+
+
+def test_concurrent_transactions_conflict_and_retry():
+    database = InMemoryDatabase(latency={'transaction': 0.002})
+    ref = database.reference('rank_index/e1/count')
+
+    def increment():
+        for _ in range(10):
+            ref.transaction(lambda current: (current or 0) + 1)
+
+    threads = [threading.Thread(target=increment) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert ref.get() == 40
+    assert database.transaction_conflicts > 0
+    assert database.operations['transaction'] == 40 + database.transaction_conflicts
+
+
+def test_transaction_gives_up_after_max_retries():
+    database = InMemoryDatabase()
+    ref = database.reference('rank_index/e1/count')
+
+    def always_overwritten(current):
+        # Another client writes between every read and write
+        ref.set((current or 0) + 100)
+        return (current or 0) + 1
+
+    with pytest.raises(TransactionAbortedError):
+        ref.transaction(always_overwritten)
+    assert database.transaction_conflicts == MAX_TRANSACTION_RETRIES
+
+
+def test_push_keys_are_unique_and_ordered():
+    ref = InMemoryDatabase().reference('submissions')
+    keys = [ref.push({'n': n}).key for n in range(50)]
+    assert keys == sorted(keys)
+    assert len(set(keys)) == 50
+    assert all(len(key) == 20 for key in keys)
+
+
+def _students():
+    return InMemoryDatabase({'submissions': {
+        'a': {'studentId': 's1', 'score': 7.5},
+        'b': {'studentId': 's2', 'score': 6},
+        'c': {'studentId': 's1', 'score': 8},
+        'd': {'studentId': 's3'},
+    }})
+
+
+def test_order_by_child_filters_and_limits():
+    submissions = _students().reference('submissions')
+    assert list(submissions.order_by_child('studentId').equal_to('s1').get()) == ['a', 'c']
+    # Missing children sort first, as null
+    assert list(submissions.order_by_child('score').get()) == ['d', 'b', 'a', 'c']
+    assert list(submissions.order_by_child('score').limit_to_last(2).get()) == ['a', 'c']
+    assert list(submissions.order_by_child('score').start_at(7).limit_to_first(1).get()) == ['a']
+    assert list(submissions.order_by_key().end_at('b').get()) == ['a', 'b']
+
+
+def test_listeners_get_initial_value_and_changes_until_closed():
+    database = _students()
+    events = []
+    registration = database.reference('submissions/a').listen(events.append)
+    database.reference('submissions/a/score').set(9)
+    database.reference('submissions/a').update({'reviewed': True})
+    database.reference('submissions/b').delete()
+    registration.close()
+    database.reference('submissions/a').delete()
+
+    assert [(e.event_type, e.path, e.data) for e in events] == [
+        ('put', '/', {'studentId': 's1', 'score': 7.5}),
+        ('put', '/score', 9),
+        ('patch', '/', {'reviewed': True}),
+    ]
+
+
+def test_injected_latency_and_failures_are_deterministic(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr('rtdb_emulator.time.sleep', sleeps.append)
+
+    def run():
+        database = InMemoryDatabase(latency={'get': 0.05}, jitter=0.01, failure_rate={'set': 0.5}, random_seed=7)
+        outcomes = []
+        for n in range(20):
+            try:
+                database.reference(f'x/{n}').set(n)
+                outcomes.append('ok')
+            except exceptions.UnavailableError:
+                outcomes.append('failed')
+        database.reference('x').get()
+        return outcomes, database.operations
+
+    first, operations = run()
+    first_sleeps, sleeps[:] = list(sleeps), []
+    assert run()[0] == first
+    assert sleeps == first_sleeps
+    assert 'ok' in first and 'failed' in first
+    assert 0.05 <= first_sleeps[-1] < 0.06
+    assert operations == {'set': 20, 'get': 1}
+
+
+def test_fail_next_forces_failures():
+    database = InMemoryDatabase()
+    database.fail_next('get', count=2)
+    for _ in range(2):
+        with pytest.raises(exceptions.UnavailableError):
+            database.reference('a').get()
+    assert database.reference('a').get() is None
@@ -0,0 +1,65 @@
+from scoring import compile_answer_key, normalize_answer, raw_score_to_band, round_half_up, score_answers, score_question
+
+
+EXAM = {
+    'questions': [
+        {'id': 'q1', 'number': 1, 'type': 'mcq_single', 'section': 'Listening', 'correctAnswer': 'A',
+         'options': [{'id': 'A', 'text': 'Travel plans', 'correct': True}, {'id': 'B', 'text': 'Work', 'correct': False}]},
+        {'id': 'q2', 'number': 2, 'type': 'mcq_multiple', 'section': 'Listening',
+         'options': [{'id': 'A', 'correct': True}, {'id': 'B', 'correct': True}, {'id': 'C', 'correct': False}]},
+        {'id': 'q3', 'number': 3, 'type': 'fill_gaps', 'section': 'Listening', 'correctAnswer': ['three', '3']},
+        {'id': 'q4', 'number': 4, 'type': 'true_false_ng', 'section': 'Reading', 'correctAnswer': 'Not Given'},
+        {'id': 'q5', 'number': 5, 'type': 'matching', 'section': 'Reading', 'correctAnswer': {'1': 'B', '2': 'A'}},
+        {'id': 'writing_task_1', 'number': 6, 'type': 'writing_task1', 'section': 'Writing'},
+    ]
+}
+
+
+def test_score_question_matches_node_result_shape():
+    result = score_question(EXAM['questions'][0], ' travel PLANS ')
+    assert result['isCorrect'] and result['points'] == 1 and result['feedback'] == 'Correct!'
+
+    wrong = score_question(EXAM['questions'][3], 'True')
+    assert wrong['feedback'] == 'Incorrect. The correct answer is: Not Given'
+
+    writing = score_question(EXAM['questions'][5], 'An essay')
+    assert writing['needsManualReview'] and not writing['isCorrect']
+
+
+def test_score_answers_aggregates_sections_and_bands():
+    answers = {'q1': 'A', 'q2': ['b', 'a'], 'q_3': '3', 'q4': 'not given', 'q5': {'2': 'a', '1': 'b'}}
+    result = score_answers(EXAM, answers)
+
+    assert [r['isCorrect'] for r in result['questionResults']] == [True, True, True, True, True, False]
+    assert result['sectionScores']['Listening']['correctAnswers'] == 3
+    assert result['sectionScores']['Listening']['bandScore'] == 2.0
+    assert result['sectionScores']['Writing']['status'] == 'manual_review'
+    assert result['sectionScores']['Writing']['bandScore'] is None
+    assert result['overallBandScore'] == 2.0
+    assert result['totalCorrect'] == 5
+    assert result['percentage'] == 83
+
+
+def test_helpers_follow_javascript_semantics():
+    assert normalize_answer(None) == ''
+    assert normalize_answer(3.0) == '3'
+    assert normalize_answer(True) == 'true'
+    assert round_half_up(2.5) == 3
+    assert raw_score_to_band(31, 40, 'Reading') == 7.0
+    assert raw_score_to_band(10, 0, 'Reading') == 0.0
+    assert score_answers({'questions': {'1': EXAM['questions'][0], '0': EXAM['questions'][3]}}, {})['totalQuestions'] == 2
+
+
+def test_compiled_answer_key_scores_like_the_full_exam():
+    answers = {'q1': 'travel plans', 'q2': ['A', 'B'], 'q3': 'three', 'q4': 'False'}
+    key = compile_answer_key(EXAM)
+    assert 'text' not in key['questions'][0]
+    assert score_answers(key, answers) == score_answers(EXAM, answers)
+
+
+def test_string_options_fall_back_to_correct_answer():
+    # Imported exams list options as strings with a letter answer
+    question = {'id': 'q1', 'type': 'mcq_single', 'options': ['Morning', 'Evening'], 'correctAnswer': 'B'}
+    assert score_question(question, 'b')['isCorrect']
+    assert not score_question({**question, 'type': 'mcq_multiple'}, ['B'])['isCorrect']
+    assert compile_answer_key({'questions': [question]})['questions'][0]['options'] == ['Morning', 'Evening']
@@ -0,0 +1,36 @@
+import io
+import random
+
+from scoring import score_question
+from tests.benchmarks import scoring_benchmark
+
+
+def test_generated_answers_score_as_intended_for_every_type():
+    rng = random.Random(3)
+    for number, question_type in enumerate(scoring_benchmark.QUESTION_TYPES, start=1):
+        question = scoring_benchmark.build_question(question_type, number, rng)
+        right = score_question(question, scoring_benchmark.build_answer(question, True, rng))
+        wrong = score_question(question, scoring_benchmark.build_answer(question, False, rng))
+        if question_type.startswith('writing'):
+            assert right['needsManualReview']
+        else:
+            assert right['isCorrect'], question_type
+            assert not wrong['isCorrect'], question_type
+
+
+def test_tiny_run_and_comparison_flags_regressions():
+    options = scoring_benchmark.parse_args([
+        'run', '--sizes', '10', '--submissions', '1,5', '--calls', '10', '--rounds', '2', '--filter', 'q10',
+    ])
+    result = scoring_benchmark.run_benchmarks(options, out=io.StringIO())
+    assert set(result['benchmarks']) == {
+        'score_answers[exam-q10-n1]', 'score_answers[answer_key-q10-n1]',
+        'score_answers[exam-q10-n5]', 'score_answers[answer_key-q10-n5]',
+    }
+
+    slower = {'benchmarks': {name: {**stats, 'perItem': stats['perItem'] * 1.5}
+                             for name, stats in result['benchmarks'].items()}}
+    _, regressions = scoring_benchmark.compare(result, slower, threshold=0.1)
+    assert len(regressions) == 4
+    _, regressions = scoring_benchmark.compare(result, result, threshold=0.1)
+    assert regressions == []
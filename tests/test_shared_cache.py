@@ -0,0 +1,85 @@
+import asyncio
+import multiprocessing
+import time
+
+from shared_cache import SharedExamCache
+
+
+def _exam(q2):
+    return {'title': 'Racing', 'questions': [
+        {'id': 'q1', 'number': 1, 'type': 'true_false_ng', 'section': 'Reading', 'correctAnswer': 'TRUE'},
+        {'id': 'q2', 'number': 2, 'type': 'matching', 'section': 'Reading', 'correctAnswer': q2},
+    ]}
+
+
+def _write_from_worker(directory, exam):
+    SharedExamCache(directory).put('exam:e1', exam)
+
+
+def test_entries_written_by_one_process_are_served_to_another(tmp_path):
+    exam = {'id': 'e1', 'questions': [{'id': 'q1', 'correctAnswer': 'A'}]}
+    worker = multiprocessing.get_context('fork').Process(target=_write_from_worker, args=(tmp_path, exam))
+    worker.start()
+    worker.join()
+
+    cache = SharedExamCache(tmp_path)
+    etag, body = cache.get_bytes('exam:e1')
+    assert etag.startswith('"')
+    assert cache.get('exam:e1') == exam
+    assert cache.get('exam:e1') is cache.get('exam:e1')
+    assert bytes(body).startswith(b'{"id":"e1"')
+
+
+def test_updates_and_invalidation_bump_the_generation_for_all_readers(tmp_path):
+    reader = SharedExamCache(tmp_path)
+    writer = SharedExamCache(tmp_path)
+
+    writer.put('answer_key:e1', {'v': 1})
+    assert reader.get('answer_key:e1') == {'v': 1}
+
+    writer.put('answer_key:e1', {'v': 2})
+    assert reader.get('answer_key:e1') == {'v': 2}
+    assert len(list(tmp_path.glob('*.bin'))) == 1
+
+    writer.invalidate('answer_key:e1')
+    assert reader.get('answer_key:e1') is None
+    assert reader.generation('answer_key:e1') == 3
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = SharedExamCache(tmp_path, ttl=0.01)
+    cache.put('exam:e1', {'id': 'e1'})
+    time.sleep(0.02)
+    assert cache.get_bytes('exam:e1') is None
+
+
+def test_fills_read_before_an_invalidation_are_not_published(tmp_path):
+    cache = SharedExamCache(tmp_path)
+    cache.put('answer_key:e1', {'v': 1})
+
+    since = cache.latest_generation('answer_key:e1')
+    cache.invalidate('answer_key:e1')  # an edit lands while the fill reads the old exam
+    cache.put('answer_key:e1', {'v': 1}, since=since)
+    assert cache.get('answer_key:e1') is None
+
+    since = cache.latest_generation('answer_key:e1')
+    cache.put('answer_key:e1', {'v': 2}, since=since)
+    assert cache.get('answer_key:e1') == {'v': 2}
+
+
+def test_answer_key_read_during_an_edit_is_not_cached(backend, monkeypatch):
+    server = backend.server
+    backend.add_exam('racing-exam', _exam('B'))
+    read = server.db_get
+
+    async def read_then_edit(path):
+        # The exam is corrected and the cache invalidated while this read is in flight
+        exam = await read(path)
+        backend.add_exam('racing-exam', _exam('C'))
+        return exam
+
+    monkeypatch.setattr(server, 'db_get', read_then_edit)
+    stale = asyncio.run(server.load_answer_key('racing-exam'))
+    monkeypatch.setattr(server, 'db_get', read)
+    assert stale['questions'][1]['correctAnswer'] == 'B'
+    assert asyncio.run(server.load_answer_key('racing-exam'))['questions'][1]['correctAnswer'] == 'C'
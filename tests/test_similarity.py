@@ -0,0 +1,76 @@
+import random
+
+from similarity import (
+    NUM_PERM, LSHIndex, decode_signature, encode_signature, essay_signatures, estimated_similarity, minhash,
+    near_duplicates, shingles,
+)
+
+
+VOCABULARY = ('the chart shows data rate people country increase decrease between while most least during period '
+              'overall however which percent figure compared this that trend stable rose fell sharply slightly').split()
+
+
+def essay(rng, words=250):
+    return ' '.join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+def jaccard(left, right):
+    return len(left & right) / len(left | right)
+
+
+def test_signatures_estimate_jaccard_similarity():
+    rng = random.Random(3)
+    original = essay(rng).split()
+    edited = list(original)
+    for index in rng.sample(range(len(edited)), 15):
+        edited[index] = rng.choice(VOCABULARY)
+    left, right = shingles(' '.join(original)), shingles(' '.join(edited))
+    estimate = estimated_similarity(minhash(left), minhash(right))
+    assert abs(estimate - jaccard(left, right)) < 0.12
+    assert minhash(shingles('too short')) is None
+
+    answer_key = {'questions': [{'id': 'w1', 'type': 'writing_task2'}, {'id': 'q1', 'type': 'mcq_single'}]}
+    signatures = essay_signatures(answer_key, {'w1': ' '.join(original), 'q1': 'A'})
+    assert list(signatures) == ['w1'] and len(decode_signature(signatures['w1'])) == NUM_PERM
+
+
+def test_lsh_candidates_find_copies_without_all_pairs():
+    rng = random.Random(8)
+    texts = {f'sub{i}': essay(rng) for i in range(60)}
+    texts['copy'] = texts['sub7'] + ' and that is all'
+    index = LSHIndex()
+    for name, text in texts.items():
+        index.add(name, minhash(shingles(text)))
+    candidates = index.candidate_pairs()
+    assert ('copy', 'sub7') in candidates
+    assert len(candidates) < 60 * 61 / 2 / 10
+
+    stored = {name: {'studentId': name, 'questions': {'w1': encode_signature(minhash(shingles(text)))}}
+              for name, text in texts.items()}
+    stored['resit'] = {'studentId': 'sub7', 'questions': stored['sub7']['questions']}
+    report = near_duplicates(stored)
+    assert [[entry['submissionId'] for entry in pair['submissions']] for pair in report['pairs']] == [['copy', 'resit'],
+                                                                                                     ['copy', 'sub7']]
+
+
+def test_scan_job_reports_pairs(backend):
+    root, client, admin = backend.root, backend.client, backend.admin
+    backend.add_exam('similar-exam', {'title': 'Similar', 'questions': [
+        {'id': 'w1', 'number': 1, 'type': 'writing_task1', 'section': 'Writing'},
+    ]})
+
+    rng = random.Random(11)
+    shared = essay(rng)
+    for student, text in (('sim1', shared), ('sim2', essay(rng)), ('sim3', shared.replace('chart', 'graph', 1))):
+        assert backend.submit('similar-exam', student, {'w1': text}).status_code == 200
+    # Stored before signatures existed; signed by the backfill
+    root.child('submissions/legacy').set({'examId': 'similar-exam', 'studentId': 'sim4', 'answers': {'w1': shared}})
+    assert len(root.child('writing_signatures/similar-exam').get()) == 3
+
+    assert client.get('/api/exams/similar-exam/similarity', headers=admin).status_code == 404
+    started = client.post('/api/exams/similar-exam/similarity/scan', headers=admin, params={'backfill': 'true'})
+    assert started.status_code == 202
+    report = client.get('/api/exams/similar-exam/similarity', headers=admin).json()
+    assert report['status'] == 'done' and report['responses'] == 4
+    students = [sorted(entry['studentId'] for entry in pair['submissions']) for pair in report['pairs']]
+    assert sorted(students) == [['sim1', 'sim3'], ['sim1', 'sim4'], ['sim3', 'sim4']]
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_fetch_per_key():
+    group = SingleFlight('test')
+    fetches = []
+
+    async def fetch(key):
+        fetches.append(key)
+        await asyncio.sleep(0.01)
+        return {'id': key}
+
+    async def run():
+        calls = [group.do(key, lambda key=key: fetch(key)) for key in ['a'] * 50 + ['b'] * 50]
+        return await asyncio.gather(*calls)
+
+    results = asyncio.run(run())
+    assert sorted(fetches) == ['a', 'b']
+    assert results[0] is results[49]
+    assert group.in_flight() == 0
+
+
+def test_errors_propagate_to_all_waiters_and_are_not_cached():
+    group = SingleFlight('test')
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        await asyncio.sleep(0)
+        if len(attempts) == 1:
+            raise RuntimeError('timeout')
+        return 'ok'
+
+    async def run():
+        first = await asyncio.gather(*(group.do('k', flaky) for _ in range(3)), return_exceptions=True)
+        second = await group.do('k', flaky)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in first)
+    assert second == 'ok'
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_fetch():
+    group = SingleFlight('test')
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return 'done'
+
+    async def run():
+        leader = asyncio.ensure_future(group.do('k', slow))
+        follower = asyncio.ensure_future(group.do('k', slow))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == 'done'
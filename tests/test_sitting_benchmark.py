@@ -0,0 +1,55 @@
+import asyncio
+
+from tests.load import sitting_benchmark
+
+
+def test_small_sitting_runs_cleanly_in_process(monkeypatch, tmp_path):
+    # The benchmark points the backend at these; monkeypatch restores them afterwards
+    for name in ('DATABASE_BACKEND', 'EXAM_CACHE_DIR', 'AUDIO_DIR'):
+        monkeypatch.setenv(name, '')
+    monkeypatch.setenv('ADMISSION_CONTROL', 'off')
+    monkeypatch.setenv('LOG_LEVEL', 'WARNING')
+
+    options = sitting_benchmark.parse_args([
+        '--candidates', '5', '--sitting-seconds', '120', '--ramp-up', '10', '--time-scale', '0.005',
+        '--audio-bytes', '100000', '--audio-chunk', '32768',
+    ])
+    report = asyncio.run(sitting_benchmark.run(options))
+
+    endpoints = report['endpoints']
+    assert set(endpoints) == {
+        'GET /api/exams/{exam_id}',
+        'GET /api/audio/{question_type}/{filename}',
+        'POST /api/progress',
+        'POST /api/submissions',
+    }
+    assert {endpoint: stats['errors'] for endpoint, stats in endpoints.items()} == dict.fromkeys(endpoints, 0)
+    assert endpoints['POST /api/submissions']['requests'] == 5
+    # 100000 bytes in 32 KiB ranges is four partial responses per candidate
+    assert endpoints['GET /api/audio/{question_type}/{filename}']['statuses'] == {'206': 20}
+    # 120 simulated seconds hold at most four 30s autosaves, fewer for late arrivals
+    assert 5 <= endpoints['POST /api/progress']['requests'] <= 5 * 4
+
+
+def test_sitting_behind_one_address_passes_admission_control(monkeypatch):
+    for name in ('DATABASE_BACKEND', 'EXAM_CACHE_DIR', 'AUDIO_DIR'):
+        monkeypatch.setenv(name, '')
+    monkeypatch.setenv('LOG_LEVEL', 'WARNING')
+
+    # Every candidate shares the in-process client address and submits at the same moment
+    options = sitting_benchmark.parse_args([
+        '--candidates', '30', '--sitting-seconds', '90', '--ramp-up', '10', '--time-scale', '0.005',
+        '--audio-bytes', '65536', '--audio-chunk', '32768', '--admission',
+    ])
+    report = asyncio.run(sitting_benchmark.run(options))
+
+    endpoints = report['endpoints']
+    assert endpoints['POST /api/submissions']['statuses'] == {'200': 30}
+    assert {endpoint: stats['errors'] for endpoint, stats in endpoints.items()} == dict.fromkeys(endpoints, 0)
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+    assert sitting_benchmark.percentile(values, 0.5) == 50
+    assert sitting_benchmark.percentile(values, 0.99) == 99
+    assert sitting_benchmark.percentile([], 0.5) == 0.0
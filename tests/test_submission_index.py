@@ -0,0 +1,48 @@
+import asyncio
+
+from submission_index import index_writes, listed
+
+
+def test_index_writes_and_listing():
+    submission = {'examId': 'e1', 'studentId': 's1', 'submittedAt': '2026-02-01T00:00:00+00:00', 'attempt': 1,
+                  'answers': {'q1': 'A'}, 'scored': True}
+    writes = index_writes('sub1', submission)
+    entry = {'examId': 'e1', 'studentId': 's1', 'submittedAt': '2026-02-01T00:00:00+00:00', 'attempt': 1}
+    assert writes == {'student_submissions/s1/sub1': entry, 'exam_submissions/e1/sub1': entry}
+    assert index_writes('sub2', {'examId': 'e1'}) == {'exam_submissions/e1/sub2': {'examId': 'e1'}}
+
+    entries = {'sub1': entry, 'sub2': {**entry, 'examId': 'e2', 'submittedAt': '2026-03-01T00:00:00+00:00'}}
+    assert [row['submissionId'] for row in listed(entries)] == ['sub2', 'sub1']
+    assert [row['submissionId'] for row in listed(entries, exam_id='e1')] == ['sub1']
+
+
+def test_lookups_read_the_indexes_and_backfill(backend):
+    root, client, admin = backend.root, backend.client, backend.admin
+    questions = [{'id': 'q1', 'number': 1, 'type': 'true_false_ng', 'section': 'Reading', 'correctAnswer': 'TRUE'}]
+    for exam_id in ('index-a', 'index-b'):
+        backend.add_exam(exam_id, {'title': exam_id, 'questions': questions})
+
+    for student, exam_id in (('ix1', 'index-a'), ('ix1', 'index-b'), ('ix2', 'index-a')):
+        assert backend.submit(exam_id, student, {'q1': 'TRUE'}).status_code == 200
+
+    mine = client.get('/api/students/ix1/submissions').json()['submissions']
+    assert sorted(row['examId'] for row in mine) == ['index-a', 'index-b']
+    full = client.get('/api/students/ix1/submissions', params={'examId': 'index-b', 'full': 'true'}).json()
+    assert [record['scored'] for record in full['submissions']] == [True]
+    exam = client.get('/api/exams/index-a/submissions', headers=admin).json()['submissions']
+    assert sorted(row['studentId'] for row in exam) == ['ix1', 'ix2']
+
+    # Written before the indexes existed
+    root.child('submissions/older').set({'examId': 'index-a', 'studentId': 'ix3', 'submittedAt': '2025-01-01'})
+    assert client.get('/api/students/ix3/submissions').json()['submissions'] == []
+    rebuilt = client.post('/api/submissions/indexes/rebuild', headers=admin).json()
+    assert rebuilt['submissionsScanned'] == 4
+    assert [row['submissionId'] for row in client.get('/api/students/ix3/submissions').json()['submissions']] == [
+        'older']
+
+
+def test_backfill_pages_through_every_submission(backend):
+    for n in range(7):
+        backend.root.child(f'submissions/page{n}').set({'examId': 'paged-exam', 'studentId': f'p{n}'})
+    assert asyncio.run(backend.server.rebuild_submission_indexes(page_size=3)) == 7
+    assert len(backend.root.child('exam_submissions/paged-exam').get()) == 7
@@ -0,0 +1,60 @@
+from scoring import compile_answer_key
+from text_stats import batch_text_stats, moving_type_token_ratio, submission_text_stats, text_statistics
+
+
+ESSAY = """The chart compares well-known cities' populations in 1990 and 2020.
+
+Overall, most cities grew! Tokyo remained the largest, while Paris barely changed.
+In summary: growth was uneven"""
+
+
+def test_text_statistics():
+    stats = text_statistics(ESSAY, word_limit=20)
+    assert stats['wordCount'] == 27
+    assert stats['sentenceCount'] == 4
+    assert stats['paragraphCount'] == 3
+    assert stats['meanSentenceLength'] == 6.8
+    assert stats['uniqueWords'] == 24
+    assert (stats['wordLimit'], stats['wordLimitRatio'], stats['belowWordLimit']) == (20, 1.35, False)
+    assert text_statistics('   ') == {'wordCount': 0, 'uniqueWords': 0, 'sentenceCount': 0, 'paragraphCount': 0,
+                                       'meanSentenceLength': 0, 'lexicalDiversity': 0.0}
+
+
+def test_moving_ttr_matches_windowed_definition():
+    words = [f'w{index % 7}' for index in range(40)] + [f'x{index}' for index in range(30)]
+    window = 20
+    expected = sum(len(set(words[start:start + window])) / window
+                   for start in range(len(words) - window + 1)) / (len(words) - window + 1)
+    assert abs(moving_type_token_ratio(words, window) - expected) < 1e-12
+    assert moving_type_token_ratio(['a', 'b', 'a']) == 2 / 3
+
+
+def test_batch_matches_single_submission_in_a_process_pool():
+    answer_key = compile_answer_key({'questions': [
+        {'id': 'q1', 'type': 'true_false_ng', 'correctAnswer': 'TRUE'},
+        {'id': 'w1', 'type': 'writing_task1', 'wordLimit': 150},
+    ]})
+    assert answer_key['wordLimits'] == {'w1': 150}
+    submissions = [(f'sub{n}', {'answers': {'q1': 'TRUE', 'w1': ' '.join(['word'] * n * 40)}}) for n in range(6)]
+    expected = [(name, submission_text_stats(answer_key, submission['answers'])) for name, submission in submissions]
+    assert expected[0][1] == {} and expected[5][1]['w1']['belowWordLimit'] is False
+    assert list(batch_text_stats(answer_key, submissions, workers=2, chunksize=2)) == expected
+    assert list(batch_text_stats(answer_key, submissions, workers=1)) == expected
+
+
+def test_submissions_store_text_stats_and_backfill(backend):
+    root = backend.root
+    backend.add_exam('stats-exam', {'title': 'Stats', 'questions': [
+        {'id': 'w1', 'number': 1, 'type': 'writing_task1', 'section': 'Writing', 'wordLimit': 150},
+    ]})
+
+    submission_id = backend.submit('stats-exam', 'ts1', {'w1': ESSAY}).json()['submissionId']
+    stored = root.child(f'submissions/{submission_id}/textStats/w1').get()
+    assert (stored['wordCount'], stored['belowWordLimit']) == (27, True)
+    assert root.child(f'review_queue/items/{submission_id}_w1/textStats').get() == stored
+
+    root.child('submissions/legacy').set({'examId': 'stats-exam', 'studentId': 'ts2', 'answers': {'w1': 'Short one.'}})
+    backfill = backend.client.post('/api/exams/stats-exam/text-stats/backfill', params={'workers': 1},
+                                   headers=backend.admin).json()
+    assert (backfill['submissionsScanned'], backfill['submissionsUpdated']) == (2, 2)
+    assert root.child('submissions/legacy/textStats/w1/wordCount').get() == 2
@@ -0,0 +1,98 @@
+import asyncio
+import gzip
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from tests.load import replay_trace
+from tracing import Sanitizer, TraceCaptureMiddleware, TraceWriter, read_traces
+
+
+SUBMISSION_ID = '0b6c1d9e-7f3a-5e2b-9c4d-1a2b3c4d5e6f'
+
+
+def _app(writer):
+    app = FastAPI()
+
+    @app.get('/api/exams/{exam_id}')
+    async def get_exam(exam_id: str):
+        return {'id': exam_id}
+
+    @app.post('/api/progress')
+    async def save_progress(request: Request):
+        body = await request.json()
+        return {'success': True, 'answers': len(body['answers'])}
+
+    @app.get('/api/submissions/{submission_id}')
+    async def get_submission(submission_id: str):
+        if submission_id != SUBMISSION_ID:
+            raise HTTPException(status_code=404)
+        return {'id': submission_id}
+
+    @app.get('/api/admin')
+    async def admin():
+        return {}
+
+    app.add_middleware(TraceCaptureMiddleware, writer=writer, secret='test-secret')
+    return app
+
+
+def test_captured_traces_are_sanitized_and_replayable(tmp_path):
+    writer = TraceWriter(tmp_path, segment_records=2)
+    client = TestClient(_app(writer))
+    client.get('/api/exams/exam-1?studentId=alice', headers={'X-Student-Id': 'alice', 'Cookie': 'session=1'})
+    client.post('/api/progress', json={'examId': 'exam-1', 'studentId': 'alice', 'answers': {'q1': 'secret'}})
+    client.get('/api/admin', headers={'Authorization': 'Bearer token'})
+    client.get('/api/exams/exam-2')
+    writer.close()
+
+    # Rotated after two records; the admin request was not captured
+    assert len(list(tmp_path.glob('trace-*.ndjson.gz'))) == 2
+    first, second, third = sorted(read_traces([tmp_path]), key=lambda record: record['at'])
+    alice = Sanitizer('test-secret').pseudonym('alice')
+
+    assert first['route'] == '/api/exams/{exam_id}' and first['path'] == '/api/exams/exam-1'
+    assert first['query'] == f'studentId={alice}'
+    assert first['headers'] == {'x-student-id': alice, 'accept-encoding': 'gzip, deflate'}
+    assert first['status'] == 200 and first['responseBytes'] > 0 and first['duration'] >= 0
+
+    assert second['body'] == {'examId': 'exam-1', 'studentId': alice, 'answers': {'q1': 'xxxxxx'}}
+    assert second['requestBytes'] > 0
+    assert third['path'] == '/api/exams/exam-2'
+
+    async def replay():
+        transport = httpx.ASGITransport(app=_app(TraceWriter(tmp_path / 'replayed')))
+        async with httpx.AsyncClient(transport=transport, base_url='http://staging') as staging:
+            records = replay_trace.load_trace([tmp_path])
+            return replay_trace.summarize(*await replay_trace.replay(staging, records, speed=10))
+
+    report = asyncio.run(replay())
+    assert report['requests'] == 3
+    assert report['routes']['POST /api/progress']['statusMismatches'] == 0
+    assert report['routes']['GET /api/exams/{exam_id}']['requests'] == 2
+
+
+def test_resource_ids_in_paths_are_kept_so_replayed_reads_find_them(tmp_path):
+    writer = TraceWriter(tmp_path)
+    client = TestClient(_app(writer))
+    assert client.get(f'/api/submissions/{SUBMISSION_ID}').status_code == 200
+    writer.close()
+
+    [record] = read_traces([tmp_path])
+    assert record['path'] == f'/api/submissions/{SUBMISSION_ID}'
+
+    async def replay():
+        transport = httpx.ASGITransport(app=_app(TraceWriter(tmp_path / 'replayed')))
+        async with httpx.AsyncClient(transport=transport, base_url='http://staging') as staging:
+            return replay_trace.summarize(*await replay_trace.replay(staging, [record], speed=10))
+
+    report = asyncio.run(replay())
+    assert report['routes']['GET /api/submissions/{submission_id}']['statusMismatches'] == 0
+
+
+def test_unterminated_segment_is_read_up_to_the_break(tmp_path):
+    segment = tmp_path / 'trace-live.ndjson.gz'
+    data = gzip.compress(b'{"at": 1}\n{"at": 2}\n')
+    segment.write_bytes(data[:-8])
+    assert [record['at'] for record in read_traces([segment])] == [1, 2]